@@ -5,10 +5,13 @@ import os
 
 from dotenv import load_dotenv
 
+from r2d7 import metrics
+
 logger = logging.getLogger(__name__)
 load_dotenv()
 
-COGS = [ 'dice_roller',
+COGS = [ 'message_dispatcher',
+         'dice_roller',
          'card_lookup',
          'list_lookup',
          'test_cog']
@@ -29,11 +32,19 @@ def main():
     logging.info(f"Discord token: {discord_token}")
     # This bot doesn't do voice, suppress warning about NaCl library
     discord.VoiceClient.warn_nacl = False
-    # intents = discord.Intents.default()
-    # intents.message_content = True
-    bot = discord.Bot(intents=discord.Intents.all(), cache_app_emojis=True)
+    intents = discord.Intents.default()
+    intents.message_content = True
+    # Members and presences are only needed to track companion bots (see presence.py).
+    # The member cache is left empty apart from those bots, and guilds are not chunked.
+    intents.members = True
+    intents.presences = True
+    bot = discord.Bot(intents=intents,
+                      member_cache_flags=discord.MemberCacheFlags.none(),
+                      chunk_guilds_at_startup=False,
+                      cache_app_emojis=True)
     for cog in COGS:
         bot.load_extension(f"r2d7.DiscordR3.cogs.{cog}")
+    metrics.serve('DISCORD_METRICS_PORT')
     logging.info("Starting Discord client")
     bot.run(discord_token)
 
@@ -5,26 +5,47 @@ import random
 import discord
 from discord.ext import commands
 from r2d7.DiscordR3.discord_formatter import discord_formatter as fmt
+from r2d7.DiscordR3.message_dispatcher import message_dispatcher
+from r2d7.DiscordR3.reply_aggregator import ReplyAggregator
+from r2d7.metrics import timed
+from r2d7.singleflight import single_flight
+from r2d7.tracing import span, trace
 from r2d7.XWing.cards import card_db
 from r2d7.XWing.cards import Ship
 
 logger = logging.getLogger(__name__)
 
+async def card_autocomplete(ctx: discord.AutocompleteContext):
+    # Discord only gives us 3 seconds, so this is a trie walk and never a fuzzy search
+    db = ctx.cog.db if ctx.cog else card_db
+    choices = []
+    for card in db.complete_card_name(ctx.value or '', 25):
+        # Choice values are limited to 100 characters; fall back to a normal search if too long
+        value = card.unique_name if len(card.unique_name) <= 100 else card.name[:100]
+        choices.append(discord.OptionChoice(name=card.autocomplete_label()[:100], value=value))
+    return choices
+
 class CardLookupCog(commands.Cog):
+    MAX_QUERIES = 10
     RE_IMAGE = re.compile(r'\{\{(.*?)}}')
     RE_CARD = re.compile(r'\[\[(.*?)]]')
     def __init__(self, bot: discord.Client):
         self.bot = bot
         self.embeds = []
         self.db = card_db
+        self.searches = single_flight('card_search')
         fmt.set_bot(self.bot)
+        message_dispatcher.register('card_lookup', ['[['], [self.RE_CARD], self.handle_card_queries)
+
+    def cog_unload(self):
+        message_dispatcher.unregister('card_lookup')
 
     @commands.Cog.listener()
     async def on_ready(self):
         logger.info('Card lookup cog ready')
 
     @commands.slash_command(description="Look up any X-Wing card")
-    @discord.option("query", type=discord.SlashCommandOptionType.string)
+    @discord.option("query", type=discord.SlashCommandOptionType.string, autocomplete=card_autocomplete)
     async def card(self, ctx: discord.ApplicationContext, query):
         await self.do_card_lookup(query, ctx.respond)
 
@@ -34,31 +55,43 @@ class CardLookupCog(commands.Cog):
         card = random.choice(list(self.db.damage_deck.values()))
         await ctx.respond(embeds=get_card_embeds(card))
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:  # Don't respond to myself or other bots.
-            return
-        # Card Lookup
-        queries = self.RE_CARD.findall(message.content)
-        if len(queries) > 10:
-            message.reply(content="Please use less than 10 search terms in your message")
-        for q in queries:
-            await self.do_card_lookup(q, message.reply)
+    async def handle_card_queries(self, message, queries):
+        with trace('card_lookup', source='message', queries=len(queries)):
+            replies = ReplyAggregator(message.reply)
+            if len(queries) > self.MAX_QUERIES:
+                replies.add_note(f"Please use less than {self.MAX_QUERIES} search terms in your message")
+                queries = queries[:self.MAX_QUERIES]
+            for q in queries:
+                await self.add_card_lookup(q, replies)
+            await replies.flush()
 
     async def do_card_lookup(self, query, reply_callback):
+        with trace('card_lookup', source='command', queries=1):
+            replies = ReplyAggregator(reply_callback)
+            await self.add_card_lookup(query, replies)
+            await replies.flush()
+
+    async def add_card_lookup(self, query, replies):
         self.db.update_data()  # this is rate limited by the db
         logger.debug(f'Card query: {query}')
-        results = self.db.search_cards(query)
+        with span('lookup', query=query) as lookup_span:
+            card = self.db.cards_by_unique_name.get(query)
+            if card:  # picked from autocomplete
+                results = [card]
+            else:
+                # Concurrent searches for the same thing share one search
+                results = await self.searches.do(query.lower().strip(), self.db.search_cards, query)
+            lookup_span.set(results=len(results), exact=card is not None)
         if len(results) == 1:
             if isinstance(results[0], Ship):
                 ship_embed = discord.Embed(description=str(results[0]))
-                await reply_callback(embed=ship_embed, view=PilotSelect(results[0]))
+                replies.add_view_reply(embed=ship_embed, view=PilotSelect(results[0]))
             else:
-                await reply_callback(embeds=get_card_embeds(results[0]))
+                replies.add_embeds(get_card_embeds(results[0]))
         elif len(results) > 1:
-            await reply_callback(view=SelectCard(results))
+            replies.add_view_reply(view=SelectCard(results))
         else:
-            await reply_callback(content=f'No results found for query: {query}')
+            replies.add_note(f'No results found for query: {query}')
 
 def setup(bot: commands.Bot):
     bot.add_cog(CardLookupCog(bot))
@@ -134,6 +167,7 @@ class PilotSelect(discord.ui.View):
 
 
 
+@timed('render')
 def get_card_embeds(card):
     embeds = []
     if card.sides and len(card.sides) > 1:
@@ -1,23 +1,27 @@
+import asyncio
 import logging
 
 import discord
 from r2d7.DiscordR3.discord_formatter import discord_formatter as fmt
 from discord.ext import commands
 from r2d7.XWing.roller import ModdedRoll, VsRoll
+from r2d7.rollparser import RollSyntaxError, parse_query
 from r2d7.XWing.dice import DieType
+from r2d7.calculator import Calculator
+from r2d7.circuitbreaker import CircuitBreaker
+from r2d7.singleflight import single_flight
+from r2d7.tracing import annotate, span, trace
 import random
-import re
 
 logger = logging.getLogger(__name__)
 
 class DiceRollerCog(commands.Cog):
-    re_vs = re.compile('\\b(?P<vs>(vs)|(versus)|(v))\\b', re.I)
-    re_syntax = re.compile('\\b((syntax)|(help))\\b', re.I)
-    re_numeric = re.compile('\\bd(?P<num>[0-9]+)\\b', re.I)
-    re_scenario = re.compile('\\b((scenario)|(mission))\\b', re.I)
+    CALCULATOR_DEADLINE = 5  # seconds
 
     def __init__(self, bot):
         self.bot = bot
+        self.calculations = single_flight('calculator')
+        self.calculator_breaker = CircuitBreaker('calculator')
         fmt.set_bot(self.bot)
 
     @commands.Cog.listener()
@@ -27,23 +31,38 @@ class DiceRollerCog(commands.Cog):
     @discord.slash_command(description="Roll dice")
     @discord.option("query", type=discord.SlashCommandOptionType.string)
     async def roll(self, ctx, query: str):
-        resp = self.roll_dice(query)
+        with trace('roll', query=query):
+            resp, roll = await self.roll_dice(query)
+            with span('send'):
+                await ctx.respond(self.format_response(resp))
+            # The stats are worked out locally and already sent; the calculator
+            # permalink is edited in afterwards if it turns up in time
+            if roll is not None and await self.fetch_permalink(roll):
+                with span('send', edit=True):
+                    await ctx.edit(content=self.format_response(self.print_roll(roll)))
+
+    @staticmethod
+    def format_response(resp):
         if isinstance(resp, list):
             resp = '\n'.join(resp)
-        await ctx.respond(resp.format_map(fmt.emoji_map))
-
-    def roll_dice(self, query):
-        if self.re_syntax.search(query):
-            return self.roll_syntax()
-        elif match_numeric := self.re_numeric.search(query):
-            return self.roll_numeric(match_numeric)
-        elif self.re_scenario.search(query):
-            return self.roll_scenario()
+        return resp.format_map(fmt.emoji_map)
+
+    async def roll_dice(self, query):
+        """
+        Returns the reply, and the roll if dice were rolled
+        """
+        with span('parse'):
+            parsed = parse_query(query)
+        if parsed.command == 'syntax':
+            return self.roll_syntax(), None
+        elif parsed.command == 'numeric':
+            return self.roll_numeric(parsed.die_max), None
+        elif parsed.command == 'scenario':
+            return self.roll_scenario(), None
         else:
             try:
-                if match_vs := self.re_vs.search(query):
-                    roll_strings = query.split(match_vs.group('vs'))
-                    modded_rolls = [ModdedRoll(r) for r in roll_strings]
+                if len(parsed.sides) == 2:
+                    modded_rolls = [ModdedRoll(r) for r in parsed.sides]
                     if modded_rolls[0].die_type == modded_rolls[1].die_type:
                         raise RollSyntaxError('Opposing rolls cannot have same color')
                     elif modded_rolls[0].die_type == DieType.attack:
@@ -52,19 +71,53 @@ class DiceRollerCog(commands.Cog):
                         roll = VsRoll(modded_rolls[1], modded_rolls[0])
                 else:
                     roll = ModdedRoll(query)
-                return self.print_roll(roll)
+                # Big rolls are simulated, which takes long enough to keep off the event loop
+                with span('calculate_expected'):
+                    await asyncio.get_running_loop().run_in_executor(None, roll.calculate_expected)
+                annotate(simulated=roll.calculator_error is not None)
+                return self.print_roll(roll), roll
             except RollSyntaxError as err:
-                return [err.__str__(), 'Type `/roll syntax` for help']
+                return [err.__str__(), 'Type `/roll syntax` for help'], None
 
-    def print_roll(self, roll):
+    @staticmethod
+    def print_roll(roll):
         output = [roll.actual_roll()]
-        if roll.calculator_safe():
-            roll.calculate_expected()
-            link_string = fmt.link(roll.calculator_url, roll.calculator_url_description)
-            result_string = fmt.bold(f'{roll.calculator_result:.3f}')
-            output.append(f'{link_string} {result_string}')
+        if roll.calculator_url:
+            description = fmt.link(roll.calculator_url, roll.calculator_url_description)
+        else:
+            description = roll.calculator_url_description
+        result_string = fmt.bold(f'{roll.calculator_result:.3f}')
+        if roll.calculator_error is not None:
+            result_string += f' ± {roll.calculator_error:.3f}'
+        output.append(f'{description} {result_string}')
+        if roll.hit_chances:
+            output.append('Chance of at least: ' + ', '.join(
+                f'{hits} {chance:.1%}' for hits, chance in roll.hit_chances))
         return output
 
+    async def fetch_permalink(self, roll):
+        """
+        Asks the calculator for the roll's permalink if we don't have it yet.
+        Gives up after CALCULATOR_DEADLINE, and doesn't ask at all while the
+        calculator keeps failing. Returns True if roll.calculator_url changed.
+        """
+        if roll.calculator_url != Calculator._human_url:  # simulated, or already cached
+            return False
+        if not self.calculator_breaker.allow():
+            return False
+        calculator = roll.calculator()
+        try:
+            # Identical rolls made at the same time share one calculator request
+            calculator = await asyncio.wait_for(
+                self.calculations.do(calculator.key(), calculator.calculated), self.CALCULATOR_DEADLINE)
+        except Exception as err:
+            self.calculator_breaker.record_failure()
+            logger.warning(f'Dice calculator error: {err!r}')
+            return False
+        self.calculator_breaker.record_success()
+        roll.calculator_url = calculator.url
+        return True
+
     @staticmethod
     def roll_syntax():
         output = [
@@ -76,11 +129,10 @@ class DiceRollerCog(commands.Cog):
         return output
 
     @staticmethod
-    def roll_numeric(match):
+    def roll_numeric(die_max):
         output = []
         try:
-            die_max = match.group('num')
-            output.append(str(random.randint(1,int(die_max))))
+            output.append(str(random.randint(1, die_max)))
         except RollSyntaxError as err:
             return [[err.__str__(), 'Type `/roll syntax` for help']]
         return output
@@ -106,6 +158,3 @@ class DiceRollerCog(commands.Cog):
 def setup(bot): # this is called by Pycord to set up the cog
     bot.add_cog(DiceRollerCog(bot)) # add the cog to the bot
 
-class RollSyntaxError(Exception):
-    pass
-
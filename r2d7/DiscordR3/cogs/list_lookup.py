@@ -7,7 +7,14 @@ import discord
 from discord.ext import commands
 from r2d7.XWing.cards import card_db
 from r2d7.DiscordR3.discord_formatter import discord_formatter as fmt
+from r2d7.DiscordR3.message_dispatcher import message_dispatcher
+from r2d7.DiscordR3.presence import companion_presence
 from r2d7.XWing.list_formatter import ListFormatter
+from r2d7.XWing import firepower
+from r2d7.rollparser import RollSyntaxError, parse_roll
+from r2d7.metrics import timed
+from r2d7.singleflight import single_flight
+from r2d7.tracing import annotate, trace
 from typing import List, Union
 logger = logging.getLogger(__name__)
 
@@ -19,36 +26,95 @@ class ListLookupCog(commands.Cog):
         self.bot = bot
         self.embeds = []
         self.db = card_db
+        self.presence = companion_presence
+        self.xws_fetches = single_flight('xws_fetch')
         fmt.set_bot(self.bot)
+        message_dispatcher.register('list_lookup', ['http'], self.RE_LIST_URLS, self.handle_list_urls)
+
+    def cog_unload(self):
+        message_dispatcher.unregister('list_lookup')
 
     @commands.Cog.listener()
     async def on_ready(self):
+        for guild in self.bot.guilds:
+            await self.presence.refresh_guild(guild)
         logger.info('List lookup cog ready')
 
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        await self.presence.refresh_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.presence.forget_guild(guild.id)
+
+    @commands.Cog.listener()
+    async def on_presence_update(self, before, after):
+        self.presence.update(after)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.presence.update(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.presence.remove(member)
+
     @commands.slash_command(description="Look up X-Wing list from URL")
     @discord.option("URL", type=discord.SlashCommandOptionType.string)
     async def list(self, ctx: discord.ApplicationContext, url):
         await self.do_list_lookup(url, ctx.respond)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:  # Don't respond to myself or other bots.
-            return
-        # Skip list lookups if 4-A7 is on the channel
-        other_bot = discord.utils.get(message.channel.members, name='4-A7', discriminator='7543')
-        if (other_bot is not None) and (other_bot.raw_status == 'online'):
+    @commands.slash_command(description="Expected damage of each ship in a list against a target or another list")
+    @discord.option("URL", type=discord.SlashCommandOptionType.string)
+    @discord.option("versus", type=discord.SlashCommandOptionType.string, required=False,
+                    description="Another list URL, or a target defence roll e.g. 3 green with focus")
+    async def firepower(self, ctx: discord.ApplicationContext, url, versus='2 green'):
+        await ctx.respond('\n'.join(await self.do_firepower(url, versus)))
+
+    async def do_firepower(self, url, versus):
+        with trace('firepower', versus=versus):
+            return await self._do_firepower(url, versus)
+
+    async def _do_firepower(self, url, versus):
+        xws = await self.xws_fetches.do(url, self.get_xws, url)
+        if not xws:
+            return ['I couldn\'t find a list at that URL']
+        attackers = firepower.squad_profiles(self.db, xws)
+        if any(regex.match(versus) for regex in self.RE_LIST_URLS):
+            target_xws = await self.xws_fetches.do(versus, self.get_xws, versus)
+            if not target_xws:
+                return ['I couldn\'t find a list at the versus URL']
+            defenders = firepower.squad_profiles(self.db, target_xws)
+            target = target_xws.get('name', 'Nameless Squadron')
+        else:
+            try:
+                spec = parse_roll(versus)
+            except RollSyntaxError as err:
+                return [str(err), 'The target should be a defence roll, e.g. `3 green with focus`']
+            if spec.die_type != 'def':
+                return ['The target should roll green dice']
+            defenders = [firepower.roll_profile(spec, name=versus)]
+            target = versus
+        if not attackers or not defenders:
+            return ['There are no ships I recognise to compare']
+        annotate(attackers=len(attackers), defenders=len(defenders))
+        matrix = firepower.firepower_matrix(attackers, defenders)
+        title = fmt.bold(f"{xws.get('name', 'Nameless Squadron')} vs {target}")
+        return [f'{title}: expected damage per attack'] + firepower.print_matrix(attackers, defenders, matrix)
+
+    async def handle_list_urls(self, message, queries):
+        # Skip list lookups if 4-A7 is online in this server
+        if message.guild and self.presence.companion_online(message.guild.id):
             return
-        # Card Lookup
-        queries = []
-        for list_re in self.RE_LIST_URLS:
-            queries += list_re.findall(message.content)
-        if len(queries) > 10:
-            message.reply(content="Please use less than 10 search terms in your message")
-        for q in queries:
-            await self.do_list_lookup(q[0], message.reply, message)
+        with trace('list_lookup', source='message', urls=len(queries)):
+            if len(queries) > 10:
+                await message.reply(content="Please use less than 10 search terms in your message")
+            for q in queries:
+                await self.do_list_lookup(q[0], message.reply, message)
 
     async def do_list_lookup_old(self, url, reply_callback, message=None):
-        xws = self.get_xws(url)
+        xws = await self.xws_fetches.do(url, self.get_xws, url)
         if xws:
             embeds: List[Union[discord.Embed, str]] = self.get_list_embeds(xws)  # First item returned is a string
             title = embeds[0]
@@ -76,11 +142,16 @@ class ListLookupCog(commands.Cog):
             logger.error('Invalid URL - no XWS found')
 
     async def do_list_lookup(self, url, reply_callback, message=None):
-        xws = self.get_xws(url)
+        with trace('list_lookup', source='message' if message else 'command', urls=1):
+            await self._do_list_lookup(url, reply_callback, message)
+
+    async def _do_list_lookup(self, url, reply_callback, message=None):
+        xws = await self.xws_fetches.do(url, self.get_xws, url)
         if xws:
             embeds: List[Union[discord.Embed, str]] = self.get_list_embeds(xws)  # First item returned is a string
             title = embeds[0]
             embeds = embeds[1:]
+            annotate(embeds=len(embeds), chars=sum(len(embed.description) for embed in embeds))
             if message:
                 trailer =f"-# {message.author.display_name} requested this data.\n"
             else:
@@ -111,6 +182,7 @@ class ListLookupCog(commands.Cog):
                         await reply_callback(content=f'*(part {num + 1}/{len(embed_groups)})*',
                                              embeds=embed_groups[num], view=ConfirmDeleteView(message))
 
+    @timed('fetch')
     def get_xws(self, message):
         match = None
         for regex in self.RE_LIST_URLS:
@@ -137,6 +209,7 @@ class ListLookupCog(commands.Cog):
                 return None
             return data
 
+    @timed('render')
     def get_list_embeds(self, xws):
         formatter = ListFormatter(self.db, xws)
         output = formatter.print_list()
@@ -0,0 +1,26 @@
+import logging
+
+from discord.ext import commands
+from r2d7.DiscordR3.message_dispatcher import message_dispatcher
+
+logger = logging.getLogger(__name__)
+
+class MessageDispatcherCog(commands.Cog):
+    """
+    Owns the only on_message listener.  Other cogs register their triggers
+    and handlers with message_dispatcher instead of listening themselves.
+    """
+    def __init__(self, bot):
+        self.bot = bot
+        self.dispatcher = message_dispatcher
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        logger.info('Message dispatcher cog ready')
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        await self.dispatcher.dispatch(message)
+
+def setup(bot): # this is called by Pycord to set up the cog
+    bot.add_cog(MessageDispatcherCog(bot)) # add the cog to the bot
@@ -22,7 +22,9 @@ class TestCog(commands.Cog):
     async def info(self, ctx, query: str):
         aname = query.split('#')[0]
         anum = query.split('#')[1]
-        user = discord.utils.get(ctx.guild.members, name=aname, discriminator=anum)
+        # The member cache is not populated, so ask the gateway
+        members = await ctx.guild.query_members(query=aname, limit=5)
+        user = discord.utils.get(members, name=aname, discriminator=anum)
         return await ctx.respond(user)
 
     @discord.slash_command(description="Do not use!  Framework for random code testing.  Could crash the bot.")
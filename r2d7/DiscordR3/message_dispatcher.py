@@ -0,0 +1,94 @@
+import logging
+import time
+from collections import OrderedDict
+
+from r2d7.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MessageRoute(object):
+    """
+    A cog's interest in chat messages: the literal triggers that must appear
+    in a message before the (more expensive) regexes are run, and the
+    coroutine that handles any matches.
+    """
+    def __init__(self, name, triggers, regexes, handler):
+        self.name = name
+        self.triggers = tuple(triggers)
+        self.regexes = tuple(regexes)
+        self.handler = handler
+        self.matched = 0
+        self.total_time = 0.0
+
+    def find_matches(self, content):
+        if not any(trigger in content for trigger in self.triggers):
+            return []
+        matches = []
+        for regex in self.regexes:
+            matches += regex.findall(content)
+        return matches
+
+
+class MessageDispatcher(object):
+    """
+    Single on_message entry point shared by the DiscordR3 cogs.
+
+    Most messages contain none of the trigger strings, so they are rejected
+    with one substring scan instead of every cog running its own regexes.
+    Like discord_formatter, there is one global instance that cogs register
+    with when they are set up.
+    """
+    def __init__(self):
+        self.routes = OrderedDict()
+        self.triggers = ()
+        self.messages_seen = 0
+        self.messages_triggered = 0
+        self.total_time = 0.0
+
+    def register(self, name, triggers, regexes, handler):
+        # Registering under an existing name replaces it, so reloading a cog is safe
+        self.routes[name] = MessageRoute(name, triggers, regexes, handler)
+        self._update_triggers()
+
+    def unregister(self, name):
+        self.routes.pop(name, None)
+        self._update_triggers()
+
+    def _update_triggers(self):
+        self.triggers = tuple({trigger for route in self.routes.values() for trigger in route.triggers})
+
+    async def dispatch(self, message):
+        if message.author.bot:  # Don't respond to myself or other bots.
+            return
+        self.messages_seen += 1
+        content = message.content
+        if not any(trigger in content for trigger in self.triggers):
+            return
+        self.messages_triggered += 1
+        start = time.perf_counter()
+        for route in list(self.routes.values()):
+            matches = route.find_matches(content)
+            if not matches:
+                continue
+            route_start = time.perf_counter()
+            try:
+                await route.handler(message, matches)
+            except Exception:
+                logger.exception(f'Error handling message in {route.name}')
+            route.matched += 1
+            route.total_time += time.perf_counter() - route_start
+        self.total_time += time.perf_counter() - start
+
+    def stats(self):
+        return {
+            'messages_seen': self.messages_seen,
+            'messages_triggered': self.messages_triggered,
+            'total_time': self.total_time,
+            'routes': {name: {'matched': route.matched, 'total_time': route.total_time}
+                       for name, route in self.routes.items()},
+        }
+
+
+message_dispatcher = MessageDispatcher()
+metrics.collect_stats('r2d7_message_dispatcher', 'Chat messages seen by the DiscordR3 cogs', message_dispatcher.stats)
@@ -0,0 +1,62 @@
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class CompanionPresence(object):
+    """
+    Tracks which known companion bots are online in each guild.
+
+    Some servers also run other X-Wing bots (e.g. 4-A7) that print lists, and
+    we stay quiet when they are around.  Rather than scanning the member list
+    on every message, the index is kept up to date from gateway events and
+    answers with a dict lookup.  This lets the bot run without a full member
+    cache; only the companion bots themselves are cached, via query_members().
+    """
+    COMPANIONS = {('4-A7', '7543')}  # (name, discriminator)
+
+    def __init__(self, companions=COMPANIONS):
+        self.companions = set(companions)
+        self._online = defaultdict(set)  # guild id -> ids of online companions
+
+    def is_companion(self, member):
+        return (member.name, member.discriminator) in self.companions
+
+    def update(self, member):
+        if member.guild is None or not self.is_companion(member):
+            return
+        online = self._online[member.guild.id]
+        if str(member.raw_status) == 'online':
+            online.add(member.id)
+        else:
+            online.discard(member.id)
+        logger.debug(f'Companion {member.name} in guild {member.guild.id}: {member.raw_status}')
+
+    def remove(self, member):
+        if member.guild is not None:
+            self._online[member.guild.id].discard(member.id)
+
+    def forget_guild(self, guild_id):
+        self._online.pop(guild_id, None)
+
+    def companion_online(self, guild_id):
+        return bool(self._online.get(guild_id))
+
+    async def refresh_guild(self, guild):
+        """
+        Seed the index for a guild.  Asks the gateway for the companion members
+        with their presences, and caches them so later presence updates reach us.
+        """
+        self.forget_guild(guild.id)
+        for name in {name for name, _ in self.companions}:
+            try:
+                members = await guild.query_members(query=name, limit=5, presences=True, cache=True)
+            except Exception as err:
+                logger.warning(f'Unable to query companion bots in guild {guild.id}: {err}')
+                continue
+            for member in members:
+                self.update(member)
+
+
+companion_presence = CompanionPresence()
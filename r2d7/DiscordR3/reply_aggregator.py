@@ -0,0 +1,95 @@
+import logging
+
+from r2d7.metrics import timed
+from r2d7.tracing import annotate
+
+logger = logging.getLogger(__name__)
+
+
+class ReplyAggregator(object):
+    """
+    Collects all the replies generated for a single user message so they can
+    be sent with as few Discord API calls as possible.
+
+    Unambiguous results are packed into shared messages, limited by the number
+    of embeds and total embed size Discord allows per message.  Results that
+    need their own view (select menus, pilot pickers) always get a message of
+    their own because their callbacks edit or delete the message they are on.
+    """
+    MAX_EMBEDS = 10  # per message
+    MAX_EMBED_CHARS = 6000  # total across all embeds in a message
+    MAX_CONTENT_CHARS = 2000
+
+    def __init__(self, reply_callback):
+        self.reply_callback = reply_callback
+        self.embeds = []
+        self.notes = []
+        self.view_replies = []
+
+    def add_embeds(self, embeds):
+        self.embeds.extend(embeds)
+
+    def add_note(self, text):
+        self.notes.append(text)
+
+    def add_view_reply(self, **kwargs):
+        self.view_replies.append(kwargs)
+
+    def _embed_groups(self):
+        groups = []
+        group = []
+        char_count = 0
+        for embed in self.embeds:
+            embed_chars = len(embed)
+            if group and (len(group) >= self.MAX_EMBEDS or
+                          char_count + embed_chars > self.MAX_EMBED_CHARS):
+                groups.append(group)
+                group = []
+                char_count = 0
+            group.append(embed)
+            char_count += embed_chars
+        if group:
+            groups.append(group)
+        return groups
+
+    def _content_chunks(self):
+        chunks = []
+        chunk = ''
+        for note in self.notes:
+            note = note[:self.MAX_CONTENT_CHARS]
+            if chunk and len(chunk) + len(note) + 1 > self.MAX_CONTENT_CHARS:
+                chunks.append(chunk)
+                chunk = ''
+            chunk = f'{chunk}\n{note}' if chunk else note
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def messages(self):
+        """
+        Returns the keyword arguments for each message that flush() will send
+        """
+        messages = []
+        contents = self._content_chunks()
+        groups = self._embed_groups()
+        for i in range(max(len(contents), len(groups))):
+            message = {}
+            if i < len(contents):
+                message['content'] = contents[i]
+            if i < len(groups):
+                message['embeds'] = groups[i]
+            messages.append(message)
+        messages.extend(self.view_replies)
+        return messages
+
+    async def flush(self):
+        messages = self.messages()
+        logger.debug(f'Sending {len(messages)} message(s) for {len(self.embeds)} embed(s)')
+        annotate(messages=len(messages), embeds=len(self.embeds))
+        for message in messages:
+            with timed('send'):
+                await self.reply_callback(**message)
+        self.embeds = []
+        self.notes = []
+        self.view_replies = []
+        return len(messages)
@@ -8,7 +8,10 @@ import urllib.parse as url_parse
 from collections import defaultdict
 from itertools import groupby
 from urllib.parse import quote
+from r2d7.cardindex import ConditionIndex
+from r2d7.metrics import metrics, timed
 from r2d7.XWing.legality import CardLegality
+from r2d7.XWing.name_trie import PrefixTrie
 from r2d7.DiscordR3.discord_formatter import discord_formatter as fmt
 
 import requests
@@ -71,7 +74,33 @@ class XwingDB(object):
         self.cards.extend([d for d in self.damage_deck.values()])
         for ships in self.ships.factions.values():
             self.cards.extend([s for s in ships.values()])
-        pass
+        self.cards_by_unique_name = {card.unique_name: card for card in self.cards}
+        self.condition_index = ConditionIndex(self.conditions.values(), lambda condition: condition.xws)
+        for card in self.cards:
+            if card.conditions:
+                self.condition_index.link(card.unique_name, card.conditions)
+        self.name_trie = self._build_name_trie()
+
+    def _build_name_trie(self):
+        # Rebuilt with the rest of the snapshot whenever the data version changes
+        trie = PrefixTrie()
+        for card in self.cards:
+            name = card.name or ''
+            tiebreak = (len(name), name)
+            trie.insert(name, card, (0,) + tiebreak)
+            for nickname in card.nicknames or []:
+                trie.insert(nickname, card, (1,) + tiebreak)
+            if card.xws:
+                trie.insert(card.xws, card, (1,) + tiebreak)
+            # Let "skywalker" find Luke as well as "luke"
+            words = PrefixTrie.normalize(name).split(' ')
+            for i in range(1, len(words)):
+                trie.insert(' '.join(words[i:]), card, (2,) + tiebreak)
+        trie.freeze()
+        return trie
+
+    def complete_card_name(self, prefix, limit=25):
+        return self.name_trie.complete(prefix, limit)
 
     def get_json(self, json_paths):
         ret = []
@@ -103,6 +132,7 @@ class XwingDB(object):
                 logger.debug(f'Old version: {self.version}, new version: {new_version}.  Updating...')
                 self.__init__()
 
+    @timed('search')
     def search_cards(self, search_str, test=False):
         name_results = []
         name_results_100 = []
@@ -254,6 +284,10 @@ class CardData():
             out = {'label': f'{("•" * self.limited)} {self.name or self.title}'}
             return out
 
+    def autocomplete_label(self):
+        # Plain text only - autocomplete choices can't show emoji
+        return self.name or self.title
+
     def print_ship_stats(self):
         # generates a single line of stat icons for a pilot or ship card
         if self.ship:  # This is a pilot card
@@ -597,6 +631,9 @@ class Upgrade(Card):
             out['label'] += f'{cost}'
         return out
 
+    def autocomplete_label(self):
+        return f'{self.name} ({self.sides[0].type})'
+
     def print_side(self, side):
         out = ''
         out += side.print_keywords()
@@ -612,8 +649,8 @@ class Upgrade(Card):
             else:
                 out += self.print_device(self.device)
 
-            for condition in self.conditions or []:
-                out += str(side.db.conditions_xws_index[condition])
+            for condition in side.db.condition_index.for_card(self.unique_name):
+                out += str(condition)
 
         out = out.format_map(fmt.emoji_map)
         return out
@@ -660,8 +697,8 @@ class Pilot(Card):
         out += self.token_ship_ability or ''
         out += self.print_keywords() + '\n'
         out += self.print_last(self)
-        for condition in self.conditions or []:
-            out += str(self.db.conditions_xws_index[condition])
+        for condition in self.db.condition_index.for_card(self.unique_name):
+            out += str(condition)
         out = out.format_map(fmt.emoji_map)
         return out
 
@@ -681,6 +718,9 @@ class Pilot(Card):
         out['label'] += f' {self.print_mode()} {self.print_cost()}'
         return out
 
+    def autocomplete_label(self):
+        return f'{self.name} ({self.ship.name}, {self.db.factions[self.ship.faction]["name"]})'
+
     def pilot_select_line(self):
         # Used when selecting pilots from a ship
         out = {'label': f'{self.name} ',
@@ -792,6 +832,9 @@ class Ship(CardData):
             out['label'] += ' (Standard Loadout)'
         return out
 
+    def autocomplete_label(self):
+        return f'{self.name} (Ship, {self.db.factions[self.faction]["name"]})'
+
     def get_grouped_pilots(self):
         pilots = defaultdict(list)
         # Add common options to fix order
@@ -840,6 +883,9 @@ class Damage(Card):
         ret += 'damage'
         return ret
 
+    def autocomplete_label(self):
+        return f'{self.title} (Damage)'
+
     def _format_name(self, card_name):
         # This card type doesn't have a wiki link
         return fmt.bold(card_name)
@@ -867,6 +913,9 @@ class Condition(Card):
         ret += 'condition'
         return ret
 
+    def autocomplete_label(self):
+        return f'{self.name} (Condition)'
+
 class ShipDb(object):
     def __init__(self, pilots_json, db):
         self.db = db
@@ -908,6 +957,7 @@ def main():
     pass
 
 card_db = XwingDB()
+metrics.info('r2d7_card_data', 'Version of the card data loaded', lambda: {'version': card_db.version})
 
 if __name__ == '__main__':
     main()
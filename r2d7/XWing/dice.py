@@ -1,6 +1,8 @@
 from enum import Enum
 import random
 
+import numpy as np
+
 class DieType(Enum):
     attack = 'atk'
     defense = 'def'
@@ -63,6 +65,7 @@ class AttackDie(Die):
             None: ' ? '
             }
     _positive_faces = ['hit', 'crit']
+    _display_order = ['crit', 'hit', 'focus', 'blank']
     die_type = DieType.attack
 
 class DefenseDie(Die):
@@ -75,6 +78,7 @@ class DefenseDie(Die):
             None: ' ? '
             }
     _positive_faces = ['evade']
+    _display_order = ['evade', 'focus', 'blank']
     die_type = DieType.defense
 
     def evade(self):
@@ -88,3 +92,90 @@ dieFactory = {
         DieType.defense: DefenseDie
         }
 
+
+class DicePool(object):
+    """
+    A roll of identical dice, stored as a count per face rather than one
+    object per die.  Rolling and modifying work on whole faces at once, so a
+    100 dice roll costs the same as a 3 dice one.
+    """
+    _rng = np.random.default_rng()
+
+    def __init__(self, die_type, num_dice):
+        self.die = dieFactory[die_type]
+        self.die_type = die_type
+        self.faces = sorted(set(self.die._faces), key=self.die._display_order.index)
+        self._p = [self.die._faces.count(face) / len(self.die._faces) for face in self.faces]
+        self.counts = dict.fromkeys(self.faces, 0)
+        self._add(self.roll(num_dice))
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def __getitem__(self, face):
+        return self.counts.get(face, 0)
+
+    def _add(self, counts):
+        for face, count in counts.items():
+            self.counts[face] += count
+
+    def roll(self, num_dice):
+        """
+        Rolls num_dice new dice and returns their face counts
+        """
+        return dict(zip(self.faces, self._rng.multinomial(num_dice, self._p).tolist()))
+
+    def probabilities(self):
+        """
+        Chance of (good, crit, focus, blank) on one die, the face order used by
+        r2d7.probability and r2d7.simulator
+        """
+        p = dict(zip(self.faces, self._p))
+        return (p[self.die._focussed], p.get('crit', 0), p['focus'], p['blank'])
+
+    def reroll(self, num_dice, keep_focus=0):
+        """
+        Rerolls up to num_dice dice. Blanks go first, then any focus results
+        beyond the keep_focus that can be changed later.
+        Returns the number of dice rerolled.
+        """
+        blanks = min(self.counts['blank'], num_dice)
+        focus = min(max(0, self.counts['focus'] - keep_focus), num_dice - blanks)
+        self.counts['blank'] -= blanks
+        self.counts['focus'] -= focus
+        self._add(self.roll(blanks + focus))
+        return blanks + focus
+
+    def focus(self, num_dice):
+        """
+        Changes up to num_dice focus results. Returns the number changed.
+        """
+        changed = min(self.counts['focus'], num_dice)
+        self.counts['focus'] -= changed
+        self.counts[self.die._focussed] += changed
+        return changed
+
+    def evade(self, num_dice):
+        """
+        Changes up to num_dice blank or focus results to evades, blanks first.
+        Returns the number changed.
+        """
+        if self.die_type != DieType.defense:
+            return 0
+        changed = 0
+        for face in ('blank', 'focus'):
+            count = min(self.counts[face], num_dice - changed)
+            self.counts[face] -= count
+            changed += count
+        self.counts['evade'] += changed
+        return changed
+
+    def set_faces(self, **counts):
+        """
+        Replaces the roll with the given face counts
+        """
+        self.counts = dict.fromkeys(self.faces, 0)
+        self._add(counts)
+
+    def __str__(self):
+        return ''.join(self.die._emoji[face] * count for face, count in self.counts.items())
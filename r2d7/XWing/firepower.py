@@ -0,0 +1,145 @@
+import logging
+from typing import NamedTuple
+
+import numpy as np
+
+from .. import hittables
+
+logger = logging.getLogger(__name__)
+
+# Expected damage of every ship in a squad shooting at every ship in another
+# squad (or at a target described as a defence roll), worked out as one batch.
+#
+# Each ship is reduced to a profile: its best primary attack value, its
+# agility and the token its one action would get it.  Every distinct attack
+# and defence profile is looked up once from the hit tables and turned into
+# a vector of the chance of each total, then the whole matrix is a single
+# einsum over those vectors and a damage table.
+#
+# The assumptions are the ones a list reviewer would make at range 2:
+#   - primary attacks only, no range bonus, no upgrades
+#   - each ship takes its best action (focus, then calculate, then lock for
+#     attacks, evade for defence) and has it whether attacking or defending
+#   - force charges are spent as focus results on whichever roll it is
+
+ACTION_PREFERENCE = ('Focus', 'Calculate', 'Lock', 'Evade')
+
+
+class Profile(NamedTuple):
+    name: str
+    attack: int = 0
+    agility: int = 0
+    focus: bool = False
+    lock: bool = False
+    calculate: int = 0
+    evade: int = 0
+    force: int = 0
+    reinforce: int = 0
+    reroll: int = 0
+
+    def attack_distribution(self):
+        return hittables.attack_roll(self.attack, focus=self.focus, calculate=self.calculate,
+                                     force=self.force, lock=self.lock)
+
+    def defense_distribution(self):
+        return hittables.defense_roll(self.agility, focus=self.focus, calculate=self.calculate,
+                                      force=self.force, evade=self.evade, reroll=self.reroll)
+
+
+def pilot_profile(pilot):
+    """
+    Profile for a Pilot card, from its ship's stats and actions
+    """
+    ship = pilot.ship
+    attack = max((stat['value'] for stat in ship.stats if stat['type'] == 'attack'), default=0)
+    agility = next((stat['value'] for stat in ship.stats if stat['type'] == 'agility'), 0)
+    actions = {action['type'] for action in (pilot.shipActions or ship.actions or [])}
+    action = next((action for action in ACTION_PREFERENCE if action in actions), None)
+    return Profile(
+        name=pilot.name,
+        attack=attack,
+        agility=agility,
+        focus=action == 'Focus',
+        lock=action == 'Lock',
+        calculate=1 if action == 'Calculate' else 0,
+        evade=1 if action == 'Evade' else 0,
+        force=pilot.force['value'] if pilot.force else 0)
+
+
+def roll_profile(spec, name='Target'):
+    """
+    Defence-only profile for a target described as a roll, e.g. 3 green with focus
+    """
+    return Profile(name=name, agility=spec.dice, focus=spec.focus, calculate=spec.calculate,
+                   evade=spec.evade, force=spec.force, reinforce=spec.reinforce, reroll=spec.reroll)
+
+
+def squad_profiles(db, xws):
+    """
+    Profiles for the pilots of an XWS squad. Unknown pilots are left out.
+    """
+    profiles = []
+    for pilot in xws['pilots']:
+        try:
+            profiles.append(pilot_profile(db.pilots_xws_index[pilot['id']]))
+        except KeyError:
+            logger.warning(f'Unknown pilot in firepower squad: {pilot["id"]}')
+    return profiles
+
+
+def _totals(distributions, size):
+    """
+    One row per distribution, the chance of each total number of results
+    """
+    vectors = np.zeros((len(distributions), size))
+    for row, distribution in enumerate(distributions):
+        for total, p in distribution.totals().items():
+            vectors[row, total] = p
+    return vectors
+
+
+def _damage_table(size, reinforce):
+    """
+    damage[reinforce][hits][evades], the damage that gets through, with
+    reinforce cancelling extra results if 2 or more would land but never the last
+    """
+    hits = np.arange(size)[:, None]
+    evades = np.arange(size)[None, :]
+    landed = np.maximum(hits - evades, 0)
+    damage = np.empty((len(reinforce), size, size))
+    for i, tokens in enumerate(reinforce):
+        damage[i] = np.where(landed >= 2, landed - np.minimum(tokens, landed - 1), landed)
+    return damage
+
+
+def firepower_matrix(attackers, defenders):
+    """
+    Expected damage of each attacker (rows) against each defender (columns)
+    """
+    # Ships with the same profile share their lookups
+    attack_keys = [profile._replace(name='') for profile in attackers]
+    defense_keys = [profile._replace(name='') for profile in defenders]
+    unique_attacks = list(dict.fromkeys(attack_keys))
+    unique_defenses = list(dict.fromkeys(defense_keys))
+    size = max([p.attack for p in unique_attacks] + [p.agility for p in unique_defenses]) + 1
+
+    attack = _totals([p.attack_distribution() for p in unique_attacks], size)
+    defense = _totals([p.defense_distribution() for p in unique_defenses], size)
+    damage = _damage_table(size, [p.reinforce for p in unique_defenses])
+    matrix = np.einsum('ah,dhe,de->ad', attack, damage, defense)
+
+    rows = [unique_attacks.index(key) for key in attack_keys]
+    columns = [unique_defenses.index(key) for key in defense_keys]
+    return matrix[np.ix_(rows, columns)]
+
+
+def print_matrix(attackers, defenders, matrix, name_width=20):
+    """
+    The matrix as a fixed width table, defenders numbered across the top
+    """
+    header = ' ' * name_width + ''.join(f'{col + 1:>6}' for col in range(len(defenders)))
+    lines = [header]
+    for profile, row in zip(attackers, matrix):
+        lines.append(f'{profile.name[:name_width]:<{name_width}}' + ''.join(f'{damage:6.2f}' for damage in row))
+    key = ', '.join(f'{col + 1}: {profile.name}' for col, profile in enumerate(defenders))
+    return ['```\n' + '\n'.join(lines) + '\n```', key]
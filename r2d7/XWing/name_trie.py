@@ -0,0 +1,76 @@
+import re
+
+
+class _TrieNode(object):
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = []
+
+
+class PrefixTrie(object):
+    """
+    Prefix trie used for slash command autocomplete.
+
+    Every node keeps its own ranked list of the best matches below it, so a
+    completion is a walk down the query's characters and a slice - no scan of
+    the card list and no fuzzy matching.  Build a new trie when the data
+    changes; it is not meant to be modified once frozen.
+    """
+    RE_STRIP = re.compile(r'[^a-z0-9 ]')
+    RE_SPACES = re.compile(r' +')
+
+    def __init__(self, limit=25):
+        self.limit = limit
+        self.root = _TrieNode()
+        self._frozen = False
+
+    @classmethod
+    def normalize(cls, text):
+        text = cls.RE_STRIP.sub('', text.lower().replace('-', ' '))
+        return cls.RE_SPACES.sub(' ', text).strip()
+
+    def insert(self, key, item, rank):
+        """
+        Add item under key. Lower ranks are listed first.
+        """
+        key = self.normalize(key)
+        if not key:
+            return
+        node = self.root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.entries.append((rank, id(item), item))
+        self._frozen = False
+
+    def freeze(self):
+        """
+        Sort and trim the entries at every node. Called automatically by
+        complete() if anything has been inserted since the last freeze.
+        """
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children.values())
+            best = []
+            seen = set()
+            for rank, item_id, item in sorted(node.entries, key=lambda entry: entry[0]):
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                best.append((rank, item_id, item))
+                if len(best) == self.limit:
+                    break
+            node.entries = best
+        self._frozen = True
+
+    def complete(self, prefix, limit=None):
+        if not self._frozen:
+            self.freeze()
+        node = self.root
+        for char in self.normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [item for _, _, item in node.entries[:limit or self.limit]]
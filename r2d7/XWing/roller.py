@@ -1,132 +1,63 @@
 from enum import Enum
 import logging
-import re
 import random
 from ..calculator import *
-from .dice import DieType, AttackDie, DefenseDie, dieFactory
+from .. import hittables
+from .. import probability
+from .. import simulator
+from ..rollparser import RollSyntaxError, parse_roll
+from .dice import DieType, DicePool
 
 logger = logging.getLogger(__name__)
 
-class RollSyntaxError(Exception):
-    pass
 
-class ModdedRoll(object):
+def hit_chances(outcome, max_hits):
     """
-    Class for managing all aspects of a roll. It parses, it rolls, it queries the online calculator.
+    (hits, chance of at least that many) for each number of hits that could happen
     """
-    _re_def = '\\b((green(s)?)|(g))\\b'
-    _re_atk = '\\b((red(s)?)|(r))\\b'
-    pattern_def = re.compile(_re_def, re.I)
-    pattern_atk = re.compile(_re_atk, re.I)
-    pattern_main = re.compile(f'(?P<num_dice>[0-9]+) ?(?P<color>{_re_def}|{_re_atk})', re.I)
-    pattern_count = re.compile('([0-9]+)', re.I)
-    pattern_mod = {
-            # \\b at the start forces a new word (stops force/reinforce confusion)
-            # leaving it off the end allows plural matching
-            'focus':re.compile('\\b(?P<focus>([0-9]+ ?focus)|(focus ?[0-9]*))', re.I),
-            'evade':re.compile('\\b(?P<evade>([0-9]+ ?evade)|(evade ?[0-9]*))', re.I),
-            'reinforce':re.compile('\\b(?P<reinforce>([0-9]+ ?reinforce)|(reinforce ?[0-9]*))', re.I),
-            'lock':re.compile('\\b(target )?lock(ed)?\\b', re.I),
-            'calculate':re.compile('\\b(?P<calculate>([0-9]+ ?calc(ulate)?)|(calc(ulate)? ?[0-9]*))', re.I),
-            'force':re.compile('\\b(?P<force>([0-9]+ ?force)|(force ?[0-9]*))', re.I),
-            'reroll':re.compile('\\b(?P<reroll>([0-9]+ ?reroll)|(reroll ?[0-9]*))', re.I)
-    }
+    chances = [(hits, outcome.at_least(hits)) for hits in range(1, max_hits + 1)]
+    return [(hits, chance) for hits, chance in chances if chance >= 0.0005]
 
-    def __init__(self, message):
-        match_main = ModdedRoll.pattern_main.search(message)
-        if not match_main:
-            logger.debug(f'roll parsing error: bad roll syntax: {message}')
-            raise RollSyntaxError('I don\'t understand what you want me to roll. :barrelroll:?')
-            return
 
-        try:
-            num_dice = int(match_main.group('num_dice'))
-        except Exception as err:
-            logger.debug(f'roll parsing error: unknown number of dice: {str(err)} \n message: {message}')
-            raise RollSyntaxError('I don\'t know how many dice you want me to roll')
-
-        if num_dice > 100:
-            logger.debug(f'Too many dice requested (max: 100, requested: {num_dice})')
-            raise RollSyntaxError('Sorry, I can\'t carry more than 100 dice, and chopper won\'t help :chopper:')
-        elif num_dice < 1:
-            logger.debug(f'Too few dice requested (min: 1, requested: {num_dice})')
-            raise RollSyntaxError('Sorry, I can\'t roll fewer than 1 dice :jar_jar:')
-
-        if ModdedRoll.pattern_atk.search(message):
-            self.die_type = DieType.attack
-        elif ModdedRoll.pattern_def.search(message):
-            self.die_type = DieType.defense
-        else:
-            logger.debug('roll parsing error: no dice color found')
-            raise RollSyntaxError('I don\'t know what color dice you want me to roll')
-        self.dice = [dieFactory[self.die_type]() for i in range(num_dice)]
-
-        try:
-            self.parse_mod_boolean('focus', message)
-            self.parse_mod_boolean('lock', message)
-            self.parse_mod_numeric('evade', message)
-            self.parse_mod_numeric('reinforce', message)
-            self.parse_mod_numeric('calculate', message)
-            self.parse_mod_numeric('force', message)
-            self.parse_mod_numeric('reroll', message)
-
-        except Exception as err:
-            logger.debug(f'roll parsing error: {str(err)} \n message: {message}')
-            raise RollSyntaxError('Incorrect dice roll syntax. Someone call a judge.')
-
-        if self.reroll > 3:
-            logger.debug(f'Too many rerolls requested (max: 3, requested: {self.reroll})')
-            raise RollSyntaxError('Sorry, the calculator only allows up to 3 rerolls')
+class ModdedRoll(object):
+    """
+    Class for managing all aspects of a roll. It parses, it rolls, it works out the odds.
+    """
+    def __init__(self, message):
+        self.spec = parse_roll(message)
+        self.die_type = DieType(self.spec.die_type)
+        self.dice = DicePool(self.die_type, self.spec.dice)
+        self.focus = self.spec.focus
+        self.lock = self.spec.lock
+        self.evade = self.spec.evade
+        self.reinforce = self.spec.reinforce
+        self.calculate = self.spec.calculate
+        self.force = self.spec.force
+        self.reroll = self.spec.reroll
 
         self.modify_dice()
         self.calculator_url = None
         self.calculator_url_description = None
         self.calculator_result = None
-
-    def parse_mod_boolean(self, attr_name, message):
-        value = ModdedRoll.pattern_mod[attr_name].search(message) is not None
-        setattr(self, attr_name, value)
-
-    def parse_mod_numeric(self, attr_name, message):
-        match_mod = ModdedRoll.pattern_mod[attr_name].search(message)
-        if match_mod:
-            match_count = ModdedRoll.pattern_count.search(match_mod.group(1))
-            value = int(match_count.group(1)) if match_count is not None else 1
-        else:
-            value = 0
-        setattr(self, attr_name, value)
+        self.calculator_error = None
+        self.crit_chance = None
+        self.hit_chances = None
 
     def modify_dice(self):
-        if not self.dice:
+        if not len(self.dice):
             return
+        # this is a 1-off roll so we can spend tokens greedily
+        conversions = len(self.dice) if self.focus else self.calculate + self.force
 
-        #reroll first!
+        #reroll first! Focus results we can change are kept
         if self.die_type == DieType.attack and self.lock:
-            [d.reroll() for d in self.dice]
+            self.dice.reroll(len(self.dice), keep_focus=conversions)
         elif self.reroll > 0:
-            rerolls = self.reroll
-            for d in self.dice:
-                rerolls = rerolls - 1 if d.reroll() else rerolls
-                if rerolls == 0:
-                    break
+            self.dice.reroll(self.reroll, keep_focus=conversions)
 
         # after reroll, apply other mods
-        # this is a 1-off calculation so we can spend force greedily
-        calculates = self.calculate
-        force = self.force
-        evades = self.evade
-        for d in self.dice:
-            focussed = False
-            if self.focus:
-                focussed = d.focus()
-            elif calculates > 0:
-                focussed = d.focus()
-                calculates = calculates - 1 if focussed else calculates
-            elif force > 0:
-                focussed = d.focus()
-                force = force - 1 if focussed else force
-            if not focussed and evades > 0 and d.die_type == DieType.defense:
-                evades = evades - 1 if d.evade() else evades
+        self.dice.focus(conversions)
+        self.dice.evade(self.evade)
 
     def calculator_safe(self):
         return len(self.dice) <= CalculatorForm.max_dice and self.reinforce <= CalculatorForm.max_reinforce
@@ -154,28 +85,92 @@ class ModdedRoll(object):
                     reroll = self.reroll)
         return form
 
+    def calculator(self):
+        """
+        Builds the calculator for this roll. Nothing is sent until it is run.
+        """
+        if self.die_type == DieType.attack:
+            return Calculator(attack_form = self.calculator_form(), defense_form = DefenseForm())
+        else:
+            attack_form = AttackForm(dice = len(self.dice), all_hits = True)
+            return Calculator(attack_form = attack_form, defense_form = self.calculator_form())
+
+    def set_calculator_result(self, calculator):
+        self.calculator_url = calculator.url
+        if self.die_type == DieType.attack:
+            self.calculator_url_description = 'Expected total hits:'
+        else:
+            self.calculator_url_description = f'Expected damage suffered from {len(self.dice)} hits:'
+        self.calculator_result = calculator.expected_hits()
+
+    def calculator_permalink(self):
+        """
+        Link to this roll on the calculator if we've had it calculated before,
+        otherwise the calculator's front page
+        """
+        calculator = self.calculator()
+        return calculator.url if calculator.from_cache() else Calculator._human_url
+
+    def distribution(self):
+        """
+        Exact distribution of the modified roll, before any opposing roll
+        """
+        if self.die_type == DieType.attack:
+            return hittables.attack_roll(len(self.dice), focus=self.focus, calculate=self.calculate,
+                                         force=self.force, lock=self.lock, reroll=self.reroll)
+        else:
+            return hittables.defense_roll(len(self.dice), focus=self.focus, calculate=self.calculate,
+                                          force=self.force, evade=self.evade, reroll=self.reroll)
+
+    def outcome(self):
+        if self.die_type == DieType.attack:
+            return probability.resolve(self.distribution())
+        else:
+            return probability.resolve(probability.all_hits(len(self.dice)), self.distribution(), self.reinforce)
+
+    def pool(self):
+        if self.die_type == DieType.attack:
+            return simulator.attack_pool(len(self.dice), focus=self.focus, calculate=self.calculate,
+                                         force=self.force, lock=self.lock, reroll=self.reroll)
+        else:
+            return simulator.defense_pool(len(self.dice), focus=self.focus, calculate=self.calculate,
+                                          force=self.force, evade=self.evade, reroll=self.reroll)
+
+    def simulate(self):
+        if self.die_type == DieType.attack:
+            return simulator.simulate(self.pool())
+        else:
+            return simulator.simulate(simulator.all_hits_pool(len(self.dice)), self.pool(), self.reinforce)
+
+    def exact_safe(self):
+        """
+        True if the odds can be worked out exactly rather than simulated
+        """
+        return self.calculator_safe() or hittables.covers(len(self.dice))
+
     def calculate_expected(self):
-        if self.calculator_safe():
-            try:
-                if self.die_type == DieType.attack:
-                    calculator = Calculator(attack_form = self.calculator_form(), defense_form = DefenseForm())
-                    calculator.calculate()
-                    self.calculator_url = calculator.url
-                    self.calculator_url_description = 'Expected total hits:'
-                    self.calculator_result = calculator.expected_hits()
-                else:
-                    num_dice = len(self.dice)
-                    attack_form = AttackForm(dice = num_dice, all_hits = True)
-                    calculator = Calculator(attack_form = attack_form, defense_form = self.calculator_form())
-                    calculator.calculate()
-                    self.calculator_url = calculator.url
-                    self.calculator_url_description = f'Expected damage suffered from {num_dice} hits:'
-                    self.calculator_result = calculator.expected_hits()
-            except Exception as err:
-                logger.debug(f'Dice calculator error: {str(err)}')
+        # Worked out locally, so there's no network call. The link goes to the
+        # calculator for anyone who wants to explore the roll further, but only
+        # when the calculator can handle the roll; big rolls are simulated.
+        if self.exact_safe():
+            outcome = self.outcome()
+            self.calculator_url = self.calculator_permalink() if self.calculator_safe() else None
+            self.calculator_error = None
+            self.hit_chances = hit_chances(outcome, len(self.dice))
+        else:
+            outcome = self.simulate()
+            self.calculator_url = None
+            self.calculator_error = outcome.confidence
+            self.hit_chances = None
+        if self.die_type == DieType.attack:
+            self.calculator_url_description = 'Expected total hits:'
+        else:
+            self.calculator_url_description = f'Expected damage suffered from {len(self.dice)} hits:'
+        self.calculator_result = outcome.expected_hits()
+        self.crit_chance = outcome.crit_chance()
 
     def actual_roll(self):
-        output = ''.join([str(d) for d in self.dice])
+        output = str(self.dice)
         # reinforce is a special case
         # It can't be meaningfully added without knowing the attack roll
         # Instead of implementing it as an added result, just show that
@@ -197,20 +192,52 @@ class VsRoll(object):
         self.calculator_url = None
         self.calculator_url_description = None
         self.calculator_result = None
+        self.calculator_error = None
+        self.crit_chance = None
+        self.hit_chances = None
 
     def calculator_safe(self):
         return self.atk_roll.calculator_safe() and self.def_roll.calculator_safe()
 
+    def calculator(self):
+        return Calculator(attack_form = self.atk_roll.calculator_form(), defense_form = self.def_roll.calculator_form())
+
+    def set_calculator_result(self, calculator):
+        self.calculator_url = calculator.url
+        self.calculator_url_description = 'Expected total hits:'
+        self.calculator_result = calculator.expected_hits()
+
+    def calculator_permalink(self):
+        """
+        Link to this roll on the calculator if we've had it calculated before,
+        otherwise the calculator's front page
+        """
+        calculator = self.calculator()
+        return calculator.url if calculator.from_cache() else Calculator._human_url
+
+    def outcome(self):
+        return probability.resolve(self.atk_roll.distribution(), self.def_roll.distribution(), self.def_roll.reinforce)
+
+    def simulate(self):
+        return simulator.simulate(self.atk_roll.pool(), self.def_roll.pool(), self.def_roll.reinforce)
+
+    def exact_safe(self):
+        return self.atk_roll.exact_safe() and self.def_roll.exact_safe()
+
     def calculate_expected(self):
-        if self.calculator_safe():
-            try:
-                calculator = Calculator(attack_form = self.atk_roll.calculator_form(), defense_form = self.def_roll.calculator_form())
-                calculator.calculate()
-                self.calculator_url = calculator.url
-                self.calculator_url_description = 'Expected total hits:'
-                self.calculator_result = calculator.expected_hits()
-            except Exception as err:
-                logger.debug(f'Dice calculator error: {str(err)}')
+        if self.exact_safe():
+            outcome = self.outcome()
+            self.calculator_url = self.calculator_permalink() if self.calculator_safe() else None
+            self.calculator_error = None
+            self.hit_chances = hit_chances(outcome, len(self.atk_roll.dice))
+        else:
+            outcome = self.simulate()
+            self.calculator_url = None
+            self.calculator_error = outcome.confidence
+            self.hit_chances = None
+        self.calculator_url_description = 'Expected total hits:'
+        self.calculator_result = outcome.expected_hits()
+        self.crit_chance = outcome.crit_chance()
 
     def actual_roll(self):
         output = ['You rolled:']
@@ -0,0 +1,171 @@
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 10  # seconds between heartbeats a child sends
+
+_heartbeat_conn = None
+_heartbeat_lock = threading.Lock()
+_last_heartbeat = 0
+
+
+def heartbeat():
+    """
+    Tells the supervisor this process is still doing its work. Bots call it
+    from their main loops; it sends at most one beat per HEARTBEAT_INTERVAL
+    and does nothing when the bot isn't running under a supervisor.
+    """
+    global _last_heartbeat
+    if _heartbeat_conn is None:
+        return
+    now = time.time()
+    if now - _last_heartbeat < HEARTBEAT_INTERVAL:
+        return
+    with _heartbeat_lock:
+        _last_heartbeat = now
+        try:
+            _heartbeat_conn.send(now)
+        except OSError:
+            pass
+
+
+def _child_main(target, conn):
+    global _heartbeat_conn, _last_heartbeat
+    _heartbeat_conn = conn
+    _last_heartbeat = 0
+    target()
+
+
+class Child(object):
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self.process = None
+        self.conn = None
+        self.started = 0
+        self.last_beat = None
+        self.restart_at = None
+        self.backoff = 0
+        self.restarts = 0
+
+
+class Supervisor(object):
+    """
+    Runs each bot in a process of its own and restarts it as soon as it
+    exits, by waiting on the process sentinels rather than polling.
+
+    Children report in with heartbeat(). One that has beaten and then gone
+    quiet for heartbeat_timeout seconds is treated as hung and killed; a
+    child that never beats is only restarted when it exits.  Restarts back
+    off exponentially from min_backoff to max_backoff; a child that stayed
+    up for stable_after seconds starts again from min_backoff.
+    """
+    def __init__(self, targets, heartbeat_timeout=90,
+                 min_backoff=1, max_backoff=60, stable_after=300):
+        self.children = [Child(name, target) for name, target in targets.items()]
+        self.heartbeat_timeout = heartbeat_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.keep_running = True
+
+    def start(self):
+        for child in self.children:
+            self._start(child)
+
+    def _start(self, child):
+        reader, writer = Pipe(duplex=False)
+        child.process = Process(target=_child_main, args=(child.target, writer), name=child.name)
+        child.process.start()
+        # Only the child writes, so the reader sees EOF if it dies
+        writer.close()
+        child.conn = reader
+        child.started = time.monotonic()
+        child.last_beat = None
+        child.restart_at = None
+
+    def _deadline(self, child):
+        if child.last_beat is None:
+            return None
+        return child.last_beat + self.heartbeat_timeout
+
+    def _exited(self, child, now):
+        child.process.join()
+        child.conn.close()
+        if now - child.started >= self.stable_after:
+            child.backoff = self.min_backoff
+        else:
+            child.backoff = min(max(child.backoff * 2, self.min_backoff), self.max_backoff)
+        child.restart_at = now + child.backoff
+        logger.warning(f"{child.name} exited with {child.process.exitcode}, restarting in {child.backoff}s")
+
+    def _kill(self, child):
+        child.process.terminate()
+        child.process.join(5)
+        if child.process.is_alive():
+            child.process.kill()
+
+    def step(self, timeout=None):
+        """
+        Waits for a child to exit or beat, or for the next deadline, and
+        deals with whatever happened
+        """
+        now = time.monotonic()
+        running = [child for child in self.children if child.restart_at is None]
+        deadlines = [self._deadline(child) for child in running if child.last_beat is not None]
+        deadlines += [child.restart_at for child in self.children if child.restart_at is not None]
+        wait_for = max(0, min(deadlines) - now) if deadlines else None
+        if timeout is not None:
+            wait_for = timeout if wait_for is None else min(wait_for, timeout)
+
+        ready = wait([child.process.sentinel for child in running] +
+                     [child.conn for child in running], wait_for)
+
+        now = time.monotonic()
+        for child in running:
+            if child.conn in ready:
+                try:
+                    while child.conn.poll():
+                        child.conn.recv()
+                        child.last_beat = now
+                except (EOFError, OSError):
+                    pass
+            if child.process.sentinel in ready:
+                self._exited(child, now)
+            elif child.last_beat is not None and now > self._deadline(child):
+                logger.warning(f"{child.name} missed its heartbeat, killing it")
+                self._kill(child)
+                self._exited(child, now)
+
+        for child in self.children:
+            if child.restart_at is not None and now >= child.restart_at:
+                child.restarts += 1
+                logger.warning(f"Restarting {child.name}")
+                self._start(child)
+
+    def run(self):
+        self.start()
+        while self.keep_running:
+            self.step()
+
+    def stop(self):
+        self.keep_running = False
+        for child in self.children:
+            if child.restart_at is None and child.process.is_alive():
+                self._kill(child)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            child.name: {
+                'alive': child.restart_at is None and child.process.is_alive(),
+                'restarts': child.restarts,
+                'uptime': now - child.started if child.restart_at is None else 0,
+                'last_beat': None if child.last_beat is None else now - child.last_beat,
+            }
+            for child in self.children
+        }
@@ -1,6 +1,19 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import IntEnum
+from itertools import product
+import atexit
+import json
+import logging
+import os
+import threading
 import requests
 
+from r2d7.metrics import metrics, timed
+from r2d7.tracing import annotate
+
+logger = logging.getLogger(__name__)
+
 # These classes are designd to interface with http://xwing.gateofstorms.net/2/multi/
 # For more info see https://github.com/punkUser/xwing_math/blob/master/source/
 # Or run chrome inspector on the calculator site and look at simulate.json in network tab
@@ -172,6 +185,91 @@ class DefenseForm(CalculatorForm):
 class CalculatorError(Exception):
     pass
 
+class CalculatorCache(object):
+    """
+    Calculator results keyed on the canonical form payload (Calculator.key()).
+    The forms are deterministic, so a result never goes stale; it is kept in
+    an LRU bounded dict and written to a JSON file so it survives restarts.
+    Only the fields we use are stored.
+    """
+    FIELDS = ('expected_total_hits', 'at_least_one_crit', 'form_state_string')
+    SAVE_EVERY = 20  # new results between writes to disk
+
+    def __init__(self, path=None, max_size=20000):
+        self.path = path
+        self.max_size = max_size
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key):
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._results.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._results[key] = {field: result[field] for field in self.FIELDS}
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+            self._unsaved += 1
+            save = self._unsaved >= self.SAVE_EVERY
+        if save:
+            self.save()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as cache_file:
+                results = json.load(cache_file)
+        except (OSError, ValueError) as err:
+            logger.warning(f'Unable to load calculator cache {self.path}: {err}')
+            return
+        with self._lock:
+            self._results.update(list(results.items())[-self.max_size:])
+        logger.info(f'Loaded {len(self._results)} calculator results from {self.path}')
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._unsaved:
+                return
+            results = dict(self._results)
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Write then rename so a crash never leaves a half written cache
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(results, cache_file)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            logger.warning(f'Unable to save calculator cache {self.path}: {err}')
+
+    def stats(self):
+        return {'size': len(self._results), 'hits': self.hits, 'misses': self.misses}
+
+
+CALCULATOR_CACHE = os.getenv('CALCULATOR_CACHE', os.path.expanduser('~/.cache/r2d7/calculator.json'))
+calculator_cache = CalculatorCache(CALCULATOR_CACHE)
+atexit.register(calculator_cache.save)
+metrics.collect_stats('r2d7_calculator_cache', 'Calculator result cache', calculator_cache.stats)
+
+
 class Calculator(object):
     """
     This class handles json objects and sends them off to the calculator
@@ -180,27 +278,66 @@ class Calculator(object):
     """
     _json_url = 'http://xwing.gateofstorms.net/2/multi/simulate.json'
     _human_url = 'http://xwing.gateofstorms.net/2/multi/'
+    timeout = 10  # seconds
 
-    def __init__(self, attack_form = AttackForm(), defense_form = DefenseForm()):
+    def __init__(self, attack_form = AttackForm(), defense_form = DefenseForm(), cache = calculator_cache):
         self.attack_form = attack_form
         self.defense_form = defense_form
+        self.cache = cache
         self.result = None
         self.url = self._human_url
 
-    def calculate(self):
+    def payload(self):
         payload = {}
         payload['simulate'] = {}
         payload['attack0'] = vars(self.attack_form)
         payload['defense'] = vars(self.defense_form)
-        result = requests.post(self._json_url, json=payload)
+        return payload
+
+    def key(self):
+        """
+        Canonical string for the payload - identical forms give identical keys
+        """
+        return json.dumps(self.payload(), sort_keys=True)
+
+    def calculate(self):
+        if self.from_cache():
+            return
+        payload = self.payload()
+        with timed('calculator'):
+            result = requests.post(self._json_url, json=payload, timeout=self.timeout)
         if result.ok:
             output = result.json()
-            self.result = output['results'][0]
-            query_string = output['form_state_string']
-            self.url = self._human_url + '?' + query_string
+            self.set_result({**output['results'][0], 'form_state_string': output['form_state_string']})
+            if self.cache is not None:
+                self.cache.put(self.key(), self.result)
         else:
             raise CalculatorError(f'Calculator failed with code {result.status_code}: {result.text}')
 
+    def set_result(self, result):
+        self.result = result
+        self.url = self._human_url + '?' + result['form_state_string']
+
+    def from_cache(self):
+        """
+        Fills in the result from the cache without touching the network.
+        Returns False if it isn't cached.
+        """
+        result = self.cache.get(self.key()) if self.cache is not None else None
+        annotate(calculator_cache_hit=result is not None)
+        if result is None:
+            return False
+        self.set_result(result)
+        return True
+
+    def calculated(self):
+        """
+        Runs the calculation and returns this calculator, so it can be handed
+        to other rolls with the same forms
+        """
+        self.calculate()
+        return self
+
     def expected_hits(self):
         if self.result == None:
             self.calculate()
@@ -211,3 +348,49 @@ class Calculator(object):
             self.calculate()
         return self.result['at_least_one_crit']
 
+
+
+def prewarm(cache=calculator_cache, max_tokens=3, workers=4):
+    """
+    Fills the cache for every single attack or defence roll the calculator
+    can take, with up to max_tokens of each numeric token.  The forms match
+    the ones ModdedRoll builds, so those rolls never need the network.
+    Vs rolls are too many to enumerate and are cached as they are asked for.
+    """
+    tokens = range(max_tokens + 1)
+    calculators = []
+    for dice, focus, calculate, force, lock, reroll in product(
+            range(1, CalculatorForm.max_dice + 1), (0, 1), tokens, tokens, (0, 1), range(4)):
+        attack_form = AttackForm(dice=dice, focus=focus, calculate=calculate, lock=lock, force=force, reroll=reroll)
+        calculators.append(Calculator(attack_form, DefenseForm(), cache))
+    for dice, focus, calculate, force, evade, reinforce, reroll in product(
+            range(1, CalculatorForm.max_dice + 1), (0, 1), tokens, tokens, tokens,
+            range(CalculatorForm.max_reinforce + 1), range(4)):
+        defense_form = DefenseForm(dice=dice, focus=focus, calculate=calculate, evade=evade,
+                                   reinforce=reinforce, force=force, reroll=reroll)
+        calculators.append(Calculator(AttackForm(dice=dice, all_hits=True), defense_form, cache))
+    missing = [calculator for calculator in calculators if cache.get(calculator.key()) is None]
+    logger.info(f'{len(calculators) - len(missing)} of {len(calculators)} rolls already cached')
+
+    def fetch(calculator):
+        try:
+            calculator.calculate()
+        except Exception as err:
+            logger.warning(f'Calculator error while prewarming: {err}')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, _ in enumerate(executor.map(fetch, missing), 1):
+            if done % 100 == 0:
+                logger.info(f'Prewarmed {done} of {len(missing)}')
+    cache.save()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    max_tokens = int(os.getenv('PREWARM_MAX_TOKENS', 3))
+    logger.info(f'Prewarming calculator cache {calculator_cache.path}')
+    prewarm(max_tokens=max_tokens)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+from bisect import bisect_left, bisect_right
+import logging
+import re
+
+from r2d7.core import UserError
+
+logger = logging.getLogger(__name__)
+
+# Indexes over CardLookup._lookup_data, built once when the data is loaded so
+# a lookup only looks at the cards that could match instead of every card.
+
+
+class NameIndex(object):
+    """
+    Finds lookup keys by card name.
+
+    Name searches are regexes that start at a word boundary, so the start of
+    the query has to appear at the start of a word in the card name.  Every
+    word in every name is stored as the rest of the name from that word on,
+    sorted, and the cards that could match are the ones whose suffixes start
+    with the query's literal prefix.  Only those are checked against the
+    regex.  Key searches are plain substring matches, so every suffix of
+    every key is stored the same way.
+    """
+    RE_WORD_START = re.compile(r'\b\w')
+
+    def __init__(self, lookup_data):
+        self.lookup_data = lookup_data
+        self.keys = list(lookup_data)
+        self.word_suffixes = []
+        self.key_suffixes = []
+        for rank, (key, cards) in enumerate(lookup_data.items()):
+            for card in cards:
+                name = card['name'].lower()
+                for word in self.RE_WORD_START.finditer(name):
+                    self.word_suffixes.append((name[word.start():], rank))
+            for start in range(len(key)):
+                self.key_suffixes.append((key[start:], rank))
+        self.word_suffixes.sort()
+        self.key_suffixes.sort()
+
+    @staticmethod
+    def _prefixed(suffixes, prefix):
+        ranks = set()
+        for i in range(bisect_left(suffixes, (prefix,)), len(suffixes)):
+            suffix, rank = suffixes[i]
+            if not suffix.startswith(prefix):
+                break
+            ranks.add(rank)
+        return ranks
+
+    @staticmethod
+    def literal_prefix(query):
+        """
+        The part of a lowercased query that must appear as-is in the card
+        name: up to the first space (spaces are optional) or the first "tie"
+        (which can be followed by anything)
+        """
+        prefix = query.split(' ', 1)[0]
+        tie = prefix.find('tie')
+        if tie != -1:
+            prefix = prefix[:tie + 3]
+        return prefix
+
+    def name_matches(self, query, pattern):
+        """
+        Keys with a card whose name matches pattern, which was built from query
+        """
+        prefix = self.literal_prefix(query)
+        if prefix and self.RE_WORD_START.match(prefix):
+            ranks = sorted(self._prefixed(self.word_suffixes, prefix))
+        else:
+            ranks = range(len(self.keys))
+        return [self.keys[rank] for rank in ranks
+                if any(pattern.search(card['name']) for card in self.lookup_data[self.keys[rank]])]
+
+    def key_matches(self, fragment):
+        """
+        Keys containing fragment
+        """
+        return [self.keys[rank] for rank in sorted(self._prefixed(self.key_suffixes, fragment))]
+
+
+class CostIndex(object):
+    """
+    Cards grouped by slot (or ship, for pilots) and sorted by cost, so a
+    points search is a bisect over one group.
+    """
+    # The range of a sorted cost list that satisfies each comparison
+    OPERATORS = {
+        '=': lambda costs, value: (bisect_left(costs, value), bisect_right(costs, value)),
+        '==': lambda costs, value: (bisect_left(costs, value), bisect_right(costs, value)),
+        '<': lambda costs, value: (0, bisect_left(costs, value)),
+        '<=': lambda costs, value: (0, bisect_right(costs, value)),
+        '>': lambda costs, value: (bisect_right(costs, value), len(costs)),
+        '>=': lambda costs, value: (bisect_left(costs, value), len(costs)),
+    }
+
+    def __init__(self, lookup_data, group):
+        groups = {}
+        for rank, cards in enumerate(lookup_data.values()):
+            for position, card in enumerate(cards):
+                cost = card.get('cost', {}).get('value', 0)
+                groups.setdefault(group(card), []).append((cost, rank, position, card))
+        self.costs = {}
+        self.cards = {}
+        for name, entries in groups.items():
+            entries.sort(key=lambda entry: entry[:3])
+            self.costs[name] = [entry[0] for entry in entries]
+            self.cards[name] = [entry[1:] for entry in entries]
+
+    def matches(self, group, operator, value):
+        """
+        Cards in group whose cost compares to value, in lookup data order
+        """
+        try:
+            cost_range = self.OPERATORS[operator]
+        except KeyError:
+            raise UserError(f'I don\'t know how to compare points with {operator}')
+        if group not in self.costs:
+            return []
+        start, end = cost_range(self.costs[group], value)
+        return [card for _, _, card in sorted(self.cards[group][start:end], key=lambda entry: entry[:2])]
+
+
+class ConditionIndex(object):
+    """
+    Conditions by xws, and the conditions each card brings with it, so
+    linked conditions can be attached without scanning every condition.
+    Conditions are always returned in the order they were indexed.
+    """
+    def __init__(self, conditions, xws):
+        self.by_xws = {}
+        for order, condition in enumerate(conditions):
+            self.by_xws.setdefault(xws(condition), []).append((order, condition))
+        self.adjacency = {}
+
+    def linked(self, xws_list):
+        entries = [entry for xws in xws_list for entry in self.by_xws.get(xws, [])]
+        return [condition for _, condition in sorted(entries, key=lambda entry: entry[0])]
+
+    def link(self, card_key, xws_list):
+        """
+        Records the conditions for a card, ignoring any that aren't known
+        """
+        self.adjacency[card_key] = self.linked(xws_list)
+
+    def for_card(self, card_key):
+        return self.adjacency.get(card_key, [])
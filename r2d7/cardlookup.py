@@ -5,6 +5,7 @@ import logging
 import re
 import random
 
+from r2d7.cardindex import ConditionIndex, CostIndex, NameIndex
 from r2d7.core import DroidCore, UserError
 
 logger = logging.getLogger(__name__)
@@ -13,13 +14,16 @@ logger = logging.getLogger(__name__)
 class CardLookup(DroidCore):
     def __init__(self):
         super().__init__()
-        self.register_handler(r'\{\{(.*)\}\}', self.handle_image_lookup)
-        self.register_handler(r'\[\[(.*)\]\]', self.handle_lookup)
-        self.register_dm_handler(r'\{\{(.*)\}\}', self.handle_image_lookup)
+        self.register_handler(r'\{\{(.*)\}\}', self.handle_image_lookup, triggers=['{{'])
+        self.register_handler(r'\[\[(.*)\]\]', self.handle_lookup, triggers=['[['])
+        self.register_dm_handler(r'\{\{(.*)\}\}', self.handle_image_lookup, triggers=['{{'])
         self.register_dm_handler(r'(.*)', self.handle_lookup)
-        self.register_handler(r'!(crit)', self.handle_crit)
+        self.register_handler(r'!(crit)', self.handle_crit, triggers=['!'])
 
     _lookup_data = None
+    _name_index = None
+    _cost_index = None
+    _condition_index = None
     _core_damage_deck = []
 
     _action_order = (
@@ -123,6 +127,7 @@ class CardLookup(DroidCore):
     def _init_lookup_data(self):
         next_id = 0
         self._lookup_data = {}
+        self._core_damage_deck = []
         for cards in self.data.values():
             for card in cards.values():
                 name = self.partial_canonicalize(card['name'])
@@ -152,6 +157,18 @@ class CardLookup(DroidCore):
                     ship_bar.append(slot)
             ship['slots'] = ship_bar
 
+        self._name_index = NameIndex(self._lookup_data)
+        self._cost_index = CostIndex(self._lookup_data, self._slot_group)
+        self._condition_index = ConditionIndex(self.data['condition'].values(), lambda card: card['xws'])
+        for cards in self._lookup_data.values():
+            for card in cards:
+                if 'conditions' in card:
+                    self._condition_index.link(card['_id'], card['conditions'])
+
+    def _slot_group(self, card):
+        # What a slot filter is compared with: the ship for pilots, otherwise the category
+        return self.iconify(card['ship']['name'] if 'ship' in card else card['category'])
+
     _multi_lookup_pattern = re.compile(r'\]\][^\[]*\[\[')
     @property
     def filter_pattern(self):
@@ -170,9 +187,7 @@ class CardLookup(DroidCore):
             if lookup in self._aliases:
                 lookup = self._aliases[lookup]
             
-            matches = []
-            slot_filter = None
-            points_filter = None
+            cards = []
             match = self.filter_pattern.match(lookup)
             if not match:
                 match = (None, None, lookup, None, None, None)
@@ -191,45 +206,28 @@ class CardLookup(DroidCore):
                         f'\\b{ex_lookup}(?:[\'e]?s)?\\b',
                         re.IGNORECASE
                     )
-                    matches = [
-                        key for key, cards in self._lookup_data.items() if any(
-                            exact.search(card['name']) for card in cards
-                        )
-                    ]
+                    matches = self._name_index.name_matches(match[2].lower().strip(), exact)
                     if not matches:
-                        matches = [key for key in self._lookup_data.keys()
-                                   if lookup in key]
+                        matches = self._name_index.key_matches(lookup)
+                    cards = [card for key in matches for card in self._lookup_data[key]
+                             if not slot_filter or self._slot_group(card) == slot_filter]
             else:
                 if not slot_filter:
                     raise UserError(
                         'You need to specify a slot to search by points value.')
-                matches = self._lookup_data.keys()
-                operator = '==' if match[3] == '=' else match[3]
-                operand = match[4]
+                cards = self._cost_index.matches(slot_filter, match[3], int(match[4]))
 
-                points_filter = lambda val: eval(f"{val}{operator}{operand}")
+            for card in cards:
+                if card['_id'] in cards_yielded:
+                    continue
+                cards_yielded.add(card['_id'])
+                yield card
 
-            for match in matches:
-                for card in self._lookup_data[match]:
-                    if card['_id'] in cards_yielded:
-                        continue
-                    if slot_filter and 'ship' not in card and self.iconify(card['category']) != slot_filter:
+                for condition in self._condition_index.for_card(card['_id']):
+                    if condition['_id'] in cards_yielded:
                         continue
-                    if slot_filter and 'ship' in card and self.iconify(card['ship']['name']) != slot_filter:
-                        continue
-                    if points_filter and not points_filter(card.get('cost', {}).get('value', 0)):
-                        continue
-
-                    cards_yielded.add(card['_id'])
-                    yield card
-
-                    if 'conditions' in card:
-                        for condition in self.data['condition'].values():
-                            if condition['_id'] in cards_yielded:
-                                continue
-                            if condition['xws'] in card['conditions']:
-                                yield condition
-                                cards_yielded.add(condition['_id'])
+                    yield condition
+                    cards_yielded.add(condition['_id'])
 
     _arc_icons = {
         'Turret': 'turret',
@@ -469,7 +467,7 @@ class CardLookup(DroidCore):
 
 
     def print_ship_ability(self, ability):
-        lines = ability['text']
+        lines = self.card_text(ability['text'])
         return [self.italics(self.bold(ability['name'] + ':')) + ' ' + lines[0]] + lines[1:]
 
     def print_cost(self, cost):
@@ -586,16 +584,17 @@ class CardLookup(DroidCore):
                 text.append(self.ship_stats(card, card))
 
             if 'ability' in side:
+                ability = list(self.card_text(side['ability']))
                 # this Restrictions bit handles weird Bold/Italics problems in Discord for Ship Configurations that replace ship abilities.
                 # the database isn't 100% consistent on these so they're a bit finicky
                 if card.get('restrictions'):
                     if card['restrictions'][0].get('shipAbility'):
                         if card['name'] == 'Independent Calculations':
-                            side['ability'][0] = side['ability'][0].replace("***", "**")
-                        side['ability'][-1] = side['ability'][-1].replace("***", "**")
+                            ability[0] = ability[0].replace("***", "**")
+                        ability[-1] = ability[-1].replace("***", "**")
                 if card['name'] == 'TIE Defender Elite':
-                    side['ability'][-1] = side['ability'][-1].replace("***", '**')
-                text += side['ability']
+                    ability[-1] = ability[-1].replace("***", '**')
+                text += ability
 
             if 'text' in side:
                 text.append(self.italics(side['text']))
@@ -623,7 +622,7 @@ class CardLookup(DroidCore):
             if 'device' in side:
                 if side['device']['type'] == 'Remote':
                     side['device']['category'] = 'Remote'
-                    side['device']['ability'] = side['device']['effect']
+                    side['device']['ability'] = side['device'].get('effect', '')
                     text += self.print_card(side['device'])
                 else:
                     text += self.print_device(side['device'])
@@ -641,7 +640,7 @@ class CardLookup(DroidCore):
         return text
 
     def print_device(self, device):
-        return [f"{self.bold(device['name'])} ({device['type']})"] + device['effect']
+        return [f"{self.bold(device['name'])} ({device['type']})"] + self.card_text(device.get('effect', ''))
 
     def print_image(self, card):
         text = []
@@ -0,0 +1,142 @@
+import glob
+import json
+import logging
+import marshal
+import os
+import struct
+
+from r2d7.datacache import DATA_CACHE
+
+logger = logging.getLogger(__name__)
+
+
+class CardStoreError(Exception):
+    pass
+
+
+class CardStore(object):
+    """
+    Every data file of one xwing-data2 version packed into a single
+    read-only snapshot file.
+
+    The layout is the magic, the length of a JSON header, the header (the
+    version and, in load order, each file's path, content hash, offset and
+    length) and then each file's content as marshal data.
+
+    It isn't shared memory, and bot processes use as much memory as they
+    did without it.  Each process reads the whole file and unmarshals its
+    own copy of the cards, because the loader links and edits the card dicts
+    and builds its indexes on them; mapping the file would only share the
+    marshal bytes, which are dropped after the load.  What the store saves
+    is the work before that: a process that starts, or restarts, after the
+    store is written loads the cards without touching the network or
+    decoding JSON.
+
+    Stores are written once, by whichever process gets to a version first,
+    and replaced by renaming, so a store never changes under a reader.
+    """
+    MAGIC = b'R2D7CRD1'
+    HEADER = struct.Struct('>Q')
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as store_file:
+            self._contents = store_file.read()
+        try:
+            if self._contents[:len(self.MAGIC)] != self.MAGIC:
+                raise CardStoreError(f'{path} is not a card store')
+            start = len(self.MAGIC) + self.HEADER.size
+            header_length, = self.HEADER.unpack_from(self._contents, len(self.MAGIC))
+            header = json.loads(self._contents[start:start + header_length])
+            self.version = header['version']
+            self._data_start = start + header_length
+            self._files = header['files']
+            if self._data_start + sum(entry[3] for entry in self._files) != len(self._contents):
+                raise CardStoreError(f'{path} is truncated')
+        except (struct.error, ValueError, KeyError, IndexError, TypeError) as err:
+            raise CardStoreError(f'{path} is damaged: {err}') from err
+
+    @classmethod
+    def write(cls, path, version, files):
+        """
+        Packs (filepath, content hash, data) tuples into a store at path
+        """
+        entries = []
+        blobs = []
+        offset = 0
+        for filepath, sha, data in files:
+            blob = marshal.dumps(data)
+            entries.append([filepath, sha, offset, len(blob)])
+            blobs.append(blob)
+            offset += len(blob)
+        header = json.dumps({'version': version, 'files': entries}).encode()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so nobody reads a half written store
+        with open(f'{path}.{os.getpid()}.tmp', 'wb') as store_file:
+            store_file.write(cls.MAGIC)
+            store_file.write(cls.HEADER.pack(len(header)))
+            store_file.write(header)
+            for blob in blobs:
+                store_file.write(blob)
+        os.replace(f'{path}.{os.getpid()}.tmp', path)
+
+    def __len__(self):
+        return len(self._files)
+
+    def files(self):
+        """
+        Yields (filepath, content hash, data) in the order they were written.
+        The data is a fresh copy, free for the loader to edit.
+        """
+        view = memoryview(self._contents)
+        try:
+            for filepath, sha, offset, length in self._files:
+                start = self._data_start + offset
+                yield filepath, sha, marshal.loads(view[start:start + length])
+        finally:
+            view.release()
+
+    def close(self):
+        self._contents = b''
+
+
+CARD_STORE = os.getenv('CARD_STORE', os.path.join(DATA_CACHE, 'stores'))
+
+
+def store_path(version, points_database='AMG', directory=None):
+    return os.path.join(directory or CARD_STORE, f'{points_database}-{version}.cards')
+
+
+def open_store(version, points_database='AMG', directory=None):
+    """
+    The store for a data version, or None if it hasn't been written
+    """
+    if not version:
+        return None
+    try:
+        return CardStore(store_path(version, points_database, directory))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, CardStoreError) as err:
+        logger.warning(f'Ignoring card store for {points_database} {version}: {err}')
+        return None
+
+
+def save_store(version, files, points_database='AMG', directory=None):
+    """
+    Writes the store for a data version and removes stores of older versions
+    """
+    if not version:
+        return
+    path = store_path(version, points_database, directory)
+    try:
+        CardStore.write(path, version, files)
+    except OSError as err:
+        logger.warning(f'Unable to write card store {path}: {err}')
+        return
+    for old in glob.glob(store_path('*', points_database, directory)):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
@@ -0,0 +1,60 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker(object):
+    """
+    Stops calling an upstream service that keeps failing.
+
+    After max_failures failures in a row the breaker opens, and allow()
+    returns False for cool_down seconds.  Then a single trial call is let
+    through: if it works the breaker closes again, if not it stays open for
+    another cool-down.
+    """
+    def __init__(self, name, max_failures=3, cool_down=60, clock=time.monotonic):
+        self.name = name
+        self.max_failures = max_failures
+        self.cool_down = cool_down
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.cool_down:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self._trial:
+            self._trial = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f'{self.name}: upstream recovered, closing circuit')
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            self.opened_at = self.clock()
+            logger.warning(f'{self.name}: {self.failures} failures in a row, '
+                           f'not calling upstream for {self.cool_down}s')
+
+    def stats(self):
+        return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
@@ -1,13 +1,18 @@
 import asyncio
+import copy
 import logging
 import json
+import os
 from pathlib import Path
 import re
+import threading
 import time
 import unicodedata
 from collections import OrderedDict
 
-import requests
+from r2d7 import cardstore
+from r2d7.datacache import DataFileError, data_cache
+from r2d7.metrics import metrics, timed
 
 logger = logging.getLogger(__name__)
 
@@ -25,20 +30,158 @@ class UserError(DroidException):
     pass
 
 
-class DroidCore():
+class Handler(object):
+    """
+    A registered message handler: its regex, the literal triggers one of
+    which must be in a message before the regex is tried (none means always
+    try), and how often and how long it has run.
+    """
+    def __init__(self, pattern, method, triggers=()):
+        self.pattern = pattern
+        self.method = method
+        self.triggers = tuple(triggers)
+        self.name = pattern.pattern
+        self.attempts = 0
+        self.matched = 0
+        self.total_time = 0.0
+
+    def bound(self, droid):
+        """
+        The method, bound to droid if it was registered as a droid's method
+        """
+        owner = getattr(self.method, '__self__', None)
+        if droid is None or owner is droid or not isinstance(owner, DroidCore):
+            return self.method
+        return self.method.__func__.__get__(droid)
+
+
+class DispatchTable(object):
+    """
+    Handlers in registration order, tried in turn until one responds.
+
+    Every handler's triggers are collected up front, so a message is first
+    checked for those few literal strings and only the handlers whose
+    triggers turned up (plus any without triggers) run their regexes.
+    Ordinary chatter never reaches a regex.
+    """
     def __init__(self):
-        self._handlers = OrderedDict()
-        self._dm_handlers = OrderedDict()
+        self.handlers = OrderedDict()
+        self.triggers = ()
+        self.always = False
+        self.messages = 0
+        self.prefiltered = 0
+        # Handlers run on several worker threads at once
+        self._lock = threading.Lock()
+
+    def register(self, pattern, method, triggers=()):
+        # Registering the same pattern again replaces the handler
+        self.handlers[pattern] = Handler(pattern, method, triggers)
+        self.triggers = tuple({trigger for handler in self.handlers.values() for trigger in handler.triggers})
+        self.always = any(not handler.triggers for handler in self.handlers.values())
+
+    def items(self):
+        return [(pattern, handler.method) for pattern, handler in self.handlers.items()]
+
+    def dispatch(self, text, droid=None):
+        """
+        Responses from the first handler that matches and responds, or None.
+        Handlers that are a droid's methods run on droid, if one is given.
+        """
+        present = {trigger for trigger in self.triggers if trigger in text}
+        with self._lock:
+            self.messages += 1
+            if not present and not self.always:
+                self.prefiltered += 1
+                return None
+        for handler in self.handlers.values():
+            if handler.triggers and present.isdisjoint(handler.triggers):
+                continue
+            match = handler.pattern.search(text)
+            with self._lock:
+                handler.attempts += 1
+                if match:
+                    handler.matched += 1
+            if not match:
+                continue
+            start = time.perf_counter()
+            try:
+                responses = handler.bound(droid)(match[1])
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    handler.total_time += elapsed
+            if responses:
+                return responses
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'messages': self.messages,
+                'prefiltered': self.prefiltered,
+                'handlers': {handler.name: {'attempts': handler.attempts, 'matched': handler.matched,
+                                            'total_time': handler.total_time}
+                             for handler in self.handlers.values()},
+            }
+
 
-    def register_handler(self, pattern, method):
+class DroidCore():
+    update_poll = 60  # seconds between needs_update() calls in keep_updated
+
+    def __init__(self):
+        self._handlers = DispatchTable()
+        self._dm_handlers = DispatchTable()
+        self._converted_text = {}
+        # The droid whose data handlers use; reload() replaces it
+        self._current = self
+        self._reload_lock = threading.Lock()
+        metrics.collect_stats('r2d7_dispatch', 'Chat messages seen by the handler tables',
+                              self.dispatch_stats, label='table')
+        metrics.collect_stats('r2d7_handler', 'Runs of each chat handler',
+                              self.handler_stats, label='handler')
+        metrics.info('r2d7_data', 'Version of the xwing-data loaded',
+                     lambda: {'version': self.data_version} if getattr(self, 'data_version', None) else None)
+
+    def register_handler(self, pattern, method, triggers=()):
+        """
+        triggers are literal strings, one of which must be in a message
+        before pattern is tried. Without triggers it is tried on everything.
+        """
         if not is_pattern_type(pattern):
             pattern = re.compile(pattern)
-        self._handlers[pattern] = method
+        self._handlers.register(pattern, method, triggers)
 
-    def register_dm_handler(self, pattern, method):
+    def register_dm_handler(self, pattern, method, triggers=()):
         if not is_pattern_type(pattern):
             pattern = re.compile(pattern)
-        self._dm_handlers[pattern] = method
+        self._dm_handlers.register(pattern, method, triggers)
+
+    def dispatch(self, text, direct=False):
+        """
+        Responses to a message. Direct messages and mentions try the DM
+        handlers first, then everything gets the channel handlers.
+        """
+        responses = None
+        # Taken once, so the whole message is answered from one version of
+        # the data even if a reload swaps in another meanwhile
+        droid = self._current
+        with timed('dispatch'):
+            if direct:
+                responses = self._dm_handlers.dispatch(text, droid)
+            if not responses:
+                responses = self._handlers.dispatch(text, droid)
+        return responses
+
+    def dispatch_stats(self):
+        return {'dm': self._dm_handlers.stats(), 'channel': self._handlers.stats()}
+
+    def handler_stats(self):
+        """
+        Each handler's stats, keyed by table and pattern
+        """
+        return {f'{table}:{name}': stats
+                for table, table_stats in self.dispatch_stats().items()
+                for name, stats in table_stats['handlers'].items()}
 
     def handle_message(self, message):
         raise NotImplementedError()
@@ -60,6 +203,19 @@ class DroidCore():
     def convert_text(text):
         return [text]
 
+    def card_text(self, text):
+        """
+        Card text run through convert_text. Text is converted the first time
+        it's printed rather than when the data is loaded, and remembered until
+        the data is reloaded. Callers must copy the lines before changing them.
+        """
+        if isinstance(text, list):  # already converted
+            return text
+        converted = self._converted_text.get(text)
+        if converted is None:
+            converted = self._converted_text[text] = self.convert_text(text)
+        return converted
+
     @classmethod
     def wiki_link(cls, card_name, crew_of_pilot=False, wiki_name=False, tip_text=None):
         raise NotImplementedError()
@@ -83,26 +239,50 @@ class DroidCore():
 
     @classmethod
     def get_file(cls, filepath, points_database="AMG"):
+        """
+        Returns the filepath, the content hash and the decoded file
+        """
         url = cls.BASE_URL if points_database == "AMG" else cls.XWA_POINTS_URL
-        return filepath, requests.get(url + filepath)
+        try:
+            return (filepath, *data_cache.get_json(url + filepath))
+        except DataFileError as err:
+            raise DroidException(str(err)) from err
 
     @classmethod
     def get_version(cls, points_database="AMG"):
         user = cls.GITHUB_USER if points_database == "AMG" else "gregkash16"
 
-        res = requests.get(
-            f"https://api.github.com/repos/{user}/xwing-data2-legacy/branches/{cls.GITHUB_BRANCH}")
+        res = data_cache.session.get(
+            f"https://api.github.com/repos/{user}/xwing-data2-legacy/branches/{cls.GITHUB_BRANCH}",
+            timeout=data_cache.timeout)
         if res.status_code != 200:
             logger.warning(f"Got {res.status_code} checking data version.")
             return False
         return res.json()['commit']['sha']
 
-    async def _load_data(self, points_database="AMG"):
-        url = self.BASE_URL if points_database == "AMG" else self.XWA_POINTS_URL
-        res = requests.get(url + self.MANIFEST)
-        if res.status_code != 200:
-            raise DroidException(f"Got {res.status_code} GETing {res.url}.")
-        manifest = res.json()
+    # Version seen by the last needs_update(), so a reload doesn't ask GitHub again
+    _latest_version = None
+
+    @classmethod
+    async def _fetch_files(cls, version, points_database="AMG"):
+        """
+        (filepath, content hash, data) for every data file of a version.
+        They come from the version's card store if another bot process has
+        already written it, otherwise through the data cache, and then the
+        store is written for the others.
+        """
+        store = cardstore.open_store(version, points_database)
+        if store:
+            try:
+                results = list(store.files())
+            finally:
+                store.close()
+            logger.info(f"Loaded {len(results)} data files from {store.path}")
+            return results
+
+        # Files come from the content addressed data cache: unchanged files
+        # are neither downloaded nor decoded again
+        _, manifest_sha, manifest = cls.get_file(cls.MANIFEST, points_database)
 
         files = (
             manifest['damagedecks'] +
@@ -112,21 +292,37 @@ class DroidCore():
                 for ship in faction['ships']]
         )
 
-        self._data = {}
         loop = asyncio.get_event_loop()
-        futures = [loop.run_in_executor(None, self.get_file, filename, points_database)
+        futures = [loop.run_in_executor(None, cls.get_file, filename, points_database)
                    for filename in files]
 
-        self.data_version = self.get_version()
-        self._last_checked_version = time.time()
+        results = await asyncio.gather(*futures)
+        data_cache.forget([manifest_sha] + [sha for _, sha, _ in results])
+        data_cache.save()
+        logger.info(f"Loaded {len(results)} data files: {data_cache.stats()}")
+        # Written before the loader links and edits the cards
+        cardstore.save_store(version, results, points_database)
+        return results
 
-        for filepath, res in await asyncio.gather(*futures):
-            if res.status_code != 200:
-                raise DroidException(
-                    f"Got {res.status_code} GETing {res.url}.")
+    @classmethod
+    def prepare_card_store(cls, points_database="AMG"):
+        """
+        Writes the card store for the current data version, so bot processes
+        started afterwards load from it
+        """
+        version = cls.get_version(points_database)
+        if version and not os.path.exists(cardstore.store_path(version, points_database)):
+            asyncio.run(cls._fetch_files(version, points_database))
 
+    async def _load_data(self, points_database="AMG"):
+        # _data is always built fresh from copies of the files
+        self.data_version = self._latest_version or self.get_version()
+        self._last_checked_version = time.time()
+        results = await self._fetch_files(self.data_version, points_database)
+
+        self._data = {}
+        for filepath, _, raw_data in results:
             _, category, remaining = filepath.split('/', maxsplit=2)
-            raw_data = res.json()
 
             if category == 'upgrades':
                 for card in raw_data:
@@ -164,6 +360,7 @@ class DroidCore():
         category[card['xws']] = card
 
     def load_data(self, points_database="AMG"):
+        self._converted_text = {}
         try:
             loop = asyncio.get_event_loop()
         except RuntimeError:
@@ -173,6 +370,35 @@ class DroidCore():
             asyncio.set_event_loop(loop)
         loop.run_until_complete(self._load_data(points_database))
 
+    def reload(self):
+        """
+        Loads the data into a copy of the droid, away from the handlers, then
+        swaps it in with one assignment.  Nothing waits for handlers that are
+        already running; they finish on the data they started with.
+        """
+        with self._reload_lock:
+            if self._current is self:
+                # Keep messages off this droid while it is updated below
+                self._current = copy.copy(self)
+            staged = copy.copy(self)
+            staged.load_data()
+            self._current = staged
+            # For needs_update() and anyone using the droid's data directly
+            self.__dict__.update({name: value for name, value in staged.__dict__.items()
+                                  if name != '_current'})
+
+    def keep_updated(self):
+        """
+        Reloads whenever the data changes; run it on a thread of its own
+        """
+        while True:
+            time.sleep(self.update_poll)
+            try:
+                if self.needs_update():
+                    self.reload()
+            except Exception:
+                logger.exception("Unable to reload data")
+
     _last_checked_version = None
 
     def needs_update(self, points_database="AMG"):
@@ -183,6 +409,7 @@ class DroidCore():
         current_version = self.get_version(points_database)
         logger.debug(f"Current {points_database} xwing-data version: {current_version}")
         self._last_checked_version = time.time()
+        self._latest_version = current_version
         return self.data_version != current_version
 
     @property
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+import marshal
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from r2d7.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DataFileError(Exception):
+    def __init__(self, status_code, url):
+        super().__init__(f'Got {status_code} GETing {url}.')
+        self.status_code = status_code
+        self.url = url
+
+
+def pooled_session(pool_size=16):
+    """
+    A requests session that keeps its connections open between calls, with
+    enough of them for the loader's parallel downloads
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class DataFileCache(object):
+    """
+    Data files stored on disk by the SHA-256 of their content, with the ETag
+    and hash last seen for each URL.
+
+    Downloads are conditional, so a file that hasn't changed costs a 304 on
+    a pooled connection.  A file whose content hasn't changed is only decoded
+    once: the decoded data is kept as a marshal snapshot, and every caller
+    gets a fresh copy of it, because the loader links and edits the cards it
+    builds.  If the server can't be reached the last copy on disk is used.
+    """
+    INDEX = 'index.json'
+
+    def __init__(self, path=None, session=None, timeout=10):
+        self.path = path
+        self.session = session or pooled_session()
+        self.timeout = timeout
+        self._index = {}  # url: {'etag': ..., 'sha': ...}
+        self._snapshots = {}  # sha: marshalled data
+        self._lock = threading.Lock()
+        self.downloads = 0
+        self.not_modified = 0
+        self.decoded = 0
+        self.load()
+
+    def _blob_path(self, sha):
+        return os.path.join(self.path, 'objects', f'{sha}.json')
+
+    def load(self):
+        if not self.path or not os.path.exists(os.path.join(self.path, self.INDEX)):
+            return
+        try:
+            with open(os.path.join(self.path, self.INDEX)) as index_file:
+                self._index = json.load(index_file)
+        except (OSError, ValueError) as err:
+            logger.warning(f'Unable to load data cache index from {self.path}: {err}')
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            index = dict(self._index)
+        index_path = os.path.join(self.path, self.INDEX)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # Write then rename so a crash never leaves a half written index
+            with open(f'{index_path}.tmp', 'w') as index_file:
+                json.dump(index, index_file)
+            os.replace(f'{index_path}.tmp', index_path)
+        except OSError as err:
+            logger.warning(f'Unable to save data cache index {index_path}: {err}')
+
+    def _have(self, sha):
+        return sha in self._snapshots or bool(self.path and os.path.exists(self._blob_path(sha)))
+
+    def _read_blob(self, sha):
+        if not self.path:
+            return None
+        try:
+            with open(self._blob_path(sha), 'rb') as blob:
+                return blob.read()
+        except OSError:
+            return None
+
+    def _write_blob(self, sha, content):
+        if not self.path or os.path.exists(self._blob_path(sha)):
+            return
+        try:
+            os.makedirs(os.path.dirname(self._blob_path(sha)), exist_ok=True)
+            with open(f'{self._blob_path(sha)}.tmp', 'wb') as blob:
+                blob.write(content)
+            os.replace(f'{self._blob_path(sha)}.tmp', self._blob_path(sha))
+        except OSError as err:
+            logger.warning(f'Unable to cache data file {sha}: {err}')
+
+    def fetch(self, url):
+        """
+        Hash of the file's current content, downloading it only if it changed
+        """
+        with self._lock:
+            known = self._index.get(url)
+        headers = {}
+        if known and known.get('etag') and self._have(known['sha']):
+            headers['If-None-Match'] = known['etag']
+        try:
+            res = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as err:
+            if known and self._have(known['sha']):
+                logger.warning(f'Using cached copy of {url}: {err}')
+                return known['sha']
+            raise
+        if res.status_code == 304:
+            self.not_modified += 1
+            return known['sha']
+        if res.status_code != 200:
+            # The caller reports the failure
+            raise DataFileError(res.status_code, res.url)
+        self.downloads += 1
+        sha = hashlib.sha256(res.content).hexdigest()
+        self._write_blob(sha, res.content)
+        if sha not in self._snapshots:
+            self._snapshots[sha] = marshal.dumps(json.loads(res.content))
+            self.decoded += 1
+        with self._lock:
+            self._index[url] = {'etag': res.headers.get('ETag'), 'sha': sha}
+        return sha
+
+    def data(self, sha):
+        """
+        A fresh copy of a file's decoded content
+        """
+        if sha not in self._snapshots:
+            content = self._read_blob(sha)
+            if content is None:
+                raise KeyError(sha)
+            self._snapshots[sha] = marshal.dumps(json.loads(content))
+            self.decoded += 1
+        return marshal.loads(self._snapshots[sha])
+
+    def get_json(self, url):
+        """
+        Returns (content hash, decoded data) for a URL
+        """
+        sha = self.fetch(url)
+        return sha, self.data(sha)
+
+    def forget(self, keep):
+        """
+        Drops decoded snapshots of content that is no longer in use
+        """
+        for sha in set(self._snapshots) - set(keep):
+            del self._snapshots[sha]
+
+    def stats(self):
+        return {'files': len(self._index), 'downloads': self.downloads,
+                'not_modified': self.not_modified, 'decoded': self.decoded}
+
+
+DATA_CACHE = os.getenv('DATA_CACHE', os.path.expanduser('~/.cache/r2d7/data'))
+data_cache = DataFileCache(DATA_CACHE)
+metrics.collect_stats('r2d7_data_cache', 'Data file downloads and cache use', data_cache.stats)
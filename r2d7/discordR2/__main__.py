@@ -15,6 +15,8 @@ from r2d7.meta import Metawing
 from r2d7.roller import Roller
 from r2d7.talkback import Talkback
 from r2d7.discorddroid import DiscordDroid
+from r2d7.bots.supervisor import HEARTBEAT_INTERVAL, heartbeat
+from r2d7 import metrics
 
 logger = logging.getLogger(__name__)
 load_dotenv()
@@ -68,6 +70,15 @@ class DiscordClient(commands.Bot):
 
     async def on_ready(self):
         logger.info(f"Bot online as {self.user}")
+        # on_ready fires again after reconnects
+        if not getattr(self, '_heartbeat_task', None):
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def _heartbeat(self):
+        # Beats only while the event loop is free to run it
+        while True:
+            heartbeat()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
 
     async def on_message(self, message: discord.Message):
         if message.author.bot:
@@ -84,24 +95,7 @@ class DiscordClient(commands.Bot):
         # if self.droid.needs_update(points_database="XWA"):
         #    self.droid.load_data("XWA")
 
-        responses = None
-
-        if not message.guild:
-            for regex, handle_method in self.droid._dm_handlers.items():
-                match = regex.search(message.clean_content)
-                if match:
-                    responses = handle_method(match[1])
-                    if responses:
-                        break
-
-        if not responses:
-            for regex, handle_method in self.droid._handlers.items():
-                logger.debug(f"Checking {regex}")
-                match = regex.search(message.clean_content)
-                if match:
-                    responses = handle_method(match[1])
-                    if responses:
-                        break
+        responses = self.droid.dispatch(message.clean_content, direct=not message.guild)
 
         if responses:
             # If there are multiple matches, allow the user to select one, up to 9 matches.
@@ -192,6 +186,7 @@ def main():
     logging.info(f"discord token: {discord_token}")
 
     droid = Droid()
+    metrics.serve('DISCORD_METRICS_PORT')
     if discord_token:
         logging.info("DISCORD_TOKEN env var set")
         bot = DiscordClient(droid)
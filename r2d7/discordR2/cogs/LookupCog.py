@@ -140,23 +140,10 @@ class LookupCog(commands.Cog):
         description="Look up a card"
     )
     async def card(self, ctx: discord.ApplicationContext, query):
-        results = None
         if self.bot.droid.needs_update():
             self.bot.droid.load_data()
 
-        if not ctx.guild:
-            for regex, handle_method in self.bot.droid._dm_handlers.items():
-                if match := regex.search(f"[[{query}]]"):
-                    results = handle_method(match[1])
-                    if results:
-                        break
-
-        if not results:
-            for regex, handle_method in self.bot.droid._handlers.items():
-                if match := regex.search(f"[[{query}]]"):
-                    results = handle_method(match[1])
-                    if results:
-                        break
+        results = self.bot.droid.dispatch(f"[[{query}]]", direct=not ctx.guild)
         if not results:
             await ctx.respond("No cards found matching your query.", ephemeral=True)
             return
@@ -15,7 +15,7 @@ class FactionLister(DroidCore):
     def __init__(self):
         super().__init__()
         pattern = re.compile(self.faction_icon_pattern, re.I)
-        self.register_dm_handler(pattern, self.handle_faction_icon)
+        self.register_dm_handler(pattern, self.handle_faction_icon, triggers=[':'])
 
     icon_to_faction = {
         'scum': ('Scum and Villainy', ),
@@ -0,0 +1,139 @@
+import logging
+import os
+import struct
+
+import numpy as np
+
+from . import probability
+
+logger = logging.getLogger(__name__)
+
+# Precomputed outcome distributions for every attack and defence roll of up
+# to MAX_DICE dice, so the rollers can answer with a lookup instead of
+# working them out.  The table is generated offline with
+#   python -m r2d7.hittables
+# shipped next to this module, and memory mapped on import.
+#
+# File layout (little endian):
+#   header: b'R2HT', version (uint16), max dice (uint16)
+#   attack: float32[dice][conversions][rerolls][(hits, crits)], the last axis
+#           ordered by total then crits: (0,0), (1,0), (0,1), (2,0), ...
+#   defence: float32[dice][conversions][rerolls][evades], before evade tokens
+# Every axis runs from 0 to max dice.  More tokens than dice work the same as
+# one per die, so lookups clamp the counts and the rest of the axis is unused.
+
+MAGIC = b'R2HT'
+VERSION = 1
+MAX_DICE = 8
+HEADER = struct.Struct('<4sHH')
+HIT_TABLES = os.path.join(os.path.dirname(__file__), 'hit_tables.bin')
+
+
+def _outcome_index(hits, crits):
+    total = hits + crits
+    return total * (total + 1) // 2 + crits
+
+
+class HitTables(object):
+    def __init__(self, attack, defense, max_dice):
+        self.attack = attack
+        self.defense = defense
+        self.max_dice = max_dice
+
+    @classmethod
+    def shapes(cls, max_dice):
+        size = max_dice + 1
+        outcomes = size * (size + 1) // 2
+        return (size, size, size, outcomes), (size, size, size, size)
+
+    @classmethod
+    def load(cls, path=HIT_TABLES):
+        """
+        Memory maps the tables, or returns None if they can't be used
+        """
+        try:
+            with open(path, 'rb') as table_file:
+                magic, version, max_dice = HEADER.unpack(table_file.read(HEADER.size))
+        except (OSError, struct.error) as err:
+            logger.warning(f'No hit tables at {path}: {err}')
+            return None
+        if magic != MAGIC or version != VERSION:
+            logger.warning(f'Ignoring hit tables at {path}: unknown format')
+            return None
+        attack_shape, defense_shape = cls.shapes(max_dice)
+        attack = np.memmap(path, dtype='<f4', mode='r', offset=HEADER.size, shape=attack_shape)
+        defense = np.memmap(path, dtype='<f4', mode='r', offset=HEADER.size + attack.nbytes, shape=defense_shape)
+        return cls(attack, defense, max_dice)
+
+    def covers(self, dice):
+        return dice <= self.max_dice
+
+    def attack_roll(self, dice, conversions, rerolls):
+        row = self.attack[dice, min(conversions, dice), min(rerolls, dice)]
+        histogram = {}
+        for total in range(dice + 1):
+            for crits in range(total + 1):
+                p = float(row[_outcome_index(total - crits, crits)])
+                if p:
+                    histogram[(total - crits, crits)] = p
+        return probability.Distribution(histogram)
+
+    def defense_roll(self, dice, conversions, rerolls, evades):
+        row = self.defense[dice, min(conversions, dice), min(rerolls, dice)]
+        histogram = {}
+        for good in range(dice + 1):
+            p = float(row[good])
+            if p:
+                final = min(good + evades, dice)
+                histogram[(final, 0)] = histogram.get((final, 0), 0) + p
+        return probability.Distribution(histogram)
+
+
+def attack_roll(dice, focus=False, calculate=0, force=0, lock=False, reroll=0):
+    """
+    Same as probability.attack_roll, from the tables when they cover the roll
+    """
+    if hit_tables is None or not hit_tables.covers(dice):
+        return probability.attack_roll(dice, focus, calculate, force, lock, reroll)
+    return hit_tables.attack_roll(dice, dice if focus else calculate + force, dice if lock else reroll)
+
+
+def defense_roll(dice, focus=False, calculate=0, force=0, evade=0, reroll=0):
+    """
+    Same as probability.defense_roll, from the tables when they cover the roll
+    """
+    if hit_tables is None or not hit_tables.covers(dice):
+        return probability.defense_roll(dice, focus, calculate, force, evade, reroll)
+    return hit_tables.defense_roll(dice, dice if focus else calculate + force, reroll, evade)
+
+
+def covers(dice):
+    return hit_tables is not None and hit_tables.covers(dice)
+
+
+def generate(path=HIT_TABLES, max_dice=MAX_DICE):
+    attack_shape, defense_shape = HitTables.shapes(max_dice)
+    attack = np.zeros(attack_shape, dtype='<f4')
+    defense = np.zeros(defense_shape, dtype='<f4')
+    for dice in range(max_dice + 1):
+        for conversions in range(dice + 1):
+            for rerolls in range(dice + 1):
+                results = probability._roll(dice, probability.ATTACK_FACES, conversions, rerolls, 0)
+                for (hits, crits), p in results:
+                    attack[dice, conversions, rerolls, _outcome_index(hits, crits)] = p
+                results = probability._roll(dice, probability.DEFENSE_FACES, conversions, rerolls, 0)
+                for (evades, _), p in results:
+                    defense[dice, conversions, rerolls, evades] = p
+    with open(path, 'wb') as table_file:
+        table_file.write(HEADER.pack(MAGIC, VERSION, max_dice))
+        table_file.write(attack.tobytes())
+        table_file.write(defense.tobytes())
+    logger.info(f'Wrote hit tables for up to {max_dice} dice to {path}')
+
+
+hit_tables = HitTables.load()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    generate()
@@ -7,6 +7,7 @@ from enum import Enum
 import requests
 
 from r2d7.core import DroidCore, DroidException
+from r2d7.metrics import timed
 
 logger = logging.getLogger(__name__)
 
@@ -38,16 +39,18 @@ class ListLegality:
 
 
 class ListFormatter(DroidCore):
+    xws_timeout = 10  # seconds
 
     def __init__(self):
         super().__init__()
         # The leading and trailing < and > are for Slack
-        self.register_handler(r'<?(https?://[^>]+)>?', self.handle_url)
+        self.register_handler(r'<?(https?://[^>]+)>?', self.handle_url, triggers=['http'])
 
     _regexes = [
         re.compile(r'(https?://(xwing-legacy)\.com/(?:[^?/]*/)?\?(.*))')
     ]
 
+    @timed('fetch')
     def get_xws(self, message):
         match = None
         for regex in self._regexes:
@@ -64,7 +67,7 @@ class ListFormatter(DroidCore):
         if xws_url:
             xws_url = unescape(xws_url)
             logging.info(f"Requesting {xws_url}")
-            response = requests.get(xws_url)
+            response = requests.get(xws_url, timeout=self.xws_timeout)
             if response.status_code != 200:
                 raise DroidException(
                     f"Got {response.status_code} GETing {xws_url}")
@@ -152,9 +155,7 @@ class ListFormatter(DroidCore):
                     continue
                 upgrade_tip = ''
                 for side in upgrade['sides']:
-                    ability = side.get('ability', '')
-                    if isinstance(ability, list):
-                        ability = ability[0]
+                    ability = (self.card_text(side['ability']) or [''])[0] if 'ability' in side else ''
                     upgrade_tip += f"{side['title']}: {ability}\n"
                     for grant in side.get('grants', []):
                         if grant['type'] == 'action':
@@ -170,8 +171,8 @@ class ListFormatter(DroidCore):
                 legality.update(upgrade.get('standard', False), upgrade.get('extended', False),
                                 epic=upgrade.get('epic', False))
             ship_tip = pilot_card.get('ability', None)
-            if isinstance(ship_tip, list):
-                ship_tip = ship_tip[0]
+            if ship_tip is not None:
+                ship_tip = (self.card_text(ship_tip) or [''])[0]
             ship_line = (
                     self.iconify(pilot_card['ship']['name']) +
                     self.iconify(f"initiative{initiative}") +
@@ -11,6 +11,7 @@ class Metawing(DroidCore):
     Handler class, contains slack chat logic
     """
     match_base = '!meta'
+    meta_timeout = 10  # seconds
     pattern_handler = re.compile('(!meta.*)', re.I)
     pattern_pilot = re.compile('pilot', re.I)
     pattern_ship = re.compile('ship', re.I)
@@ -30,7 +31,7 @@ class Metawing(DroidCore):
 
     def __init__(self):
         super().__init__()
-        self.register_handler(Metawing.pattern_handler, self.handler)
+        self.register_handler(Metawing.pattern_handler, self.handler, triggers=['!'])
 
     def handler(self, message):
         url = self._base_url + self._list_path
@@ -67,7 +68,7 @@ class Metawing(DroidCore):
     def query_and_print(self, url, printer, num_to_print=5):
         url = url + self._json_suffix
         try:
-            result = requests.get(url)
+            result = requests.get(url, timeout=self.meta_timeout)
             if not result.ok:
                 logger.debug(f'Failed to get: {url}')
                 return [[self._query_error]]
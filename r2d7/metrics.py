@@ -0,0 +1,258 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import logging
+import math
+import os
+import threading
+import time
+
+import flask
+from werkzeug.serving import make_server
+
+from r2d7.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a trie walk up to a slow upstream timing out
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(object):
+    """
+    One metric family; samples() yields (name, labels, value)
+    """
+    def families(self):
+        return [(self.name, self.help, self.type, self.samples())]
+
+
+class Counter(Metric):
+    """
+    A count that only goes up, split by the value of one label
+    """
+    type = 'counter'
+
+    def __init__(self, name, help, label):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value):
+        return self._values.get(label_value, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items()):
+            yield self.name, {self.label: label_value}, value
+
+
+class Histogram(Metric):
+    """
+    How long something took, in buckets, split by the value of one label
+    """
+    type = 'histogram'
+
+    def __init__(self, name, help, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._counts = {}  # label value: count per bucket, the last one for +Inf
+        self._sums = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._counts.get(label_value)
+            if counts is None:
+                counts = self._counts[label_value] = [0] * (len(self.buckets) + 1)
+                self._sums[label_value] = 0.0
+            counts[index] += 1
+            self._sums[label_value] += seconds
+
+    @contextmanager
+    def time(self, label_value):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label_value, time.perf_counter() - start)
+
+    def count(self, label_value):
+        return sum(self._counts.get(label_value, ()))
+
+    def samples(self):
+        with self._lock:
+            counts = {label_value: list(c) for label_value, c in self._counts.items()}
+            sums = dict(self._sums)
+        for label_value in sorted(counts):
+            total = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts[label_value]):
+                total += count
+                yield f'{self.name}_bucket', {self.label: label_value, 'le': _format_value(bound)}, total
+            yield f'{self.name}_sum', {self.label: label_value}, sums[label_value]
+            yield f'{self.name}_count', {self.label: label_value}, total
+
+
+class StatsCollector(Metric):
+    """
+    Reports the numbers in an existing stats() dict as gauges, read when the
+    metrics are scraped.  With a label, stats returns {label value: stats}.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, help, stats, label=None):
+        self.name = name
+        self.help = help
+        self.stats = stats
+        self.label = label
+
+    def families(self):
+        try:
+            stats = self.stats()
+        except Exception:
+            logger.exception(f'Unable to collect {self.name}')
+            return []
+        families = {}
+        groups = stats.items() if self.label else [(None, stats)]
+        for label_value, group in groups:
+            labels = {self.label: label_value} if self.label else {}
+            for key, value in group.items():
+                # Skip nested and non-numeric entries, eg. breaker states
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    families.setdefault(key, []).append((f'{self.name}_{key}', labels, value))
+        return [(f'{self.name}_{key}', f'{self.help}: {key}', self.type, samples)
+                for key, samples in sorted(families.items())]
+
+
+class Info(Metric):
+    """
+    A gauge of 1 whose labels carry the information, eg. the data version
+    """
+    type = 'gauge'
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def samples(self):
+        try:
+            labels = self.labels()
+        except Exception:
+            logger.exception(f'Unable to collect {self.name}')
+            return
+        if labels:
+            yield self.name, labels, 1
+
+
+class MetricsRegistry(object):
+    """
+    The metrics one process reports, rendered in the Prometheus text format.
+
+    Like message_dispatcher there is one global instance; modules add their
+    metrics and collectors to it when they are imported.  Adding a metric
+    under a name that is already registered replaces it.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, label):
+        return self._add(Counter(name, help, label))
+
+    def histogram(self, name, help, label, buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, label, buckets))
+
+    def collect_stats(self, name, help, stats, label=None):
+        return self._add(StatsCollector(name, help, stats, label))
+
+    def info(self, name, help, labels):
+        return self._add(Info(name, help, labels))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            for family, help, type, samples in metric.families():
+                lines.append(f'# HELP {family} {help}')
+                lines.append(f'# TYPE {family} {type}')
+                for name, labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    'r2d7_stage_seconds', 'Time spent in each stage of answering a message', 'stage')
+stage_errors = metrics.counter(
+    'r2d7_stage_errors_total', 'Stages that ended with an exception', 'stage')
+
+
+@contextmanager
+def timed(stage):
+    """
+    Records how long the block took under stage, and whether it raised.
+    If the interaction is being traced the block is a span too.
+    """
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    except BaseException:
+        stage_errors.inc(stage)
+        raise
+    finally:
+        stage_seconds.observe(stage, time.perf_counter() - start)
+
+
+def create_app(registry=metrics):
+    app = flask.Flask(__name__)
+
+    @app.route('/metrics')
+    def scrape():
+        return flask.Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
+
+
+def serve(port_env='METRICS_PORT', host='127.0.0.1', registry=metrics):
+    """
+    Serves /metrics from a background thread if the port_env environment
+    variable gives a port. Returns the server, or None.
+    """
+    port = os.getenv(port_env)
+    if not port:
+        return None
+    server = make_server(host, int(port), create_app(registry), threaded=True)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(f'Serving metrics on http://{host}:{port}/metrics')
+    return server
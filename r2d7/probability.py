@@ -0,0 +1,161 @@
+from collections import defaultdict
+from functools import lru_cache
+from math import factorial
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Exact dice probabilities for X-Wing 2.0 rolls, worked out locally instead of
+# asking the gateofstorms calculator.
+#
+# Every die is reduced to four faces: good (hit or evade), crit, focus and
+# blank.  A roll is the multinomial over those faces; rerolls and token spends
+# only depend on how many of each face were rolled, so the whole calculation
+# runs over face counts and is memoised.
+#
+# Modifiers are spent the way a player trying to do the most damage (or avoid
+# the most) would:
+#   - rerolls go on blanks first, then on focus results that can't be changed
+#   - a focus token changes every focus result, calculate and force tokens
+#     change one each
+#   - evade tokens (defence only) change one remaining blank or focus each
+#   - a lock only rerolls attack dice, same as the roller
+#   - reinforce cancels one extra result per token if 2 or more would land,
+#     but never the last one
+
+ATTACK_FACES = (3/8, 1/8, 2/8, 2/8)  # hit, crit, focus, blank
+DEFENSE_FACES = (3/8, 0, 2/8, 3/8)  # evade, -, focus, blank
+
+
+class Distribution(object):
+    """
+    Probability of every (hits, crits) result of a roll.  For defence rolls
+    the evades are counted as hits and crits are always 0.
+    """
+    def __init__(self, histogram):
+        self.histogram = dict(histogram)
+
+    def __iter__(self):
+        return iter(self.histogram.items())
+
+    def expected_hits(self):
+        """
+        Expected hits and crits combined
+        """
+        return sum((hits + crits) * p for (hits, crits), p in self.histogram.items())
+
+    def expected_crits(self):
+        return sum(crits * p for (_, crits), p in self.histogram.items())
+
+    def crit_chance(self):
+        """
+        Chance of at least one crit
+        """
+        return sum(p for (_, crits), p in self.histogram.items() if crits > 0)
+
+    def at_least(self, hits):
+        """
+        Chance of at least this many hits and crits combined
+        """
+        return sum(p for (h, c), p in self.histogram.items() if h + c >= hits)
+
+    def totals(self):
+        """
+        Probability of each total number of hits and crits
+        """
+        totals = defaultdict(float)
+        for (hits, crits), p in self.histogram.items():
+            totals[hits + crits] += p
+        return dict(sorted(totals.items()))
+
+
+@lru_cache(maxsize=None)
+def _multinomial(dice, faces):
+    """
+    All the ways dice can land as (good, crit, focus, blank) counts, with their probability
+    """
+    good_p, crit_p, focus_p, blank_p = faces
+    outcomes = []
+    for good in range(dice + 1):
+        for crit in range(dice - good + 1):
+            if crit and not crit_p:
+                break
+            for focus in range(dice - good - crit + 1):
+                blank = dice - good - crit - focus
+                ways = factorial(dice) // (factorial(good) * factorial(crit) * factorial(focus) * factorial(blank))
+                p = ways * good_p ** good * crit_p ** crit * focus_p ** focus * blank_p ** blank
+                if p:
+                    outcomes.append(((good, crit, focus, blank), p))
+    return tuple(outcomes)
+
+
+@lru_cache(maxsize=None)
+def _after_reroll(rerolled, kept_focus, conversions, faces):
+    """
+    Results of rerolling some dice, with kept_focus focus results still on the
+    table, once up to conversions focus results have been changed.
+    Returns ((extra good, extra crits), p) pairs.
+    """
+    results = defaultdict(float)
+    for (good, crit, focus, _), p in _multinomial(rerolled, faces):
+        converted = min(kept_focus + focus, conversions)
+        results[(good + converted, crit)] += p
+    return tuple(results.items())
+
+
+@lru_cache(maxsize=None)
+def _roll(dice, faces, conversions, rerolls, evades):
+    results = defaultdict(float)
+    for (good, crit, focus, blank), p in _multinomial(dice, faces):
+        # Blanks are always worth rerolling, focus only if it can't be changed
+        stuck_focus = max(0, focus - conversions)
+        rerolled_blanks = min(blank, rerolls)
+        rerolled_focus = min(stuck_focus, rerolls - rerolled_blanks)
+        rerolled = rerolled_blanks + rerolled_focus
+        for (extra_good, extra_crit), reroll_p in _after_reroll(rerolled, focus - rerolled_focus, conversions, faces):
+            final_good = good + extra_good
+            final_crit = crit + extra_crit
+            final_good += min(evades, dice - final_good - final_crit)
+            results[(final_good, final_crit)] += p * reroll_p
+    return tuple(results.items())
+
+
+def attack_roll(dice, focus=False, calculate=0, force=0, lock=False, reroll=0):
+    """
+    Distribution of hits and crits for a modified attack roll
+    """
+    conversions = dice if focus else calculate + force
+    rerolls = dice if lock else reroll
+    return Distribution(_roll(dice, ATTACK_FACES, conversions, rerolls, 0))
+
+
+def defense_roll(dice, focus=False, calculate=0, force=0, evade=0, reroll=0):
+    """
+    Distribution of evades for a modified defence roll
+    """
+    conversions = dice if focus else calculate + force
+    return Distribution(_roll(dice, DEFENSE_FACES, conversions, reroll, evade))
+
+
+def all_hits(dice):
+    """
+    An attack that is nothing but hits, for asking how well a defence roll holds up
+    """
+    return Distribution({(dice, 0): 1.0})
+
+
+def resolve(attack, defense=None, reinforce=0):
+    """
+    Distribution of the hits and crits that get through the defence.
+    Evades cancel hits before crits, reinforce likewise.
+    """
+    defense = defense or Distribution({(0, 0): 1.0})
+    results = defaultdict(float)
+    for (hits, crits), attack_p in attack:
+        for (evades, _), defense_p in defense:
+            cancelled = min(evades, hits + crits)
+            if hits + crits - cancelled >= 2:
+                cancelled += min(reinforce, hits + crits - cancelled - 1)
+            hits_cancelled = min(cancelled, hits)
+            results[(hits - hits_cancelled, crits - (cancelled - hits_cancelled))] += attack_p * defense_p
+    return Distribution(results)
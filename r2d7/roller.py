@@ -3,99 +3,47 @@ import logging
 import re
 import random
 from .calculator import *
+from . import hittables
+from . import probability
+from . import simulator
+from .rollparser import RollSyntaxError, parse_query, parse_roll
 from .dice import DieType, AttackDie, DefenseDie, dieFactory
 from r2d7.core import DroidCore
 
 logger = logging.getLogger(__name__)
 
-class RollSyntaxError(Exception):
-    pass
 
-class ModdedRoll(object):
+def hit_chances(outcome, max_hits):
     """
-    Class for managing all aspects of a roll. It parses, it rolls, it queries the online calculator.
+    (hits, chance of at least that many) for each number of hits that could happen
     """
-    _re_def = '\\b((green(s)?)|(g))\\b'
-    _re_atk = '\\b((red(s)?)|(r))\\b'
-    pattern_def = re.compile(_re_def, re.I)
-    pattern_atk = re.compile(_re_atk, re.I)
-    pattern_main = re.compile(f'(?P<num_dice>[0-9]+) ?(?P<color>{_re_def}|{_re_atk})', re.I)
-    pattern_count = re.compile('([0-9]+)', re.I)
-    pattern_mod = {
-            # \\b at the start forces a new word (stops force/reinforce confusion)
-            # leaving it off the end allows plural matching
-            'focus':re.compile('\\b(?P<focus>([0-9]+ ?focus)|(focus ?[0-9]*))', re.I),
-            'evade':re.compile('\\b(?P<evade>([0-9]+ ?evade)|(evade ?[0-9]*))', re.I),
-            'reinforce':re.compile('\\b(?P<reinforce>([0-9]+ ?reinforce)|(reinforce ?[0-9]*))', re.I),
-            'lock':re.compile('\\b(target )?lock(ed)?\\b', re.I),
-            'calculate':re.compile('\\b(?P<calculate>([0-9]+ ?calc(ulate)?)|(calc(ulate)? ?[0-9]*))', re.I),
-            'force':re.compile('\\b(?P<force>([0-9]+ ?force)|(force ?[0-9]*))', re.I),
-            'reroll':re.compile('\\b(?P<reroll>([0-9]+ ?reroll)|(reroll ?[0-9]*))', re.I)
-    }
-
-    def __init__(self, message):
-        match_main = ModdedRoll.pattern_main.search(message)
-        if not match_main:
-            logger.debug(f'roll parsing error: bad roll syntax: {message}')
-            raise RollSyntaxError('I don\'t understand what you want me to roll. :barrelroll:?')
-            return
+    chances = [(hits, outcome.at_least(hits)) for hits in range(1, max_hits + 1)]
+    return [(hits, chance) for hits, chance in chances if chance >= 0.0005]
 
-        try:
-            num_dice = int(match_main.group('num_dice'))
-        except Exception as err:
-            logger.debug(f'roll parsing error: unknown number of dice: {str(err)} \n message: {message}')
-            raise RollSyntaxError('I don\'t know how many dice you want me to roll')
-
-        if num_dice > 100:
-            logger.debug(f'Too many dice requested (max: 100, requested: {num_dice})')
-            raise RollSyntaxError('Sorry, I can\'t carry more than 100 dice, and chopper won\'t help :chopper:')
-        elif num_dice < 1:
-            logger.debug(f'Too few dice requested (min: 1, requested: {num_dice})')
-            raise RollSyntaxError('Sorry, I can\'t roll fewer than 1 dice :jar_jar:')
-
-        if ModdedRoll.pattern_atk.search(message):
-            self.die_type = DieType.attack
-        elif ModdedRoll.pattern_def.search(message):
-            self.die_type = DieType.defense
-        else:
-            logger.debug('roll parsing error: no dice color found')
-            raise RollSyntaxError('I don\'t know what color dice you want me to roll')
-        self.dice = [dieFactory[self.die_type]() for i in range(num_dice)]
 
-        try:
-            self.parse_mod_boolean('focus', message)
-            self.parse_mod_boolean('lock', message)
-            self.parse_mod_numeric('evade', message)
-            self.parse_mod_numeric('reinforce', message)
-            self.parse_mod_numeric('calculate', message)
-            self.parse_mod_numeric('force', message)
-            self.parse_mod_numeric('reroll', message)
-
-        except Exception as err:
-            logger.debug(f'roll parsing error: {str(err)} \n message: {message}')
-            raise RollSyntaxError('Incorrect dice roll syntax. Someone call a judge.')
-
-        if self.reroll > 3:
-            logger.debug(f'Too many rerolls requested (max: 3, requested: {self.reroll})')
-            raise RollSyntaxError('Sorry, the calculator only allows up to 3 rerolls')
+class ModdedRoll(object):
+    """
+    Class for managing all aspects of a roll. It parses, it rolls, it works out the odds.
+    """
+    def __init__(self, message):
+        self.spec = parse_roll(message)
+        self.die_type = DieType(self.spec.die_type)
+        self.dice = [dieFactory[self.die_type]() for i in range(self.spec.dice)]
+        self.focus = self.spec.focus
+        self.lock = self.spec.lock
+        self.evade = self.spec.evade
+        self.reinforce = self.spec.reinforce
+        self.calculate = self.spec.calculate
+        self.force = self.spec.force
+        self.reroll = self.spec.reroll
 
         self.modify_dice()
         self.calculator_url = None
         self.calculator_url_description = None
         self.calculator_result = None
-
-    def parse_mod_boolean(self, attr_name, message):
-        value = ModdedRoll.pattern_mod[attr_name].search(message) is not None
-        setattr(self, attr_name, value)
-
-    def parse_mod_numeric(self, attr_name, message):
-        match_mod = ModdedRoll.pattern_mod[attr_name].search(message)
-        if match_mod:
-            match_count = ModdedRoll.pattern_count.search(match_mod.group(1))
-            value = int(match_count.group(1)) if match_count is not None else 1
-        else:
-            value = 0
-        setattr(self, attr_name, value)
+        self.calculator_error = None
+        self.crit_chance = None
+        self.hit_chances = None
 
     def modify_dice(self):
         if not self.dice:
@@ -155,25 +103,81 @@ class ModdedRoll(object):
                     reroll = self.reroll)
         return form
 
+    def calculator(self):
+        """
+        Builds the calculator for this roll. Nothing is sent until it is run.
+        """
+        if self.die_type == DieType.attack:
+            return Calculator(attack_form = self.calculator_form(), defense_form = DefenseForm())
+        else:
+            attack_form = AttackForm(dice = len(self.dice), all_hits = True)
+            return Calculator(attack_form = attack_form, defense_form = self.calculator_form())
+
+    def calculator_permalink(self):
+        """
+        Link to this roll on the calculator if we've had it calculated before,
+        otherwise the calculator's front page
+        """
+        calculator = self.calculator()
+        return calculator.url if calculator.from_cache() else Calculator._human_url
+
+    def distribution(self):
+        """
+        Exact distribution of the modified roll, before any opposing roll
+        """
+        if self.die_type == DieType.attack:
+            return hittables.attack_roll(len(self.dice), focus=self.focus, calculate=self.calculate,
+                                         force=self.force, lock=self.lock, reroll=self.reroll)
+        else:
+            return hittables.defense_roll(len(self.dice), focus=self.focus, calculate=self.calculate,
+                                          force=self.force, evade=self.evade, reroll=self.reroll)
+
+    def outcome(self):
+        if self.die_type == DieType.attack:
+            return probability.resolve(self.distribution())
+        else:
+            return probability.resolve(probability.all_hits(len(self.dice)), self.distribution(), self.reinforce)
+
+    def pool(self):
+        if self.die_type == DieType.attack:
+            return simulator.attack_pool(len(self.dice), focus=self.focus, calculate=self.calculate,
+                                         force=self.force, lock=self.lock, reroll=self.reroll)
+        else:
+            return simulator.defense_pool(len(self.dice), focus=self.focus, calculate=self.calculate,
+                                          force=self.force, evade=self.evade, reroll=self.reroll)
+
+    def simulate(self):
+        if self.die_type == DieType.attack:
+            return simulator.simulate(self.pool())
+        else:
+            return simulator.simulate(simulator.all_hits_pool(len(self.dice)), self.pool(), self.reinforce)
+
+    def exact_safe(self):
+        """
+        True if the odds can be worked out exactly rather than simulated
+        """
+        return self.calculator_safe() or hittables.covers(len(self.dice))
+
     def calculate_expected(self):
-        if self.calculator_safe():
-            try:
-                if self.die_type == DieType.attack:
-                    calculator = Calculator(attack_form = self.calculator_form(), defense_form = DefenseForm())
-                    calculator.calculate()
-                    self.calculator_url = calculator.url
-                    self.calculator_url_description = 'Expected total hits:'
-                    self.calculator_result = calculator.expected_hits()
-                else:
-                    num_dice = len(self.dice)
-                    attack_form = AttackForm(dice = num_dice, all_hits = True)
-                    calculator = Calculator(attack_form = attack_form, defense_form = self.calculator_form())
-                    calculator.calculate()
-                    self.calculator_url = calculator.url
-                    self.calculator_url_description = f'Expected damage suffered from {num_dice} hits:'
-                    self.calculator_result = calculator.expected_hits()
-            except Exception as err:
-                logger.debug(f'Dice calculator error: {str(err)}')
+        # Worked out locally, so there's no network call. The link goes to the
+        # calculator for anyone who wants to explore the roll further, but only
+        # when the calculator can handle the roll; big rolls are simulated.
+        if self.exact_safe():
+            outcome = self.outcome()
+            self.calculator_url = self.calculator_permalink() if self.calculator_safe() else None
+            self.calculator_error = None
+            self.hit_chances = hit_chances(outcome, len(self.dice))
+        else:
+            outcome = self.simulate()
+            self.calculator_url = None
+            self.calculator_error = outcome.confidence
+            self.hit_chances = None
+        if self.die_type == DieType.attack:
+            self.calculator_url_description = 'Expected total hits:'
+        else:
+            self.calculator_url_description = f'Expected damage suffered from {len(self.dice)} hits:'
+        self.calculator_result = outcome.expected_hits()
+        self.crit_chance = outcome.crit_chance()
 
     def actual_roll(self):
         output = ''.join([str(d) for d in self.dice])
@@ -198,20 +202,47 @@ class VsRoll(object):
         self.calculator_url = None
         self.calculator_url_description = None
         self.calculator_result = None
+        self.calculator_error = None
+        self.crit_chance = None
+        self.hit_chances = None
 
     def calculator_safe(self):
         return self.atk_roll.calculator_safe() and self.def_roll.calculator_safe()
 
+    def calculator(self):
+        return Calculator(attack_form = self.atk_roll.calculator_form(), defense_form = self.def_roll.calculator_form())
+
+    def calculator_permalink(self):
+        """
+        Link to this roll on the calculator if we've had it calculated before,
+        otherwise the calculator's front page
+        """
+        calculator = self.calculator()
+        return calculator.url if calculator.from_cache() else Calculator._human_url
+
+    def outcome(self):
+        return probability.resolve(self.atk_roll.distribution(), self.def_roll.distribution(), self.def_roll.reinforce)
+
+    def simulate(self):
+        return simulator.simulate(self.atk_roll.pool(), self.def_roll.pool(), self.def_roll.reinforce)
+
+    def exact_safe(self):
+        return self.atk_roll.exact_safe() and self.def_roll.exact_safe()
+
     def calculate_expected(self):
-        if self.calculator_safe():
-            try:
-                calculator = Calculator(attack_form = self.atk_roll.calculator_form(), defense_form = self.def_roll.calculator_form())
-                calculator.calculate()
-                self.calculator_url = calculator.url
-                self.calculator_url_description = 'Expected total hits:'
-                self.calculator_result = calculator.expected_hits()
-            except Exception as err:
-                logger.debug(f'Dice calculator error: {str(err)}')
+        if self.exact_safe():
+            outcome = self.outcome()
+            self.calculator_url = self.calculator_permalink() if self.calculator_safe() else None
+            self.calculator_error = None
+            self.hit_chances = hit_chances(outcome, len(self.atk_roll.dice))
+        else:
+            outcome = self.simulate()
+            self.calculator_url = None
+            self.calculator_error = outcome.confidence
+            self.hit_chances = None
+        self.calculator_url_description = 'Expected total hits:'
+        self.calculator_result = outcome.expected_hits()
+        self.crit_chance = outcome.crit_chance()
 
     def actual_roll(self):
         output = ['You rolled:']
@@ -225,35 +256,25 @@ class Roller(DroidCore):
     Handler class, contains slack chat logic
     """
     pattern_handler = re.compile('(!roll.*)', re.I)
-    pattern_vs = re.compile('\\b(?P<vs>(vs)|(versus)|(v))\\b', re.I)
-    pattern_syntax = re.compile('\\b((syntax)|(help))\\b', re.I)
-    pattern_barrel = re.compile('\\bbarrel\\b', re.I)
-    pattern_numeric = re.compile('\\bd(?P<num>[0-9]+)\\b', re.I)
-    pattern_scenario = re.compile('\\b((scenario)|(mission))\\b', re.I)
 
     def __init__(self):
         super().__init__()
-        self.register_handler(Roller.pattern_handler, self.roll_dice)
+        self.register_handler(Roller.pattern_handler, self.roll_dice, triggers=['!'])
 
     def roll_dice(self, message):
-        match_vs = Roller.pattern_vs.search(message)
-        match_syntax = Roller.pattern_syntax.search(message)
-        match_barrel = Roller.pattern_barrel.search(message)
-        match_numeric = Roller.pattern_numeric.search(message)
-        match_scenario = Roller.pattern_scenario.search(message)
-        if match_syntax:
+        query = parse_query(message)
+        if query.command == 'syntax':
             return [self.roll_syntax()]
-        elif match_barrel:
+        elif query.barrel:
             return [self.roll_barrel()]
-        elif match_numeric:
-            return [self.roll_numeric(match_numeric)]
-        elif match_scenario:
+        elif query.command == 'numeric':
+            return [self.roll_numeric(query.die_max)]
+        elif query.command == 'scenario':
             return [self.roll_scenario()]
         else:
             try:
-                if match_vs:
-                    roll_strings = message.split(match_vs.group('vs'))
-                    modded_rolls = [ModdedRoll(r) for r in roll_strings]
+                if len(query.sides) == 2:
+                    modded_rolls = [ModdedRoll(r) for r in query.sides]
                     if modded_rolls[0].die_type == modded_rolls[1].die_type:
                         raise RollSyntaxError('Opposing rolls cannot have same color')
                     elif modded_rolls[0].die_type == DieType.attack:
@@ -269,11 +290,18 @@ class Roller(DroidCore):
     def print_roll(self, roll):
         output = []
         output.append(roll.actual_roll())
-        if roll.calculator_safe():
-            roll.calculate_expected()
-            link_string = self.link(roll.calculator_url, roll.calculator_url_description)
-            result_string = self.bold(f'{roll.calculator_result:.3f}')
-            output.append(f'{link_string} {result_string}')
+        roll.calculate_expected()
+        if roll.calculator_url:
+            description = self.link(roll.calculator_url, roll.calculator_url_description)
+        else:
+            description = roll.calculator_url_description
+        result_string = self.bold(f'{roll.calculator_result:.3f}')
+        if roll.calculator_error is not None:
+            result_string += f' ± {roll.calculator_error:.3f}'
+        output.append(f'{description} {result_string}')
+        if roll.hit_chances:
+            output.append('Chance of at least: ' + ', '.join(
+                f'{hits} {chance:.1%}' for hits, chance in roll.hit_chances))
         return output
 
     def roll_syntax(self):
@@ -304,11 +332,10 @@ class Roller(DroidCore):
         output.append(random.choice(starfox_lines))
         return output
 
-    def roll_numeric(self, match):
+    def roll_numeric(self, die_max):
         output = []
         try:
-            die_max = match.group('num')
-            output.append(str(random.randint(1,int(die_max))))
+            output.append(str(random.randint(1, die_max)))
         except RollSyntaxError as err:
             return [[err.__str__(), 'Type `!roll syntax` for help']]
         return output
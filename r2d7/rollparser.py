@@ -0,0 +1,198 @@
+from functools import lru_cache
+from typing import NamedTuple, Optional
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Parser for the dice roll language used by !roll and /roll, e.g.
+#   3 red with focus and 2 calculate vs 2 green with evade
+#
+# The text is split into number and word tokens in a single regex pass, and
+# the grammar below works on the tokens.  It follows the rules the rollers
+# used to apply with a regex per modifier:
+#   - the dice count is the first number followed by one space and a colour
+#   - a modifier's count is the number right before it ("2 calculate"), or
+#     failing that right after it ("calc 2"), otherwise 1.  Only one space is
+#     allowed between them, and a number after the word only counts if the
+#     word is exactly the keyword (so "calculates 2" is 1 calculate)
+#   - modifier words may have endings ("calculates", "focused"), but lock and
+#     the colours are whole words
+#   - only the first mention of each modifier counts
+#   - red anywhere in the roll makes it an attack roll
+
+
+class RollSyntaxError(Exception):
+    pass
+
+
+class Token(NamedTuple):
+    text: str
+    start: int
+    end: int
+    number: bool
+
+
+class RollSpec(NamedTuple):
+    dice: int
+    die_type: str  # DieType value, 'atk' or 'def'
+    focus: bool = False
+    lock: bool = False
+    evade: int = 0
+    reinforce: int = 0
+    calculate: int = 0
+    force: int = 0
+    reroll: int = 0
+
+
+class RollQuery(NamedTuple):
+    command: str  # roll, syntax, numeric or scenario
+    sides: tuple = ()  # text of each roll, two for a vs roll
+    die_max: Optional[int] = None  # for numeric rolls, e.g. d6
+    barrel: bool = False  # only the Slack bot does barrel rolls
+
+
+MAX_DICE = 100
+MAX_REROLLS = 3
+
+# Only ASCII digits are numbers; other digits such as '²' are part of words
+RE_TOKEN = re.compile(r'(?P<number>[0-9]+)|[^\W\d]+')
+ATTACK_WORDS = {'red', 'reds', 'r'}
+DEFENSE_WORDS = {'green', 'greens', 'g'}
+LOCK_WORDS = {'lock', 'locked'}
+VS_WORDS = {'vs', 'versus', 'v'}
+SYNTAX_WORDS = {'syntax', 'help'}
+SCENARIO_WORDS = {'scenario', 'mission'}
+# Each modifier's word prefix and the exact forms a trailing number can follow
+MODIFIERS = {
+    'focus': ('focus', {'focus'}),
+    'evade': ('evade', {'evade'}),
+    'reinforce': ('reinforce', {'reinforce'}),
+    'calculate': ('calc', {'calc', 'calculate'}),
+    'force': ('force', {'force'}),
+    'reroll': ('reroll', {'reroll'}),
+}
+
+
+class _Tokens(object):
+    def __init__(self, text):
+        self.text = text
+        self.tokens = [Token(m.group().lower(), m.start(), m.end(), m.lastgroup == 'number')
+                       for m in RE_TOKEN.finditer(text)]
+
+    def _is_word_char(self, pos):
+        return 0 <= pos < len(self.text) and (self.text[pos].isalnum() or self.text[pos] == '_')
+
+    def starts_word(self, token):
+        return not self._is_word_char(token.start - 1)
+
+    def ends_word(self, token):
+        return not self._is_word_char(token.end)
+
+    def whole_word(self, token):
+        return self.starts_word(token) and self.ends_word(token)
+
+    def next(self, i, max_gap=' '):
+        """
+        The token after i if it is separated by nothing or max_gap
+        """
+        if i + 1 < len(self.tokens):
+            following = self.tokens[i + 1]
+            if self.text[self.tokens[i].end:following.start] in ('', max_gap):
+                return following
+        return None
+
+    def find_words(self, words):
+        for i, token in enumerate(self.tokens):
+            if not token.number and token.text in words and self.whole_word(token):
+                return i, token
+        return None, None
+
+    def modifier(self, prefix, exact_forms):
+        """
+        Count for the first mention of a modifier, or None if it isn't there
+        """
+        for i, token in enumerate(self.tokens):
+            if token.number:
+                following = self.next(i)
+                if (self.starts_word(token) and following and not following.number
+                        and following.text.startswith(prefix)):
+                    return int(token.text)
+            elif token.text.startswith(prefix) and self.starts_word(token):
+                following = self.next(i)
+                if token.text in exact_forms and following and following.number:
+                    return int(following.text)
+                return 1
+        return None
+
+    def dice(self):
+        for i, token in enumerate(self.tokens):
+            following = self.next(i)
+            if (token.number and following and following.start == token.end + 1
+                    and (following.text in ATTACK_WORDS or following.text in DEFENSE_WORDS)
+                    and self.ends_word(following)):
+                return int(token.text)
+        return None
+
+
+@lru_cache(maxsize=1024)
+def parse_query(text):
+    """
+    Works out what kind of roll command text is. The rolls themselves are
+    parsed with parse_roll.
+    """
+    tokens = _Tokens(text)
+    barrel = tokens.find_words({'barrel'})[1] is not None
+    if tokens.find_words(SYNTAX_WORDS)[1]:
+        return RollQuery('syntax', barrel=barrel)
+    for i, token in enumerate(tokens.tokens):
+        following = tokens.next(i, max_gap='')
+        if (token.text == 'd' and tokens.starts_word(token) and following and following.number
+                and tokens.ends_word(following)):
+            return RollQuery('numeric', die_max=int(following.text), barrel=barrel)
+    if tokens.find_words(SCENARIO_WORDS)[1]:
+        return RollQuery('scenario', barrel=barrel)
+    _, vs = tokens.find_words(VS_WORDS)
+    if vs:
+        return RollQuery('roll', (text[:vs.start], text[vs.end:]), barrel=barrel)
+    return RollQuery('roll', (text,), barrel=barrel)
+
+
+@lru_cache(maxsize=1024)
+def parse_roll(text):
+    """
+    Parses one side of a roll into a RollSpec. Raises RollSyntaxError with a
+    message for the user if it doesn't make sense.
+    """
+    tokens = _Tokens(text)
+    num_dice = tokens.dice()
+    if num_dice is None:
+        logger.debug(f'roll parsing error: bad roll syntax: {text}')
+        raise RollSyntaxError('I don\'t understand what you want me to roll. :barrelroll:?')
+    if num_dice > MAX_DICE:
+        logger.debug(f'Too many dice requested (max: {MAX_DICE}, requested: {num_dice})')
+        raise RollSyntaxError('Sorry, I can\'t carry more than 100 dice, and chopper won\'t help :chopper:')
+    elif num_dice < 1:
+        logger.debug(f'Too few dice requested (min: 1, requested: {num_dice})')
+        raise RollSyntaxError('Sorry, I can\'t roll fewer than 1 dice :jar_jar:')
+
+    if tokens.find_words(ATTACK_WORDS)[1]:
+        die_type = 'atk'
+    elif tokens.find_words(DEFENSE_WORDS)[1]:
+        die_type = 'def'
+    else:
+        logger.debug('roll parsing error: no dice color found')
+        raise RollSyntaxError('I don\'t know what color dice you want me to roll')
+
+    counts = {name: tokens.modifier(prefix, exact_forms) for name, (prefix, exact_forms) in MODIFIERS.items()}
+    spec = RollSpec(
+        dice=num_dice,
+        die_type=die_type,
+        focus=counts.pop('focus') is not None,
+        lock=tokens.find_words(LOCK_WORDS)[1] is not None,
+        **{name: count or 0 for name, count in counts.items()})
+
+    if spec.reroll > MAX_REROLLS:
+        logger.debug(f'Too many rerolls requested (max: {MAX_REROLLS}, requested: {spec.reroll})')
+        raise RollSyntaxError('Sorry, the calculator only allows up to 3 rerolls')
+    return spec
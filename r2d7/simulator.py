@@ -0,0 +1,117 @@
+from typing import NamedTuple
+import logging
+import math
+
+import numpy as np
+
+from .probability import ATTACK_FACES, DEFENSE_FACES
+
+logger = logging.getLogger(__name__)
+
+# Monte Carlo counterpart to probability.py for rolls that are too big for the
+# exact calculation (up to 100 dice, lots of reinforce...).  Whole batches of
+# rolls are drawn at once as face counts, and the modifiers are applied with
+# array operations using the same rules as probability.py, so the cost of a
+# batch barely depends on the number of dice.
+
+
+class Pool(NamedTuple):
+    dice: int
+    faces: tuple  # probability of good, crit, focus, blank
+    conversions: int = 0  # focus results that can be changed
+    rerolls: int = 0
+    evades: int = 0
+
+
+def attack_pool(dice, focus=False, calculate=0, force=0, lock=False, reroll=0):
+    return Pool(dice, ATTACK_FACES, dice if focus else calculate + force, dice if lock else reroll)
+
+
+def defense_pool(dice, focus=False, calculate=0, force=0, evade=0, reroll=0):
+    return Pool(dice, DEFENSE_FACES, dice if focus else calculate + force, reroll, evade)
+
+
+def all_hits_pool(dice):
+    return Pool(dice, (1.0, 0, 0, 0))
+
+
+class SimulationResult(object):
+    """
+    Estimated outcome of a roll.  confidence is the half-width of the 95%
+    confidence interval on the expected hits.
+    """
+    def __init__(self, mean, confidence, crit_chance, samples):
+        self.mean = mean
+        self.confidence = confidence
+        self._crit_chance = crit_chance
+        self.samples = samples
+
+    def expected_hits(self):
+        return self.mean
+
+    def crit_chance(self):
+        return self._crit_chance
+
+
+def roll_pool(rng, pool, size):
+    """
+    Rolls and modifies size copies of the pool.
+    Returns arrays of (good, crits) per roll.
+    """
+    good, crit, focus, blank = rng.multinomial(pool.dice, pool.faces, size=size).T
+    # Blanks are always worth rerolling, focus only if it can't be changed
+    rerolled_blanks = np.minimum(blank, pool.rerolls)
+    stuck_focus = np.maximum(focus - pool.conversions, 0)
+    rerolled_focus = np.minimum(stuck_focus, pool.rerolls - rerolled_blanks)
+    rerolled = rerolled_blanks + rerolled_focus
+    if rerolled.any():
+        new_good, new_crit, new_focus, _ = rng.multinomial(rerolled, pool.faces).T
+        good = good + new_good
+        crit = crit + new_crit
+        focus = focus - rerolled_focus + new_focus
+    good = good + np.minimum(focus, pool.conversions)
+    good = good + np.minimum(pool.evades, pool.dice - good - crit)
+    return good, crit
+
+
+def resolve(hits, crits, evades, reinforce=0):
+    """
+    Array version of probability.resolve
+    """
+    total = hits + crits
+    cancelled = np.minimum(evades, total)
+    remaining = total - cancelled
+    cancelled = cancelled + np.where(remaining >= 2, np.minimum(reinforce, remaining - 1), 0)
+    hits_cancelled = np.minimum(cancelled, hits)
+    return hits - hits_cancelled, crits - (cancelled - hits_cancelled)
+
+
+def simulate(attack, defense=None, reinforce=0, precision=0.01, batch_size=100_000, max_samples=2_000_000, rng=None):
+    """
+    Estimates the hits that get through defense (a Pool, or None for an
+    unopposed attack).  Stops once the 95% confidence interval on the expected
+    hits is within +/- precision, or after max_samples rolls.
+    """
+    rng = rng or np.random.default_rng()
+    samples = 0
+    total = 0.0
+    total_squares = 0.0
+    crit_count = 0
+    confidence = math.inf
+    while samples < max_samples:
+        hits, crits = roll_pool(rng, attack, batch_size)
+        if defense is not None:
+            evades, _ = roll_pool(rng, defense, batch_size)
+            hits, crits = resolve(hits, crits, evades, reinforce)
+        damage = hits + crits
+        samples += batch_size
+        total += damage.sum()
+        total_squares += np.square(damage, dtype=np.float64).sum()
+        crit_count += np.count_nonzero(crits)
+        mean = total / samples
+        variance = max(total_squares / samples - mean ** 2, 0.0)
+        confidence = 1.96 * math.sqrt(variance / samples)
+        if confidence <= precision:
+            break
+    logger.debug(f'Simulated {samples} rolls: {mean:.4f} +/- {confidence:.4f}')
+    return SimulationResult(mean, confidence, crit_count / samples, samples)
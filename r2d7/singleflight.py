@@ -0,0 +1,72 @@
+import asyncio
+import contextvars
+import logging
+
+from r2d7.metrics import metrics
+from r2d7.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight(object):
+    """
+    De-duplicates identical concurrent calls to a blocking function.
+
+    The first caller for a key runs the function in the default executor;
+    anyone asking for the same key while it is still running awaits the same
+    future instead of repeating the work.  Nothing is cached once the call
+    completes, so results are never stale.
+
+    Results are shared between callers, so treat them as read-only.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._in_flight = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, func, *args):
+        self.calls += 1
+        future = self._in_flight.get(key)
+        with span(self.name, coalesced=future is not None):
+            if future is None:
+                loop = asyncio.get_running_loop()
+                # Executors don't carry context over, so pass it on for the call's trace spans
+                future = loop.run_in_executor(None, contextvars.copy_context().run, func, *args)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda f: self._forget(key, f))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+                logger.debug(f'{self.name}: coalesced request for {key!r} ({self.coalesced} total)')
+            # Shield so one caller being cancelled doesn't cancel everyone else's result
+            return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight),
+        }
+
+
+flights = {}
+
+
+def single_flight(name):
+    """
+    Returns the shared SingleFlight for name, creating it if needed
+    """
+    if name not in flights:
+        flights[name] = SingleFlight(name)
+    return flights[name]
+
+
+metrics.collect_stats('r2d7_single_flight', 'Concurrent calls shared by single_flight',
+                      lambda: {name: flight.stats() for name, flight in flights.items()}, label='name')
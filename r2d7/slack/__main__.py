@@ -6,12 +6,16 @@ MIT Licensed
 """
 import logging
 import os
+import threading
+import time
 
 import redis
 import flask
 from slackclient import SlackClient
 
+from r2d7.bots.supervisor import HEARTBEAT_INTERVAL, heartbeat
 from r2d7.slack.bot import SlackBot
+from r2d7 import metrics
 
 from r2d7.listformatter import ListFormatter
 from r2d7.cardlookup import CardLookup
@@ -35,6 +39,21 @@ class Droid(
     pass
 
 
+def keep_alive(bots):
+    """
+    Beats for the whole process, but only while every team's bot is
+    looping, so one healthy team doesn't hide a hung one.  With no bots
+    running, eg. only handling installs, the process still beats.
+    """
+    while True:
+        stalled = [bot.name for bot in list(bots) if not bot.responsive()]
+        if stalled:
+            logger.warning(f"Not sending heartbeat, stalled bots: {stalled}")
+        else:
+            heartbeat()
+        time.sleep(HEARTBEAT_INTERVAL)
+
+
 def main():
     debug = os.getenv('DEBUG', False)
     log_level = 'DEBUG' if debug else 'INFO'
@@ -48,10 +67,16 @@ def main():
     logging.info("token: {}".format(slack_token))
 
     droid = Droid()
+    # One updater for every team's bot, off the RTM reader threads
+    threading.Thread(target=droid.keep_updated, name='data-updater', daemon=True).start()
+    metrics.serve('SLACK_METRICS_PORT')
+    bots = []
+    threading.Thread(target=keep_alive, args=(bots,), name='heartbeat', daemon=True).start()
     if slack_token:
         # Run a single instance of the bot in dev mode
         logging.info("SLACK_TOKEN env var set, running in dev mode")
         bot = SlackBot(droid, "test", slack_token, debug)
+        bots.append(bot)
         bot.start()
 
     elif redis_url:
@@ -64,7 +89,9 @@ def main():
                 logger.warning(f"Duplicate team found in redis: {teamname}")
                 continue
             seen_keys.add(key)
-            SlackBot(droid, name=teamname, token=key, debug=debug).start()
+            bot = SlackBot(droid, name=teamname, token=key, debug=debug)
+            bots.append(bot)
+            bot.start()
     else:
         logging.error("No source of slack tokens found, exiting.")
         return()
@@ -107,12 +134,14 @@ def main():
         logger.debug(auth_response)
         store.set(team_name, bot_token)
 
-        SlackBot(
+        bot = SlackBot(
             droid,
             name=team_name,
             token=bot_token,
             debug=debug
-        ).start()
+        )
+        bots.append(bot)
+        bot.start()
 
         return "R2-D7 has been added! Follow the instructions <a href=\"https://github.com/FreakyDug/r2-d7\">here</a> to add the icons."
 
@@ -12,28 +12,42 @@ from websocket._exceptions import WebSocketConnectionClosedException
 
 from r2d7.core import UserError
 from r2d7.slack.clients import SlackClients
+from r2d7.slack.dispatcher import ChannelDispatcher
 from r2d7.slack.event_handler import RtmEventHandler
+from r2d7.slack.outbound import OutboundQueue
 
 logger = logging.getLogger(__name__)
 
 
 class Messager():
-    def __init__(self, clients):
+    def __init__(self, clients, name='outbound'):
         self.clients = clients
+        # Posting happens on the queue's own thread, batched and rate limited
+        self.outbound = OutboundQueue(self._post, name=name)
 
     def send_message(self, channel_id, msg, thread=None):
         # in the case of Group and Private channels, RTM channel payload is a complex dictionary
         if isinstance(channel_id, dict):
             channel_id = channel_id['id']
-        logger.debug('Sending msg: %s to channel: %s' % (msg, channel_id))
+        logger.debug('Queueing msg: %s to channel: %s' % (msg, channel_id))
+        self.outbound.send(channel_id, msg, thread)
+
+    def _post(self, channel_id, msg, thread):
         self.clients.web.chat.post_message(
             channel_id, msg, as_user=True, unfurl_links=False, thread_ts=thread)
 
+    def stop(self, timeout=None):
+        self.outbound.stop(timeout)
+
     def write_error(self, channel_id, err_msg):
         self.send_message(channel_id, ':alarm: ' + err_msg)
 
 
 class SlackBot(threading.Thread):
+    WORKERS = 8
+    MAX_PENDING = 256  # events queued before the RTM reader waits
+    STALL_AFTER = 60  # seconds without a loop before the bot counts as hung
+
     def __init__(self, droid, name=None, token=None, debug=False):
         """Creates Slacker Web and RTM clients with API Bot User token.
 
@@ -42,6 +56,7 @@ class SlackBot(threading.Thread):
         """
         super().__init__()
         self.last_ping = 0
+        self.last_tick = time.monotonic()
         self.keep_running = True
         self.debug = debug
         self.name = name
@@ -64,41 +79,70 @@ class SlackBot(threading.Thread):
                     f"Failed to connect to {resource['resource']['SlackTeamName']}")
                 return
 
-            messager = Messager(self.clients)
+            messager = Messager(self.clients, name=f'slack-{self.name}-outbound')
             event_handler = RtmEventHandler(
                 self.clients,
                 self.droid,
                 messager,
                 debug=self.debug
             )
+            # Events are handled by a worker pool so one slow list lookup
+            # doesn't hold up every other channel; replies within a channel
+            # stay in order
+            dispatcher = ChannelDispatcher(
+                lambda event: self._handle_event(event_handler, messager, event),
+                workers=self.WORKERS,
+                max_pending=self.MAX_PENDING,
+                name=f'slack-{self.name}',
+            )
 
             while self.keep_running:
                 try:
                     for event in self.clients.rtm.rtm_read():
-                        try:
-                            event_handler.handle(event)
-                        except UserError as error:
-                            logging.debug(
-                                'User error generated', exc_info=True)
-                            err_msg = f"Error: {error}"
-                            messager.send_message(event['channel'], err_msg)
-                            continue
-                        except Exception:
-                            logging.exception('Unexpected error:')
-                            if self.debug:
-                                err_msg = "I crashed, look at the log!"
-                                messager.write_error(event['channel'], err_msg)
-                            continue
+                        dispatcher.submit(self._channel_id(event), event)
                 except WebSocketConnectionClosedException:
                     self.clients.rtm.rtm_connect()
                     continue
 
                 self._auto_ping()
+                self.last_tick = time.monotonic()
                 time.sleep(.1)
 
+            dispatcher.stop()
+            messager.stop(timeout=10)
+
         else:
             logger.error('Failed to connect to RTM client with token: {}'.format(self.clients.token))
 
+    def responsive(self, now=None):
+        """
+        False if the bot is running but its loop has stalled
+        """
+        now = time.monotonic() if now is None else now
+        return not self.is_alive() or now - self.last_tick < self.STALL_AFTER
+
+    @staticmethod
+    def _channel_id(event):
+        channel = event.get('channel')
+        # in the case of Group and Private channels, RTM channel payload is a complex dictionary
+        if isinstance(channel, dict):
+            channel = channel['id']
+        return channel
+
+    def _handle_event(self, event_handler, messager, event):
+        try:
+            event_handler.handle(event)
+        except UserError as error:
+            logging.debug(
+                'User error generated', exc_info=True)
+            err_msg = f"Error: {error}"
+            messager.send_message(event['channel'], err_msg)
+        except Exception:
+            logging.exception('Unexpected error:')
+            if self.debug:
+                err_msg = "I crashed, look at the log!"
+                messager.write_error(event['channel'], err_msg)
+
     def _auto_ping(self):
         # hard code the interval to 3 seconds
         now = int(time.time())
@@ -0,0 +1,117 @@
+from collections import deque
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class ChannelDispatcher(object):
+    """
+    Hands RTM events to a pool of worker threads.
+
+    Events for the same channel are handled one at a time and in the order
+    they arrived, so replies in a channel stay in order, while other channels
+    carry on in parallel.  A channel with a backlog gives its worker up after
+    each event so it can't starve the others.
+
+    At most max_pending events are queued or running.  Beyond that submit()
+    blocks the reader for up to timeout seconds, then drops the event.
+    """
+    def __init__(self, handle, workers=8, max_pending=256, name='dispatcher'):
+        self.handle = handle
+        self.max_pending = max_pending
+        self.name = name
+        self._channels = {}  # channel: events waiting, for channels queued or being worked on
+        self._ready = queue.Queue()  # channels with an event and no worker
+        self._condition = threading.Condition()
+        self._pending = 0
+        self._active = 0
+        self._paused = False
+        self.processed = 0
+        self.dropped = 0
+        self._workers = [
+            threading.Thread(target=self._work, name=f'{name}-worker-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, channel, event, timeout=5):
+        """
+        Queues an event. Returns False if it was dropped because the queue stayed full.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._pending < self.max_pending, timeout):
+                self.dropped += 1
+                logger.warning(f'{self.name}: {self._pending} events pending, dropping event for {channel}')
+                return False
+            self._pending += 1
+            waiting = self._channels.get(channel)
+            if waiting is None:
+                self._channels[channel] = deque([event])
+                self._ready.put(channel)
+            else:
+                waiting.append(event)
+        return True
+
+    def _work(self):
+        while True:
+            channel = self._ready.get()
+            if channel is _STOP:
+                return
+            with self._condition:
+                self._condition.wait_for(lambda: not self._paused)
+                event = self._channels[channel].popleft()
+                self._active += 1
+            try:
+                self.handle(event)
+            except Exception:
+                logger.exception(f'{self.name}: unhandled error')
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._pending -= 1
+                    self.processed += 1
+                    if self._channels[channel]:
+                        self._ready.put(channel)
+                    else:
+                        del self._channels[channel]
+                    self._condition.notify_all()
+
+    def exclusive(self, func, *args):
+        """
+        Runs func once no event is being handled, holding back new ones until it's done
+        """
+        with self._condition:
+            self._paused = True
+            self._condition.wait_for(lambda: self._active == 0)
+        try:
+            return func(*args)
+        finally:
+            with self._condition:
+                self._paused = False
+                self._condition.notify_all()
+
+    def join(self, timeout=None):
+        """
+        Waits until every queued event has been handled
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending == 0, timeout)
+
+    def stop(self):
+        for _ in self._workers:
+            self._ready.put(_STOP)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'pending': self._pending,
+                'active': self._active,
+                'channels': len(self._channels),
+                'processed': self.processed,
+                'dropped': self.dropped,
+            }
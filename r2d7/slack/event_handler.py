@@ -7,6 +7,8 @@ import json
 import logging
 import re
 
+from r2d7.tracing import annotate, trace
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,7 +22,8 @@ class RtmEventHandler(object):
     def handle(self, event):
 
         if 'type' in event:
-            self._handle_by_type(event['type'], event)
+            with trace('slack_event', type=event['type']):
+                self._handle_by_type(event['type'], event)
 
     def _handle_by_type(self, event_type, event):
         # See https://api.slack.com/rtm for a full list of events
@@ -39,12 +42,10 @@ class RtmEventHandler(object):
             msg_txt = event['text']
             logger.debug(event)
 
-            # Check for new data
-            if self.droid.needs_update():
-                self.droid.load_data()
+            # New data is swapped in by DroidCore.keep_updated, see slack/__main__
 
             # Direct responses
-            responses = []
+            direct = False
             if self.clients.is_bot_mention(msg_txt) or self._is_direct_message(event['channel']):
                 droid_id = self.clients.rtm.server.login_data['self']['id']
                 msg_txt = re.sub(f"<@{droid_id}>", '', msg_txt)
@@ -54,22 +55,11 @@ class RtmEventHandler(object):
                     self.messager.send_message(
                         event['channel'], self.droid.helpMessage())
                 else:
-                    for regex, handle_method in self.droid._dm_handlers.items():
-                        match = regex.search(msg_txt)
-                        if match:
-                            responses = handle_method(match[1])
-                            if responses:
-                                break
-
-            # Don't handle if the dm_handlers have already got it
-            if not responses:
-                # Watches
-                for regex, handle_method in self.droid._handlers.items():
-                    match = regex.search(msg_txt)
-                    if match:
-                        responses = handle_method(match[1])
-                        if responses:
-                            break
+                    direct = True
+
+            # DM handlers first, then watches
+            responses = self.droid.dispatch(msg_txt, direct=direct)
+            annotate(direct=direct, chars=len(msg_txt), responses=len(responses) if responses else 0)
 
             thread_ts = event.get('thread_ts', None)
 
@@ -0,0 +1,170 @@
+from collections import OrderedDict, deque
+import contextvars
+import logging
+import threading
+import time
+
+import requests
+
+from r2d7.metrics import timed
+from r2d7.tracing import annotate
+
+logger = logging.getLogger(__name__)
+
+
+class OutboundQueue(object):
+    """
+    Sends messages to Slack from a thread of its own, so the RTM reader and
+    event workers never wait on the Web API.
+
+    Messages waiting for the same channel and thread are joined into one
+    post, up to max_chars.  Each channel gets at most one post every
+    min_interval seconds, which is Slack's limit for chat.postMessage.  A 429
+    holds the channel back for the Retry-After the server asked for and the
+    post is tried again, up to max_retries times.
+
+    Each message keeps the context it was sent from, and a post runs in
+    the context of the first message in it, so the send is part of the
+    interaction's trace.
+    """
+    def __init__(self, post, min_interval=1.0, max_chars=4000, max_retries=3, name='outbound'):
+        self.post = post
+        self.min_interval = min_interval
+        self.max_chars = max_chars
+        self.max_retries = max_retries
+        self.name = name
+        self._queues = OrderedDict()  # (channel, thread): deque of [text, attempts, context]
+        self._next_post = {}  # channel: earliest time of its next post
+        self._condition = threading.Condition()
+        self._sending = 0
+        self._stopping = False
+        self.sent = 0
+        self.batched = 0
+        self.retries = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def send(self, channel, text, thread=None):
+        with self._condition:
+            self._queues.setdefault((channel, thread), deque()).append([text, 0, contextvars.copy_context()])
+            self._condition.notify_all()
+
+    def _next_key(self, now):
+        """
+        The waiting queue whose channel may post soonest, and when
+        """
+        best = None
+        for key in self._queues:
+            ready = self._next_post.get(key[0], 0)
+            if best is None or ready < best[1]:
+                best = (key, ready)
+                if ready <= now:
+                    break
+        return best
+
+    def _take_batch(self, key):
+        waiting = self._queues[key]
+        texts = []
+        attempts = 0
+        length = 0
+        context = waiting[0][2]
+        while waiting:
+            text, tries, _ = waiting[0]
+            if texts and length + len(text) + 1 > self.max_chars:
+                break
+            waiting.popleft()
+            texts.append(text)
+            attempts = max(attempts, tries)
+            length += len(text) + 1
+        if waiting:
+            # Let other channels and threads go first
+            self._queues.move_to_end(key)
+        else:
+            del self._queues[key]
+        return '\n'.join(texts), len(texts), attempts, context
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._queues:
+                        now = time.monotonic()
+                        key, ready = self._next_key(now)
+                        if ready <= now:
+                            break
+                        self._condition.wait(ready - now)
+                    elif self._stopping:
+                        return
+                    else:
+                        self._condition.wait()
+                text, count, attempts, context = self._take_batch(key)
+                self._next_post[key[0]] = now + self.min_interval
+                self._sending += 1
+            try:
+                context.run(self._post, key, text, count, attempts, context)
+            finally:
+                with self._condition:
+                    self._sending -= 1
+                    self._condition.notify_all()
+
+    def _post(self, key, text, count, attempts, context):
+        channel, thread = key
+        try:
+            with timed('send'):
+                annotate(messages=count, attempt=attempts)
+                self.post(channel, text, thread)
+        except requests.exceptions.HTTPError as err:
+            response = err.response
+            if response is None or response.status_code != 429:
+                logger.exception(f'{self.name}: failed to post to {channel}')
+                self._drop(count)
+                return
+            if attempts >= self.max_retries:
+                logger.warning(f'{self.name}: still rate limited in {channel}, dropping message')
+                self._drop(count)
+                return
+            retry_after = float(response.headers.get('Retry-After', self.min_interval))
+            logger.info(f'{self.name}: rate limited in {channel}, retrying in {retry_after}s')
+            with self._condition:
+                self.retries += 1
+                self._next_post[channel] = time.monotonic() + retry_after
+                self._queues.setdefault(key, deque()).appendleft([text, attempts + 1, context])
+                self._queues.move_to_end(key, last=False)
+        except Exception:
+            logger.exception(f'{self.name}: failed to post to {channel}')
+            self._drop(count)
+        else:
+            with self._condition:
+                self.sent += 1
+                self.batched += count - 1
+
+    def _drop(self, count):
+        with self._condition:
+            self.dropped += count
+
+    def join(self, timeout=None):
+        """
+        Waits until everything queued has been posted or dropped
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queues and not self._sending, timeout)
+
+    def stop(self, timeout=None):
+        """
+        Posts whatever is still queued, then stops the sending thread
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'pending': sum(len(waiting) for waiting in self._queues.values()),
+                'sent': self.sent,
+                'batched': self.batched,
+                'retries': self.retries,
+                'dropped': self.dropped,
+            }
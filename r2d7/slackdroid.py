@@ -25,27 +25,7 @@ class SlackDroid(DroidCore):
             if 'shipAbility' in card:
                 self._ref_names.add(card['shipAbility']['name'])
 
-        # Convert text now to save time later
-        for category, names in self.data.items():
-            for card in names.values():
-                if 'sides' in card:
-                    for side in card['sides']:
-                        if 'ability' in side:
-                            side['ability'] = self.convert_text(
-                                side['ability'])
-                        if 'shipAbility' in side:
-                            side['shipAbility']['text'] = self.convert_text(
-                                side['shipAbility']['text'])
-                        if 'device' in side:
-                                side['device']['effect'] = self.convert_text(
-                                    side['device'].get('effect', ''))
-                if 'ability' in card:
-                    card['ability'] = self.convert_text(card['ability'])
-                if 'shipAbility' in card:
-                    card['shipAbility']['text'] = self.convert_text(
-                        card['shipAbility']['text'])
-                if category == 'damage':
-                    card['text'] = self.convert_text(card['text'])
+        # Card text is converted when it's first printed, see card_text
 
 
     def helpMessage(self):
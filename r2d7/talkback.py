@@ -22,11 +22,11 @@ class Talkback(DroidCore):
 
     def __init__(self):
         super().__init__()
-        self.register_handler(Talkback.pattern_fix, self.fixHandler)
-        self.register_handler(Talkback.pattern_data, self.dataHandler)
-        self.register_handler(Talkback.pattern_help, self.helpHandler)
-        self.register_handler(Talkback.pattern_stitchCrew, self.stitchCrewHandler)
-        self.register_handler(Talkback.pattern_egg, self.eggHandler)
+        self.register_handler(Talkback.pattern_fix, self.fixHandler, triggers=['!'])
+        self.register_handler(Talkback.pattern_data, self.dataHandler, triggers=['!'])
+        self.register_handler(Talkback.pattern_help, self.helpHandler, triggers=['!'])
+        self.register_handler(Talkback.pattern_stitchCrew, self.stitchCrewHandler, triggers=['!'])
+        self.register_handler(Talkback.pattern_egg, self.eggHandler, triggers=['!'])
 
     def fixHandler(self, message):
         dataErrorText = 'For issues with card data, raise an issue or pull request at '
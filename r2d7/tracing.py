@@ -0,0 +1,174 @@
+from contextvars import ContextVar
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('r2d7_span', default=None)
+
+
+class NoopSpan(object):
+    """
+    Stands in for a span when the interaction isn't sampled, so callers
+    never have to check
+    """
+    sampled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP = NoopSpan()
+
+
+class _Unsampled(NoopSpan):
+    """
+    Marks an interaction that lost the sampling draw, so the spans and
+    nested traces inside it don't draw again
+    """
+    def __enter__(self):
+        self._token = _current.set(NOOP)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+        return False
+
+
+class Span(NoopSpan):
+    sampled = True
+
+    def __init__(self, name, trace, parent, attrs):
+        self.name = name
+        self.trace = trace
+        self.parent = parent
+        self.span_id = next(trace.ids)
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._perf_start
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.trace.tracer.finish(self)
+        return False
+
+    def record(self):
+        return {
+            'trace': self.trace.trace_id,
+            'span': self.span_id,
+            'parent': self.parent.span_id if self.parent else None,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round(self.duration * 1000, 3),
+            'attrs': self.attrs,
+        }
+
+
+class Trace(object):
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.ids = itertools.count(1)
+        self.spans = []
+        self.written = False
+
+
+class Tracer(object):
+    """
+    Writes a sample of interactions to a JSONL file, one line per span.
+
+    A span knows its trace and parent, so each interaction can be rebuilt as
+    a tree offline.  The active span is kept in a context variable, which
+    asyncio tasks inherit, so cogs don't pass spans around; threads that
+    work for an interaction, eg. the Slack outbound queue, run in a copy of
+    its context.  A trace is written when its root span ends, and a span
+    that ends after that, such as a queued reply, is written on its own.
+    Nothing is written without a path, and an interaction that isn't
+    sampled costs a random() and a context variable lookup per span.
+    """
+    def __init__(self, path=None, sample_rate=0.01):
+        self.path = path
+        self.sample_rate = sample_rate if path else 0
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def trace(self, name, **attrs):
+        """
+        The root span of an interaction, or a child span if one is already
+        being traced
+        """
+        parent = _current.get()
+        if parent is not None:
+            return span(name, **attrs)
+        if not self.sample_rate:
+            return NOOP
+        if random.random() >= self.sample_rate:
+            return _Unsampled()
+        return Span(name, Trace(self), None, attrs)
+
+    def finish(self, span):
+        trace = span.trace
+        with self._lock:
+            trace.spans.append(span)
+            if span.parent is None:
+                spans = trace.spans
+                trace.written = True
+                self.written += 1
+            elif trace.written:
+                spans = [span]
+            else:
+                return
+            self._write(spans)
+
+    def _write(self, spans):
+        lines = ''.join(json.dumps(s.record(), default=str) + '\n' for s in spans)
+        try:
+            with open(self.path, 'a') as trace_file:
+                trace_file.write(lines)
+        except OSError as err:
+            logger.warning(f'Unable to write trace to {self.path}: {err}')
+
+
+def span(name, **attrs):
+    """
+    A child of the current span, or a no-op outside a sampled interaction
+    """
+    parent = _current.get()
+    if parent is None or not parent.sampled:
+        return NOOP
+    return Span(name, parent.trace, parent, attrs)
+
+
+def annotate(**attrs):
+    """
+    Adds attributes, eg. sizes or cache hits, to the current span
+    """
+    parent = _current.get()
+    if parent is not None:
+        parent.set(**attrs)
+
+
+tracer = Tracer(os.getenv('TRACE_FILE'), float(os.getenv('TRACE_SAMPLE', '0.01')))
+trace = tracer.trace
@@ -8,5 +8,34 @@ def test_form_reroll():
         assert attack.pilot == getattr(AttackPilot, 'reroll_%d' % num_rerolls)
         assert defense.pilot == getattr(DefensePilot, 'reroll_%d' % num_rerolls)
 
-# no other calculator tests as they require an internet connection, and the calculator class itself is pretty simple
+# no tests of the live calculator as they require an internet connection, and the calculator class itself is pretty simple
 
+
+result = {'expected_total_hits': 1.5, 'at_least_one_crit': 0.33, 'form_state_string': 'abc', 'extra': 1}
+
+def test_cache_lru(tmp_path):
+    cache = CalculatorCache(max_size=2)
+    cache.put('a', result)
+    cache.put('b', result)
+    cache.get('a')
+    cache.put('c', result)
+    assert cache.get('b') is None
+    assert cache.get('a') == {'expected_total_hits': 1.5, 'at_least_one_crit': 0.33, 'form_state_string': 'abc'}
+    assert cache.stats() == {'size': 2, 'hits': 2, 'misses': 1}
+
+def test_cache_persists(tmp_path):
+    path = str(tmp_path / 'cache' / 'calculator.json')
+    cache = CalculatorCache(path)
+    cache.put('a', result)
+    cache.save()
+    assert CalculatorCache(path).get('a')['form_state_string'] == 'abc'
+
+def test_calculator_from_cache():
+    cache = CalculatorCache()
+    calculator = Calculator(AttackForm(dice=3, focus=1), DefenseForm(), cache)
+    assert not calculator.from_cache()
+    cache.put(Calculator(AttackForm(dice=3, focus=1), DefenseForm()).key(), result)
+    calculator.calculate()  # served from the cache, so no connection needed
+    assert calculator.expected_hits() == 1.5
+    assert calculator.crit_chance() == 0.33
+    assert calculator.url == Calculator._human_url + '?abc'
@@ -0,0 +1,81 @@
+import re
+import pytest
+from r2d7.cardindex import ConditionIndex, CostIndex, NameIndex
+from r2d7.core import DroidCore, UserError
+
+names = [
+    'Hot Shot Blaster', 'Hotshot Co-pilot', 'TIE/ln Fighter', 'TIE Advanced x1', 'TIE/sf Fighter',
+    'Wedge Antilles', 'R2-D2', 'R2 Astromech', 'Heavy Laser Cannon', 'Homing Missiles',
+    'Fire-Control System', 'Focus', "Han Solo", "Han Solo's Gambit", 'Countess Ryad', 'Vader',
+    'Darth Vader', 'L3-37', "L3-37's Programming", 'Proton Torpedoes', 'Élite Pilot',
+]
+
+def make_lookup_data():
+    lookup_data = {}
+    for name in names:
+        lookup_data.setdefault(DroidCore.partial_canonicalize(name), []).append({'name': name})
+    return lookup_data
+
+def pattern(query):
+    ex_lookup = re.escape(query)
+    ex_lookup = re.sub(r' ', ' ?', ex_lookup)
+    ex_lookup = re.sub(r'tie', 'tie.*', ex_lookup)
+    return re.compile(f'\\b{ex_lookup}(?:[\'e]?s)?\\b', re.IGNORECASE)
+
+name_queries = ('hot shot', 'hotshot', 'tie fighter', 'tie', 'r2', 'r2-d2', 'vader', 'han solo',
+                'missile', 'torpedo', 'fire-control', 'l3-37', 'élite', 'wedge', 'ties', 'x1', '-d2', 'nothing')
+@pytest.mark.parametrize('query', name_queries)
+def test_name_matches_same_as_scan(query):
+    lookup_data = make_lookup_data()
+    exact = pattern(query)
+    expected = [key for key, cards in lookup_data.items() if any(exact.search(card['name']) for card in cards)]
+    assert NameIndex(lookup_data).name_matches(query, exact) == expected
+
+@pytest.mark.parametrize('fragment', ('hot', 'fighter', 'd2', 'solo', 'r2', 'x', 'zzz'))
+def test_key_matches_same_as_scan(fragment):
+    lookup_data = make_lookup_data()
+    expected = [key for key in lookup_data if fragment in key]
+    assert NameIndex(lookup_data).key_matches(fragment) == expected
+
+def test_literal_prefix():
+    assert NameIndex.literal_prefix('hot shot') == 'hot'
+    assert NameIndex.literal_prefix('tie/ln fighter') == 'tie'
+    assert NameIndex.literal_prefix('countie') == 'countie'
+
+def make_cost_index():
+    lookup_data = {
+        'a': [{'name': 'A', 'category': 'Crew', 'cost': {'value': 3}}],
+        'b': [{'name': 'B', 'category': 'Crew', 'cost': {'value': 1}},
+              {'name': 'B', 'category': 'Talent', 'cost': {'value': 1}}],
+        'c': [{'name': 'C', 'category': 'Crew'}],
+        'd': [{'name': 'D', 'category': 'Crew', 'cost': {'value': 5}}],
+    }
+    return CostIndex(lookup_data, lambda card: card['category'])
+
+cost_tests = (
+    ('=', 3, ['A']),
+    ('==', 1, ['B']),
+    ('<', 3, ['B', 'C']),
+    ('<=', 3, ['A', 'B', 'C']),
+    ('>', 1, ['A', 'D']),
+    ('>=', 5, ['D']),
+)
+@pytest.mark.parametrize('operator, value, expected', cost_tests)
+def test_cost_matches(operator, value, expected):
+    assert [card['name'] for card in make_cost_index().matches('Crew', operator, value)] == expected
+
+def test_cost_unknown_group():
+    assert make_cost_index().matches('Gunner', '<', 10) == []
+
+@pytest.mark.parametrize('operator', ('=<', '<>', '>>'))
+def test_cost_bad_operator(operator):
+    with pytest.raises(UserError):
+        make_cost_index().matches('Crew', operator, 3)
+
+def test_condition_index():
+    conditions = [{'xws': 'hunted', 'name': 'Hunted'}, {'xws': 'listeningdevice', 'name': 'Listening Device'},
+                  {'xws': 'optimizedprototype', 'name': 'Optimized Prototype'}]
+    index = ConditionIndex(conditions, lambda condition: condition['xws'])
+    index.link(1, ['optimizedprototype', 'hunted', 'unknown'])
+    assert [c['name'] for c in index.for_card(1)] == ['Hunted', 'Optimized Prototype']
+    assert index.for_card(2) == []
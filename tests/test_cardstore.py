@@ -0,0 +1,50 @@
+import pytest
+
+from r2d7 import cardstore
+from r2d7.cardstore import CardStore, CardStoreError
+
+FILES = [
+    ('data/ships/rebel/x-wing.json', 'abc', {'xws': 'x-wing', 'pilots': [{'xws': 'lukeskywalker'}]}),
+    ('data/conditions/conditions.json', 'def', [{'xws': 'hunted', 'ability': 'Text'}]),
+]
+
+def test_round_trip(tmp_path):
+    cardstore.save_store('v1', FILES, directory=str(tmp_path))
+    store = cardstore.open_store('v1', directory=str(tmp_path))
+    assert store.version == 'v1' and len(store) == 2
+    assert list(store.files()) == FILES
+    # Each read is a copy
+    first = list(store.files())
+    first[0][2]['pilots'].append('edited')
+    assert list(store.files()) == FILES
+    store.close()
+
+def test_missing_version(tmp_path):
+    assert cardstore.open_store('v1', directory=str(tmp_path)) is None
+    assert cardstore.open_store(False, directory=str(tmp_path)) is None
+
+def test_old_versions_are_removed(tmp_path):
+    cardstore.save_store('v1', FILES, directory=str(tmp_path))
+    cardstore.save_store('v1', FILES, points_database='XWA', directory=str(tmp_path))
+    cardstore.save_store('v2', FILES[:1], directory=str(tmp_path))
+    assert cardstore.open_store('v1', directory=str(tmp_path)) is None
+    assert cardstore.open_store('v1', points_database='XWA', directory=str(tmp_path))
+    assert list(cardstore.open_store('v2', directory=str(tmp_path)).files()) == FILES[:1]
+
+def test_damaged_store(tmp_path):
+    path = tmp_path / 'AMG-v1.cards'
+    path.write_bytes(b'not a store')
+    with pytest.raises(CardStoreError):
+        CardStore(str(path))
+    assert cardstore.open_store('v1', directory=str(tmp_path)) is None
+
+
+@pytest.mark.parametrize('keep', [0, 8, 20, -1])
+def test_empty_or_truncated_store(tmp_path, keep):
+    path = tmp_path / 'AMG-v1.cards'
+    CardStore.write(str(path), 'v1', [('data/upgrades/talent.json', 'abc', [{'xws': 'a'}])])
+    contents = path.read_bytes()
+    path.write_bytes(contents[:keep] if keep >= 0 else contents[:-1])
+    with pytest.raises(CardStoreError):
+        CardStore(str(path))
+    assert cardstore.open_store('v1', directory=str(tmp_path)) is None
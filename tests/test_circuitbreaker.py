@@ -0,0 +1,42 @@
+from r2d7.circuitbreaker import CircuitBreaker
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_opens_after_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker('test', max_failures=2, cool_down=30, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.stats() == {'state': 'open', 'failures': 2, 'rejected': 1}
+
+def test_success_resets_count():
+    breaker = CircuitBreaker('test', max_failures=2, clock=FakeClock())
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+def test_single_trial_after_cool_down():
+    clock = FakeClock()
+    breaker = CircuitBreaker('test', max_failures=1, cool_down=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 31
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.now = 62
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow()
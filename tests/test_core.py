@@ -1,8 +1,10 @@
 import threading
+import time
 
 import pytest
 
 from r2d7.core import DroidCore
+from r2d7.metrics import metrics
 
 
 categories = [
@@ -58,3 +60,134 @@ def test_threaded(testbot):
     thread.join()
     assert signal.is_set()
 
+
+
+class CountingDroid(DroidCore):
+    def __init__(self):
+        super().__init__()
+        self.conversions = 0
+
+    def convert_text(self, text):
+        self.conversions += 1
+        return text.split('\n')
+
+
+def test_card_text_is_converted_once():
+    droid = CountingDroid()
+    assert droid.card_text('a\nb') == ['a', 'b']
+    assert droid.card_text('a\nb') == ['a', 'b']
+    assert droid.conversions == 1
+    assert droid.card_text(['already', 'converted']) == ['already', 'converted']
+    assert droid.conversions == 1
+
+
+def test_dispatch_prefilters_on_triggers():
+    droid = DroidCore()
+    seen = []
+    droid.register_handler(r'\[\[(.*)\]\]', lambda q: seen.append(q) or [[q]], triggers=['[['])
+    droid.register_handler(r'!(roll.*)', lambda q: [[q]], triggers=['!'])
+    droid.register_dm_handler(r'(.*)', lambda q: [['dm', q]] if q == 'x-wing' else None)
+
+    assert droid.dispatch('just chatting') is None
+    assert droid.dispatch('look at [[x-wing]]') == [['x-wing']]
+    assert droid.dispatch('x-wing', direct=True) == [['dm', 'x-wing']]
+    assert droid.dispatch('[[ywing]]', direct=True) == [['ywing']]
+
+    stats = droid.dispatch_stats()
+    assert stats['channel']['prefiltered'] == 1
+    assert [h['attempts'] for h in stats['channel']['handlers'].values()] == [2, 0]
+    assert seen == ['x-wing', 'ywing']
+
+
+class SlowLoadingDroid(DroidCore):
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+        self.cards = {}
+        self.register_handler(r'\[\[(.*)\]\]', self.count_cards, triggers=['[['])
+
+    def load_data(self):
+        # Built in place and slowly, so a handler running during the load
+        # would see a partial set
+        self.version += 1
+        self.cards = {}
+        for i in range(20):
+            self.cards[i] = self.version
+            time.sleep(0.001)
+
+    def count_cards(self, query):
+        return [[len(self.cards), set(self.cards.values())]]
+
+
+def test_reload_swaps_complete_data():
+    droid = SlowLoadingDroid()
+    droid.load_data()
+    seen = []
+    stop = threading.Event()
+
+    def lookups():
+        while not stop.is_set():
+            seen.append(droid.dispatch('[[x-wing]]'))
+
+    threads = [threading.Thread(target=lookups) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for _ in range(3):
+        droid.reload()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert droid.version == 4
+    assert seen
+    for (count, versions), in seen:
+        assert count == 20
+        assert len(versions) == 1
+
+
+
+def test_reload_does_not_wait_for_running_handlers():
+    droid = SlowLoadingDroid()
+    droid.load_data()
+    started = threading.Event()
+    release = threading.Event()
+    droid.register_handler(r'!(hang)', lambda q: started.set() or release.wait(5) and [[q]], triggers=['!'])
+    thread = threading.Thread(target=droid.dispatch, args=('!hang',))
+    thread.start()
+    started.wait(5)
+
+    start = time.monotonic()
+    droid.reload()
+    assert time.monotonic() - start < 1
+    assert droid.dispatch('[[x-wing]]') == [[20, {2}]]
+    release.set()
+    thread.join()
+
+def test_dispatch_counts_from_many_threads():
+    droid = DroidCore()
+    droid.register_handler(r'\[\[(.*)\]\]', lambda q: [[q]], triggers=['[['])
+
+    def lookups():
+        for _ in range(500):
+            droid.dispatch('[[x-wing]]')
+            droid.dispatch('just chatting')
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = droid.dispatch_stats()['channel']
+    assert stats['messages'] == 8000
+    assert stats['prefiltered'] == 4000
+    assert stats['handlers'][r'\[\[(.*)\]\]']['matched'] == 4000
+
+
+def test_handler_stats_reach_metrics():
+    droid = DroidCore()
+    droid.register_handler(r'!(roll.*)', lambda q: [[q]], triggers=['!'])
+    droid.dispatch('!roll 3 red')
+
+    assert droid.handler_stats()['channel:!(roll.*)']['matched'] == 1
+    assert 'r2d7_handler_matched{handler="channel:!(roll.*)"} 1' in metrics.render().splitlines()
@@ -0,0 +1,93 @@
+import json
+import pytest
+import requests
+from r2d7.datacache import DataFileCache, DataFileError
+
+class FakeResponse(object):
+    def __init__(self, status_code, content=b'', etag=None, url=''):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'ETag': etag} if etag else {}
+        self.url = url
+
+class FakeSession(object):
+    """
+    Serves files by URL, honouring If-None-Match like a real server
+    """
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        self.offline = False
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        if self.offline:
+            raise requests.exceptions.ConnectionError('offline')
+        if url not in self.files:
+            return FakeResponse(404, url=url)
+        content = self.files[url]
+        etag = f'"{hash(content)}"'
+        if (headers or {}).get('If-None-Match') == etag:
+            return FakeResponse(304, url=url)
+        return FakeResponse(200, content, etag, url)
+
+def make_cache(tmp_path, session=None):
+    return DataFileCache(str(tmp_path / 'data'), session=session or FakeSession())
+
+def test_unchanged_file_is_not_downloaded_again(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.session.files['http://x/a.json'] = json.dumps([{'xws': 'a'}]).encode()
+    sha, data = cache.get_json('http://x/a.json')
+    assert data == [{'xws': 'a'}]
+    assert cache.get_json('http://x/a.json') == (sha, data)
+    assert cache.stats()['downloads'] == 1 and cache.stats()['not_modified'] == 1
+    assert cache.stats()['decoded'] == 1
+
+def test_copies_are_independent(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.session.files['http://x/a.json'] = b'{"pilots": [1, 2]}'
+    _, first = cache.get_json('http://x/a.json')
+    first['pilots'] = {'rebel': first['pilots']}
+    assert cache.get_json('http://x/a.json')[1] == {'pilots': [1, 2]}
+
+def test_changed_file_is_decoded(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.session.files['http://x/a.json'] = b'[1]'
+    first, _ = cache.get_json('http://x/a.json')
+    cache.session.files['http://x/a.json'] = b'[2]'
+    second, data = cache.get_json('http://x/a.json')
+    assert first != second and data == [2]
+
+def test_same_content_shares_storage(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.session.files['http://x/a.json'] = b'[1]'
+    cache.session.files['http://x/b.json'] = b'[1]'
+    assert cache.fetch('http://x/a.json') == cache.fetch('http://x/b.json')
+    assert cache.stats()['decoded'] == 1
+
+def test_survives_restart_and_outage(tmp_path):
+    session = FakeSession()
+    session.files['http://x/a.json'] = b'{"a": 1}'
+    cache = make_cache(tmp_path, session)
+    sha = cache.fetch('http://x/a.json')
+    cache.save()
+
+    restarted = make_cache(tmp_path, session)
+    assert restarted.get_json('http://x/a.json') == (sha, {'a': 1})
+    assert session.requests[-1][1].get('If-None-Match')
+
+    session.offline = True
+    assert make_cache(tmp_path, session).get_json('http://x/a.json') == (sha, {'a': 1})
+
+def test_missing_file(tmp_path):
+    cache = make_cache(tmp_path)
+    with pytest.raises(DataFileError):
+        cache.fetch('http://x/missing.json')
+
+def test_forget(tmp_path):
+    cache = DataFileCache(None, session=FakeSession())
+    cache.session.files['http://x/a.json'] = b'[1]'
+    sha = cache.fetch('http://x/a.json')
+    cache.forget([])
+    with pytest.raises(KeyError):
+        cache.data(sha)
@@ -0,0 +1,55 @@
+from r2d7 import probability
+from r2d7.XWing.dice import DicePool, DieType
+from r2d7.XWing.roller import ModdedRoll
+
+
+def test_roll_counts():
+    pool = DicePool(DieType.attack, 100)
+    assert len(pool) == 100
+    assert set(pool.counts) == {'crit', 'hit', 'focus', 'blank'}
+
+def test_probabilities_match_engine():
+    assert DicePool(DieType.attack, 1).probabilities() == probability.ATTACK_FACES
+    assert DicePool(DieType.defense, 1).probabilities() == probability.DEFENSE_FACES
+
+def test_str():
+    pool = DicePool(DieType.attack, 5)
+    pool.set_faces(hit=2, blank=1, crit=1, focus=1)
+    assert str(pool) == '{atkcrit}{atkhit}{atkhit}{atkfocus}{atkblank}'
+    pool = DicePool(DieType.defense, 3)
+    pool.set_faces(blank=1, evade=2)
+    assert str(pool) == '{defevade}{defevade}{defblank}'
+
+def test_reroll_keeps_convertible_focus():
+    pool = DicePool(DieType.attack, 6)
+    pool.set_faces(hit=1, focus=3, blank=2)
+    assert pool.reroll(6, keep_focus=2) == 3
+    assert len(pool) == 6
+    assert pool['focus'] >= 2
+
+def test_reroll_blanks_first():
+    pool = DicePool(DieType.attack, 4)
+    pool.set_faces(focus=2, blank=2)
+    assert pool.reroll(2) == 2
+    assert pool['focus'] >= 2
+
+def test_focus_and_evade():
+    pool = DicePool(DieType.defense, 6)
+    pool.set_faces(evade=1, focus=3, blank=2)
+    assert pool.focus(2) == 2
+    assert pool.evade(2) == 2
+    assert pool.counts == {'evade': 5, 'focus': 1, 'blank': 0}
+    assert pool.evade(5) == 1
+    assert pool['evade'] == 6
+
+def test_attack_dice_ignore_evade():
+    pool = DicePool(DieType.attack, 2)
+    pool.set_faces(blank=2)
+    assert pool.evade(2) == 0
+    assert pool['blank'] == 2
+
+def test_modded_roll_focus():
+    roll = ModdedRoll('!roll 10 green with 2 calculate and 3 evade')
+    roll.dice.set_faces(focus=10)
+    roll.modify_dice()
+    assert roll.dice.counts == {'evade': 5, 'focus': 5, 'blank': 0}
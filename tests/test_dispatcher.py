@@ -0,0 +1,87 @@
+import threading
+import time
+
+from r2d7.slack.dispatcher import ChannelDispatcher
+
+
+def test_channel_order_is_kept():
+    handled = []
+    lock = threading.Lock()
+
+    def handle(event):
+        time.sleep(0.001 * (event['n'] % 3))
+        with lock:
+            handled.append((event['channel'], event['n']))
+
+    dispatcher = ChannelDispatcher(handle, workers=4)
+    for n in range(30):
+        for channel in ('C1', 'C2', 'C3'):
+            dispatcher.submit(channel, {'channel': channel, 'n': n})
+    assert dispatcher.join(5)
+    dispatcher.stop()
+    for channel in ('C1', 'C2', 'C3'):
+        assert [n for c, n in handled if c == channel] == list(range(30))
+    assert dispatcher.stats()['processed'] == 90
+
+def test_slow_channel_does_not_block_others():
+    release = threading.Event()
+    handled = []
+
+    def handle(event):
+        if event == 'slow':
+            release.wait(5)
+        handled.append(event)
+
+    dispatcher = ChannelDispatcher(handle, workers=2)
+    dispatcher.submit('C1', 'slow')
+    dispatcher.submit('C2', 'fast')
+    deadline = time.time() + 5
+    while 'fast' not in handled and time.time() < deadline:
+        time.sleep(0.01)
+    assert handled == ['fast']
+    release.set()
+    assert dispatcher.join(5)
+    dispatcher.stop()
+
+def test_back_pressure_drops_when_full():
+    release = threading.Event()
+    dispatcher = ChannelDispatcher(lambda event: release.wait(5), workers=1, max_pending=2)
+    assert dispatcher.submit('C1', 1)
+    assert dispatcher.submit('C1', 2)
+    assert not dispatcher.submit('C1', 3, timeout=0.05)
+    assert dispatcher.stats()['dropped'] == 1
+    release.set()
+    assert dispatcher.join(5)
+    dispatcher.stop()
+
+def test_errors_do_not_stop_workers():
+    handled = []
+
+    def handle(event):
+        if event == 'bad':
+            raise ValueError(event)
+        handled.append(event)
+
+    dispatcher = ChannelDispatcher(handle, workers=1)
+    dispatcher.submit('C1', 'bad')
+    dispatcher.submit('C1', 'good')
+    assert dispatcher.join(5)
+    dispatcher.stop()
+    assert handled == ['good']
+
+def test_exclusive_waits_for_workers():
+    release = threading.Event()
+    running = []
+
+    def handle(event):
+        running.append(event)
+        release.wait(5)
+        running.remove(event)
+
+    dispatcher = ChannelDispatcher(handle, workers=2)
+    dispatcher.submit('C1', 'a')
+    time.sleep(0.05)
+    threading.Timer(0.1, release.set).start()
+    assert dispatcher.exclusive(lambda: list(running)) == []
+    assert dispatcher.join(5)
+    dispatcher.stop()
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+import time
+import pytest
+from r2d7 import probability
+from r2d7.rollparser import parse_roll
+from r2d7.XWing import firepower
+
+def make_pilot(name, attack, agility, actions, force=None):
+    ship = SimpleNamespace(
+        stats=[{'type': 'attack', 'arc': 'Front Arc', 'value': attack},
+               {'type': 'agility', 'value': agility},
+               {'type': 'hull', 'value': 3}],
+        actions=[{'difficulty': 'White', 'type': action} for action in actions])
+    return SimpleNamespace(name=name, ship=ship, shipActions=None, force=force)
+
+def test_pilot_profile():
+    profile = firepower.pilot_profile(make_pilot('Luke', 3, 2, ['Lock', 'Focus'], force={'value': 2}))
+    assert profile == firepower.Profile('Luke', attack=3, agility=2, focus=True, force=2)
+    profile = firepower.pilot_profile(make_pilot('Droid', 2, 2, ['Calculate', 'Lock']))
+    assert profile.calculate == 1 and not profile.lock
+
+def test_roll_profile():
+    profile = firepower.roll_profile(parse_roll('3 green with focus and 1 reinforce'))
+    assert (profile.agility, profile.focus, profile.reinforce) == (3, True, 1)
+
+def test_matrix_matches_probability():
+    attackers = [firepower.Profile('a', attack=3, focus=True), firepower.Profile('b', attack=2, lock=True)]
+    defenders = [firepower.Profile('x', agility=2, evade=1), firepower.Profile('y', agility=3, reinforce=1)]
+    matrix = firepower.firepower_matrix(attackers, defenders)
+    assert matrix.shape == (2, 2)
+    for i, attacker in enumerate(attackers):
+        for j, defender in enumerate(defenders):
+            expected = probability.resolve(attacker.attack_distribution(), defender.defense_distribution(),
+                                           defender.reinforce).expected_hits()
+            assert matrix[i, j] == pytest.approx(expected)
+
+def test_duplicate_profiles_share_rows():
+    attackers = [firepower.Profile('a', attack=3), firepower.Profile('b', attack=3)]
+    defenders = [firepower.Profile('x', agility=1)]
+    matrix = firepower.firepower_matrix(attackers, defenders)
+    assert matrix[0, 0] == pytest.approx(matrix[1, 0])
+
+def test_squad_profiles_skips_unknown_pilots():
+    db = SimpleNamespace(pilots_xws_index={'luke': make_pilot('Luke', 3, 2, ['Focus'])})
+    profiles = firepower.squad_profiles(db, {'pilots': [{'id': 'luke'}, {'id': 'nobody'}]})
+    assert [p.name for p in profiles] == ['Luke']
+
+def test_eight_ship_matchup_is_quick():
+    attackers = [firepower.Profile(str(i), attack=2 + i % 3, focus=i % 2 == 0, lock=i % 3 == 0) for i in range(8)]
+    defenders = [firepower.Profile(str(i), agility=1 + i % 3, evade=i % 2) for i in range(8)]
+    start = time.perf_counter()
+    matrix = firepower.firepower_matrix(attackers, defenders)
+    assert time.perf_counter() - start < 1
+    assert matrix.shape == (8, 8)
+
+def test_print_matrix():
+    attackers = [firepower.Profile('Darth Vader', attack=2)]
+    defenders = [firepower.Profile('Target', agility=2)]
+    table, key = firepower.print_matrix(attackers, defenders, firepower.firepower_matrix(attackers, defenders))
+    assert table.startswith('```') and 'Darth Vader' in table
+    assert key == '1: Target'
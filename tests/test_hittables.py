@@ -0,0 +1,73 @@
+import pytest
+from r2d7 import hittables, probability
+from r2d7.roller import ModdedRoll, VsRoll
+
+attack_tests = (
+    dict(),
+    dict(focus=True),
+    dict(calculate=2, lock=True),
+    dict(force=1, reroll=2),
+    dict(calculate=9, reroll=3),
+)
+@pytest.mark.parametrize('dice', range(1, hittables.MAX_DICE + 1))
+@pytest.mark.parametrize('mods', attack_tests)
+def test_attack_matches_probability(dice, mods):
+    table = hittables.attack_roll(dice, **mods)
+    exact = probability.attack_roll(dice, **mods)
+    assert table.histogram.keys() == exact.histogram.keys()
+    for outcome, p in exact:
+        assert table.histogram[outcome] == pytest.approx(p, abs=1e-6)
+
+defense_tests = (
+    dict(),
+    dict(focus=True, evade=1),
+    dict(calculate=1, evade=2, reroll=3),
+    dict(evade=12),
+)
+@pytest.mark.parametrize('dice', range(1, hittables.MAX_DICE + 1))
+@pytest.mark.parametrize('mods', defense_tests)
+def test_defense_matches_probability(dice, mods):
+    table = hittables.defense_roll(dice, **mods)
+    exact = probability.defense_roll(dice, **mods)
+    assert table.expected_hits() == pytest.approx(exact.expected_hits(), abs=1e-5)
+    for (evades, _), p in exact:
+        assert table.histogram[(evades, 0)] == pytest.approx(p, abs=1e-6)
+
+def test_falls_back_past_the_table():
+    dice = hittables.MAX_DICE + 1
+    assert not hittables.covers(dice)
+    assert hittables.attack_roll(dice, focus=True).expected_hits() == pytest.approx(dice * 3/4)
+
+def test_generate_round_trip(tmp_path):
+    path = tmp_path / 'hit_tables.bin'
+    hittables.generate(path, max_dice=3)
+    tables = hittables.HitTables.load(path)
+    assert tables.covers(3) and not tables.covers(4)
+    assert tables.attack_roll(3, 3, 0).expected_hits() == pytest.approx(3 * 3/4)
+    assert tables.defense_roll(2, 0, 0, 1).expected_hits() == pytest.approx(
+        probability.defense_roll(2, evade=1).expected_hits())
+
+def test_load_rejects_bad_file(tmp_path):
+    path = tmp_path / 'hit_tables.bin'
+    path.write_bytes(b'nope')
+    assert hittables.HitTables.load(path) is None
+    assert hittables.HitTables.load(tmp_path / 'missing.bin') is None
+
+def test_at_least():
+    distribution = probability.attack_roll(2)
+    assert distribution.at_least(0) == pytest.approx(1.0)
+    assert distribution.at_least(1) == pytest.approx(1 - 1/4)
+    assert distribution.at_least(2) == pytest.approx(1/4)
+
+def test_roll_hit_chances():
+    roll = ModdedRoll('8 red with focus')
+    roll.calculate_expected()
+    assert roll.calculator_error is None
+    assert roll.calculator_url is None  # too many dice for the calculator
+    assert [hits for hits, _ in roll.hit_chances] == list(range(1, 9))
+    assert roll.hit_chances[0][1] == pytest.approx(1 - (1/4) ** 8)
+
+def test_vs_roll_hit_chances():
+    roll = VsRoll(ModdedRoll('3 red'), ModdedRoll('2 green'))
+    roll.calculate_expected()
+    assert roll.hit_chances[0][1] == pytest.approx(roll.outcome().at_least(1))
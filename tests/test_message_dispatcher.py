@@ -0,0 +1,55 @@
+import asyncio
+import re
+
+from r2d7.DiscordR3.message_dispatcher import MessageDispatcher
+
+
+class FakeAuthor(object):
+    def __init__(self, bot=False):
+        self.bot = bot
+
+
+class FakeMessage(object):
+    def __init__(self, content, bot=False):
+        self.content = content
+        self.author = FakeAuthor(bot)
+
+
+def make_dispatcher(calls):
+    async def cards(message, matches):
+        calls.append(('cards', matches))
+
+    async def lists(message, matches):
+        calls.append(('lists', matches))
+
+    dispatcher = MessageDispatcher()
+    dispatcher.register('cards', ['[['], [re.compile(r'\[\[(.*?)]]')], cards)
+    dispatcher.register('lists', ['http'], [re.compile(r'(https?://\S+)')], lists)
+    return dispatcher
+
+def test_dispatch_routes():
+    calls = []
+    dispatcher = make_dispatcher(calls)
+    for content in ['just chatting', '[[luke]] and [[fcs]]', 'see https://example.com', '[[not closed']:
+        asyncio.run(dispatcher.dispatch(FakeMessage(content)))
+    assert calls == [('cards', ['luke', 'fcs']), ('lists', ['https://example.com'])]
+    stats = dispatcher.stats()
+    assert stats['messages_seen'] == 4
+    assert stats['messages_triggered'] == 3
+    assert stats['routes']['cards']['matched'] == 1
+
+def test_dispatch_ignores_bots():
+    calls = []
+    dispatcher = make_dispatcher(calls)
+    asyncio.run(dispatcher.dispatch(FakeMessage('[[luke]]', bot=True)))
+    assert calls == []
+    assert dispatcher.messages_seen == 0
+
+def test_reregister_replaces():
+    calls = []
+    dispatcher = make_dispatcher(calls)
+    dispatcher.register('cards', ['[['], [re.compile(r'\[\[(.*?)]]')], dispatcher.routes['lists'].handler)
+    asyncio.run(dispatcher.dispatch(FakeMessage('[[luke]]')))
+    assert calls == [('lists', ['luke'])]
+    dispatcher.unregister('cards')
+    assert dispatcher.triggers == ('http',)
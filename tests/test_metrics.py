@@ -0,0 +1,45 @@
+import pytest
+
+from r2d7.metrics import MetricsRegistry, create_app, stage_errors, stage_seconds, timed
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('test_seconds', 'Test', 'stage', buckets=(0.1, 1))
+    for seconds in (0.05, 0.5, 5):
+        histogram.observe('search', seconds)
+    text = registry.render()
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{stage="search",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="search",le="1"} 2' in text
+    assert 'test_seconds_bucket{stage="search",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="search"} 3' in text
+    assert 'test_seconds_sum{stage="search"} 5.55' in text
+
+def test_stats_and_info():
+    registry = MetricsRegistry()
+    registry.collect_stats('test_cache', 'Cache', lambda: {'hits': 3, 'state': 'open', 'nested': {}})
+    registry.collect_stats('test_flight', 'Flights', lambda: {'a"b': {'calls': 2}}, label='name')
+    registry.info('test_data', 'Data', lambda: {'version': '1.2'})
+    registry.info('test_missing', 'Missing', lambda: None)
+    text = registry.render()
+    assert '# TYPE test_cache_hits gauge\ntest_cache_hits 3\n' in text
+    assert 'state' not in text and 'nested' not in text
+    assert 'test_flight_calls{name="a\\"b"} 2' in text
+    assert 'test_data{version="1.2"} 1' in text
+    assert 'test_missing{' not in text
+
+def test_timed_records_errors():
+    before = stage_seconds.count('test_stage')
+    with pytest.raises(ValueError):
+        with timed('test_stage'):
+            raise ValueError()
+    assert stage_seconds.count('test_stage') == before + 1
+    assert stage_errors.value('test_stage') == 1
+
+def test_endpoint():
+    registry = MetricsRegistry()
+    registry.counter('test_total', 'Test', 'stage').inc('send')
+    response = create_app(registry).test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'test_total{stage="send"} 1' in response.get_data(as_text=True)
@@ -0,0 +1,36 @@
+import pytest
+from r2d7.XWing.name_trie import PrefixTrie
+
+
+@pytest.fixture
+def trie():
+    trie = PrefixTrie(limit=3)
+    trie.insert('Luke Skywalker', 'luke', (0, 'luke'))
+    trie.insert('Skywalker', 'luke', (2, 'luke'))
+    trie.insert('lukeskywalker', 'luke', (1, 'luke'))
+    trie.insert('Lando Calrissian', 'lando', (0, 'lando'))
+    trie.insert('"Leebo"', 'leebo', (0, 'leebo'))
+    trie.insert('Lieutenant Blount', 'blount', (0, 'lieutenant blount'))
+    return trie
+
+@pytest.mark.parametrize('prefix, expected', [
+    ('lu', ['luke']),
+    ('LUKE SKY', ['luke']),
+    ('sky', ['luke']),
+    ('l', ['lando', 'leebo', 'blount']),
+    ('leeb', ['leebo']),
+    ('"lee', ['leebo']),
+    ('x', []),
+])
+def test_complete(trie, prefix, expected):
+    assert trie.complete(prefix) == expected
+
+def test_items_listed_once(trie):
+    # luke is indexed under three keys that all start with "l" or "lu"
+    assert trie.complete('luke') == ['luke']
+
+def test_limit(trie):
+    assert trie.complete('l', limit=1) == ['lando']
+
+def test_normalize():
+    assert PrefixTrie.normalize('  "Dutch"  Vander-Gold ') == 'dutch vander gold'
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+
+import requests
+
+from r2d7.slack.outbound import OutboundQueue
+from r2d7.tracing import Tracer
+
+
+class RateLimited(requests.exceptions.HTTPError):
+    def __init__(self, retry_after):
+        response = requests.Response()
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        super().__init__('429', response=response)
+
+
+def test_waiting_messages_are_batched():
+    release = threading.Event()
+    posts = []
+
+    def post(channel, text, thread):
+        release.wait(5)
+        posts.append((channel, text, thread))
+
+    outbound = OutboundQueue(post, min_interval=0)
+    outbound.send('C1', 'first')
+    time.sleep(0.05)
+    for text in ('second', 'third'):
+        outbound.send('C1', text)
+    outbound.send('C1', 'in thread', thread='1.2')
+    release.set()
+    assert outbound.join(5)
+    outbound.stop()
+    assert posts == [('C1', 'first', None), ('C1', 'second\nthird', None), ('C1', 'in thread', '1.2')]
+    assert outbound.stats()['batched'] == 1
+
+def test_batches_respect_max_chars():
+    posts = []
+    outbound = OutboundQueue(lambda c, text, t: posts.append(text), min_interval=0, max_chars=10)
+    # Queue them all before the sender can take any
+    with outbound._condition:
+        for text in ('aaaa', 'bbbb', 'cccc'):
+            outbound.send('C1', text)
+    assert outbound.join(5)
+    outbound.stop()
+    assert posts == ['aaaa\nbbbb', 'cccc']
+
+def test_channels_are_rate_limited_separately():
+    posts = []
+    outbound = OutboundQueue(lambda c, text, t: posts.append((c, time.monotonic())), min_interval=0.2, max_chars=1)
+    with outbound._condition:
+        outbound.send('C1', 'a')
+        outbound.send('C1', 'b')
+        outbound.send('C2', 'c')
+    assert outbound.join(5)
+    outbound.stop()
+    assert [c for c, _ in posts] == ['C1', 'C2', 'C1']
+    assert posts[2][1] - posts[0][1] >= 0.19
+
+def test_rate_limit_is_retried_after_delay():
+    attempts = []
+
+    def post(channel, text, thread):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RateLimited(0.1)
+
+    outbound = OutboundQueue(post, min_interval=0)
+    outbound.send('C1', 'hello')
+    assert outbound.join(5)
+    outbound.stop()
+    assert len(attempts) == 2 and attempts[1] - attempts[0] >= 0.09
+    assert outbound.stats()['retries'] == 1 and outbound.stats()['sent'] == 1
+
+def test_failures_are_dropped():
+    def post(channel, text, thread):
+        if text == 'bad':
+            raise ValueError(text)
+        if text == 'limited':
+            raise RateLimited(0)
+
+    outbound = OutboundQueue(post, min_interval=0, max_chars=1, max_retries=2)
+    for text in ('bad', 'limited', 'good'):
+        outbound.send('C1', text)
+    assert outbound.join(5)
+    outbound.stop()
+    assert outbound.stats() == {'pending': 0, 'sent': 1, 'batched': 0, 'retries': 2, 'dropped': 2}
+
+def test_sends_are_traced_with_their_message(tmp_path):
+    tracer = Tracer(str(tmp_path / 'trace.jsonl'), sample_rate=1)
+    release = threading.Event()
+    outbound = OutboundQueue(lambda c, text, t: release.wait(5), min_interval=0)
+    with tracer.trace('slack_event'):
+        outbound.send('C1', 'reply')
+    # The reply is posted after the event's trace was written
+    release.set()
+    assert outbound.join(5)
+    outbound.stop()
+    with open(tmp_path / 'trace.jsonl') as trace_file:
+        spans = {s['name']: s for s in map(json.loads, trace_file)}
+    assert spans['send']['trace'] == spans['slack_event']['trace']
+    assert spans['send']['parent'] == spans['slack_event']['span']
+    assert spans['send']['attrs'] == {'messages': 1, 'attempt': 0}
@@ -0,0 +1,50 @@
+import asyncio
+
+from r2d7.DiscordR3.presence import CompanionPresence
+
+
+class FakeGuild(object):
+    def __init__(self, guild_id, members=()):
+        self.id = guild_id
+        self.members = list(members)
+
+    async def query_members(self, query, limit, presences, cache):
+        return [m for m in self.members if m.name.startswith(query)][:limit]
+
+
+class FakeMember(object):
+    def __init__(self, member_id, name, discriminator, status, guild):
+        self.id = member_id
+        self.name = name
+        self.discriminator = discriminator
+        self.raw_status = status
+        self.guild = guild
+
+
+def test_presence_updates():
+    presence = CompanionPresence()
+    guild = FakeGuild(1)
+    companion = FakeMember(10, '4-A7', '7543', 'online', guild)
+    imposter = FakeMember(11, '4-A7', '0001', 'online', guild)
+    presence.update(imposter)
+    assert not presence.companion_online(1)
+    presence.update(companion)
+    assert presence.companion_online(1)
+    assert not presence.companion_online(2)
+    companion.raw_status = 'offline'
+    presence.update(companion)
+    assert not presence.companion_online(1)
+    companion.raw_status = 'online'
+    presence.update(companion)
+    presence.remove(companion)
+    assert not presence.companion_online(1)
+
+def test_refresh_guild():
+    presence = CompanionPresence()
+    guild = FakeGuild(5)
+    guild.members = [FakeMember(10, '4-A7', '7543', 'online', guild),
+                     FakeMember(12, 'someone', '1234', 'online', guild)]
+    asyncio.run(presence.refresh_guild(guild))
+    assert presence.companion_online(5)
+    presence.forget_guild(5)
+    assert not presence.companion_online(5)
@@ -0,0 +1,57 @@
+import pytest
+from r2d7 import probability
+from r2d7.roller import ModdedRoll, VsRoll
+
+single_die_tests = (
+    (probability.attack_roll(1), 0.5),
+    (probability.attack_roll(1, focus=True), 0.75),
+    (probability.attack_roll(1, calculate=1), 0.75),
+    (probability.attack_roll(1, lock=True), 0.75),
+    (probability.attack_roll(1, reroll=1, force=1), 0.75 + 0.25 * 0.75),
+    (probability.defense_roll(1), 0.375),
+    (probability.defense_roll(1, evade=1), 1.0),
+    (probability.defense_roll(1, force=1, reroll=1), 0.625 + 0.375 * 0.625),
+)
+@pytest.mark.parametrize('distribution, expected', single_die_tests)
+def test_single_die(distribution, expected):
+    assert distribution.expected_hits() == pytest.approx(expected)
+
+def test_distribution_sums_to_one():
+    distribution = probability.resolve(
+        probability.attack_roll(7, calculate=2, lock=True),
+        probability.defense_roll(7, focus=True, evade=1, reroll=3),
+        reinforce=1)
+    assert sum(p for _, p in distribution) == pytest.approx(1.0)
+
+def test_crit_chance():
+    assert probability.attack_roll(2).crit_chance() == pytest.approx(1 - (7/8) ** 2)
+
+def test_focus_does_not_add_crits():
+    assert probability.attack_roll(3, focus=True).expected_crits() == pytest.approx(3/8)
+
+def test_evades_cancel_hits_first():
+    attack = probability.Distribution({(1, 1): 1.0})
+    defense = probability.Distribution({(1, 0): 1.0})
+    assert dict(probability.resolve(attack, defense)) == {(0, 1): 1.0}
+
+reinforce_tests = (
+    (1, 0, 1),
+    (2, 1, 1),
+    (3, 1, 2),
+    (3, 5, 1),
+)
+@pytest.mark.parametrize('hits, reinforce, expected', reinforce_tests)
+def test_reinforce(hits, reinforce, expected):
+    outcome = probability.resolve(probability.all_hits(hits), reinforce=reinforce)
+    assert outcome.expected_hits() == expected
+
+def test_defense_roll_expected_damage():
+    roll = ModdedRoll('!roll 3 green')
+    roll.calculate_expected()
+    assert roll.calculator_result == pytest.approx(3 - 3 * 3/8)
+    assert roll.crit_chance == 0
+
+def test_vs_roll():
+    roll = VsRoll(ModdedRoll('!roll 2 red'), ModdedRoll('!roll 1 green with evade'))
+    roll.calculate_expected()
+    assert roll.calculator_result == pytest.approx(1.0 - 1.0 * (1 - (1/2) ** 2))
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from r2d7.DiscordR3.reply_aggregator import ReplyAggregator
+
+
+class FakeEmbed(object):
+    def __init__(self, size):
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+
+def send_all(aggregator):
+    sent = []
+
+    async def reply(**kwargs):
+        sent.append(kwargs)
+
+    aggregator.reply_callback = reply
+    asyncio.run(aggregator.flush())
+    return sent
+
+@pytest.mark.parametrize('sizes, expected_groups', [
+    ([100] * 6, [6]),
+    ([100] * 12, [10, 2]),
+    ([3000, 2000, 1500, 500], [2, 2]),
+    ([], []),
+])
+def test_embed_grouping(sizes, expected_groups):
+    aggregator = ReplyAggregator(None)
+    aggregator.add_embeds([FakeEmbed(size) for size in sizes])
+    sent = send_all(aggregator)
+    assert [len(message['embeds']) for message in sent] == expected_groups
+
+def test_notes_and_views():
+    aggregator = ReplyAggregator(None)
+    aggregator.add_embeds([FakeEmbed(10)])
+    aggregator.add_note('No results found for query: foo')
+    aggregator.add_note('No results found for query: bar')
+    aggregator.add_view_reply(view='select')
+    sent = send_all(aggregator)
+    assert len(sent) == 2
+    assert sent[0]['content'] == 'No results found for query: foo\nNo results found for query: bar'
+    assert len(sent[0]['embeds']) == 1
+    assert sent[1] == {'view': 'select'}
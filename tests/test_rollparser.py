@@ -0,0 +1,64 @@
+import pytest
+from r2d7.rollparser import RollQuery, RollSpec, RollSyntaxError, parse_query, parse_roll
+from r2d7.roller import Roller
+
+spec_tests = (
+    ('3 red', RollSpec(3, 'atk')),
+    ('3 R focus 3', RollSpec(3, 'atk', focus=True)),
+    ('2 green with 2 force, 6 reinforce', RollSpec(2, 'def', reinforce=6, force=2)),
+    ('3 red calc 2', RollSpec(3, 'atk', calculate=2)),
+    ('3 red calculates 2', RollSpec(3, 'atk', calculate=1)),
+    ('3 red 2 calculates', RollSpec(3, 'atk', calculate=2)),
+    ('3 red calc  2', RollSpec(3, 'atk', calculate=1)),  # only one space allowed
+    ('3 red with target lock', RollSpec(3, 'atk', lock=True)),
+    ('3 red with locks', RollSpec(3, 'atk')),
+    ('3 green reinforce', RollSpec(3, 'def', reinforce=1)),  # not force
+    ('3 green evade 2 calc', RollSpec(3, 'def', evade=2, calculate=2)),
+    ('3 green 1 evade, 2 evade', RollSpec(3, 'def', evade=1)),
+    ('2 green and a red', RollSpec(2, 'atk')),
+    # superscripts aren't numbers
+    ('3 red ² focus', RollSpec(3, 'atk', focus=True)),
+    ('3 green evade ³', RollSpec(3, 'def', evade=1)),
+)
+@pytest.mark.parametrize('text, expected', spec_tests)
+def test_parse_roll(text, expected):
+    assert parse_roll(text) == expected
+
+error_tests = (
+    ('roger roger', 'I don\'t understand what you want me to roll. :barrelroll:?'),
+    ('3red', 'I don\'t understand what you want me to roll. :barrelroll:?'),
+    ('² red', 'I don\'t understand what you want me to roll. :barrelroll:?'),
+    ('³ green', 'I don\'t understand what you want me to roll. :barrelroll:?'),
+    ('200 red', 'Sorry, I can\'t carry more than 100 dice, and chopper won\'t help :chopper:'),
+    ('0 red', 'Sorry, I can\'t roll fewer than 1 dice :jar_jar:'),
+    ('2 red 4 rerolls', 'Sorry, the calculator only allows up to 3 rerolls'),
+)
+@pytest.mark.parametrize('text, message', error_tests)
+def test_parse_errors(text, message):
+    with pytest.raises(RollSyntaxError, match=message.replace('(', r'\(').replace('?', r'\?')):
+        parse_roll(text)
+
+query_tests = (
+    ('!roll syntax', RollQuery('syntax')),
+    ('!roll d10', RollQuery('numeric', die_max=10)),
+    ('!roll barrel d6', RollQuery('numeric', die_max=6, barrel=True)),
+    ('!roll mission', RollQuery('scenario')),
+    ('!roll 2 red', RollQuery('roll', ('!roll 2 red',))),
+    # only the vs word splits the roll, not every "v" in it
+    ('!roll 2 red v 3 green with evade', RollQuery('roll', ('!roll 2 red ', ' 3 green with evade'))),
+    ('!roll 2 red VERSUS 3 green', RollQuery('roll', ('!roll 2 red ', ' 3 green'))),
+)
+@pytest.mark.parametrize('text, expected', query_tests)
+def test_parse_query(text, expected):
+    assert parse_query(text) == expected
+
+def test_parse_cache():
+    parse_roll.cache_clear()
+    parse_roll('3 red focus')
+    parse_roll('3 red focus')
+    assert parse_roll.cache_info().hits == 1
+
+def test_legacy_roller_errors():
+    roller = Roller.__new__(Roller)
+    assert roller.roll_dice('!roll 2 red vs 3 red') == [
+        ['Opposing rolls cannot have same color', 'Type `!roll syntax` for help']]
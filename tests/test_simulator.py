@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from r2d7 import probability
+from r2d7 import simulator
+from r2d7.XWing.roller import ModdedRoll
+
+# Same modifier rules as the exact calculation, so the two should agree
+simulation_tests = (
+    (simulator.attack_pool(3, calculate=1, force=1), None, 0,
+     probability.resolve(probability.attack_roll(3, calculate=1, force=1))),
+    (simulator.attack_pool(4, lock=True), simulator.defense_pool(3, focus=True, evade=1), 0,
+     probability.resolve(probability.attack_roll(4, lock=True), probability.defense_roll(3, focus=True, evade=1))),
+    (simulator.all_hits_pool(4), simulator.defense_pool(3, force=1, reroll=2), 1,
+     probability.resolve(probability.all_hits(4), probability.defense_roll(3, force=1, reroll=2), reinforce=1)),
+)
+@pytest.mark.parametrize('attack, defense, reinforce, exact', simulation_tests)
+def test_simulation_matches_exact(attack, defense, reinforce, exact):
+    result = simulator.simulate(attack, defense, reinforce, precision=0.005, rng=np.random.default_rng(7))
+    assert result.expected_hits() == pytest.approx(exact.expected_hits(), abs=2 * result.confidence)
+    assert result.crit_chance() == pytest.approx(exact.crit_chance(), abs=0.01)
+
+def test_stops_at_precision():
+    result = simulator.simulate(simulator.attack_pool(2), precision=0.05, rng=np.random.default_rng(7))
+    assert result.samples == 100_000
+    assert result.confidence <= 0.05
+
+def test_max_samples():
+    result = simulator.simulate(simulator.attack_pool(100), precision=0, batch_size=1000, max_samples=5000,
+                                rng=np.random.default_rng(7))
+    assert result.samples == 5000
+
+def test_big_roll_is_simulated():
+    roll = ModdedRoll('!roll 66 red w 66 force')
+    assert not roll.calculator_safe()
+    roll.calculate_expected()
+    assert roll.calculator_url is None
+    assert roll.calculator_result == pytest.approx(66 * 3/4, abs=0.05)
+    assert roll.calculator_error < 0.05
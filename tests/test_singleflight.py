@@ -0,0 +1,54 @@
+import asyncio
+import threading
+
+from r2d7.singleflight import SingleFlight, single_flight
+
+
+def test_concurrent_calls_coalesce():
+    release = threading.Event()
+    calls = []
+
+    def slow_search(query):
+        calls.append(query)
+        release.wait(5)
+        return [query.upper()]
+
+    async def run():
+        flight = SingleFlight('test')
+        tasks = [asyncio.create_task(flight.do('luke', slow_search, 'luke')) for _ in range(5)]
+        tasks.append(asyncio.create_task(flight.do('han', slow_search, 'han')))
+        await asyncio.sleep(0.05)
+        release.set()
+        return flight, await asyncio.gather(*tasks)
+
+    flight, results = asyncio.run(run())
+    assert results == [['LUKE']] * 5 + [['HAN']]
+    assert sorted(calls) == ['han', 'luke']
+    assert flight.stats() == {'calls': 6, 'executions': 2, 'coalesced': 4, 'in_flight': 0}
+
+def test_sequential_calls_rerun():
+    calls = []
+
+    async def run():
+        flight = SingleFlight('test')
+        for _ in range(3):
+            await flight.do('key', calls.append, 'x')
+        return flight
+
+    flight = asyncio.run(run())
+    assert calls == ['x', 'x', 'x']
+    assert flight.coalesced == 0
+
+def test_errors_are_shared():
+    def broken():
+        raise ValueError('upstream down')
+
+    async def run():
+        flight = SingleFlight('test')
+        return await asyncio.gather(flight.do('k', broken), flight.do('k', broken), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_named_flights_are_shared():
+    assert single_flight('shared') is single_flight('shared')
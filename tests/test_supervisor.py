@@ -0,0 +1,66 @@
+import time
+
+from r2d7.bots import supervisor
+from r2d7.bots.supervisor import Supervisor
+
+
+def crash():
+    raise SystemExit(1)
+
+def beat():
+    supervisor.HEARTBEAT_INTERVAL = 0
+    while True:
+        supervisor.heartbeat()
+        time.sleep(0.05)
+
+def hang():
+    time.sleep(60)
+
+def beat_then_hang():
+    supervisor.HEARTBEAT_INTERVAL = 0
+    supervisor.heartbeat()
+    time.sleep(60)
+
+
+def run_for(sup, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sup.step(timeout=0.05)
+
+
+def test_exit_is_noticed_and_restarted_with_backoff():
+    sup = Supervisor({'crash': crash}, min_backoff=0.1, max_backoff=0.4)
+    sup.start()
+    run_for(sup, 1)
+    sup.stop()
+    child = sup.children[0]
+    # Backoff of 0.1, 0.2, 0.4, 0.4... allows about four restarts a second
+    assert 2 <= child.restarts <= 5
+    assert child.backoff == 0.4
+
+def test_heartbeats_are_recorded():
+    sup = Supervisor({'beat': beat}, heartbeat_timeout=1)
+    sup.start()
+    run_for(sup, 0.5)
+    stats = sup.stats()['beat']
+    sup.stop()
+    assert stats['alive'] and stats['restarts'] == 0
+    assert stats['last_beat'] is not None and stats['last_beat'] < 0.5
+
+def test_silent_child_is_killed():
+    sup = Supervisor({'hang': beat_then_hang}, heartbeat_timeout=0.3, min_backoff=5)
+    sup.start()
+    process = sup.children[0].process
+    run_for(sup, 1)
+    sup.stop()
+    assert not process.is_alive()
+    assert sup.children[0].restart_at is not None
+
+def test_child_that_never_beats_is_left_running():
+    sup = Supervisor({'hang': hang}, heartbeat_timeout=0.3, min_backoff=5)
+    sup.start()
+    run_for(sup, 1)
+    stats = sup.stats()['hang']
+    sup.stop()
+    assert stats['alive'] and stats['restarts'] == 0
+    assert stats['last_beat'] is None
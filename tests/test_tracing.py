@@ -0,0 +1,78 @@
+import asyncio
+import contextvars
+import json
+
+import pytest
+
+from r2d7.tracing import NOOP, Tracer, annotate, span
+
+
+def read_spans(path):
+    with open(path) as trace_file:
+        return [json.loads(line) for line in trace_file]
+
+def test_span_tree(tmp_path):
+    tracer = Tracer(str(tmp_path / 'trace.jsonl'), sample_rate=1)
+    with tracer.trace('card_lookup', queries=1):
+        with span('search') as search:
+            search.set(results=3)
+            with tracer.trace('nested'):
+                annotate(cache_hit=True)
+        with pytest.raises(ValueError):
+            with span('render'):
+                raise ValueError()
+    spans = {s['name']: s for s in read_spans(tmp_path / 'trace.jsonl')}
+    assert set(spans) == {'card_lookup', 'search', 'nested', 'render'}
+    assert len({s['trace'] for s in spans.values()}) == 1
+    assert spans['card_lookup']['parent'] is None
+    assert spans['search']['parent'] == spans['card_lookup']['span']
+    assert spans['nested']['parent'] == spans['search']['span']
+    assert spans['search']['attrs'] == {'results': 3}
+    assert spans['nested']['attrs'] == {'cache_hit': True}
+    assert spans['render']['attrs'] == {'error': 'ValueError'}
+    assert spans['card_lookup']['duration_ms'] >= spans['search']['duration_ms']
+
+def test_unsampled_writes_nothing(tmp_path):
+    tracer = Tracer(str(tmp_path / 'trace.jsonl'), sample_rate=0.0000001)
+    with tracer.trace('roll'):
+        assert span('parse') is NOOP
+        assert tracer.trace('nested') is NOOP
+        annotate(ignored=True)
+    assert not (tmp_path / 'trace.jsonl').exists()
+    assert Tracer(None, sample_rate=1).trace('roll') is NOOP
+    assert span('outside') is NOOP
+
+def test_concurrent_tasks_get_their_own_traces(tmp_path):
+    tracer = Tracer(str(tmp_path / 'trace.jsonl'), sample_rate=1)
+
+    async def interaction(name):
+        with tracer.trace(name):
+            await asyncio.sleep(0.01)
+            with span('send'):
+                await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(interaction('a'), interaction('b'))
+
+    asyncio.run(main())
+    spans = read_spans(tmp_path / 'trace.jsonl')
+    roots = {s['trace']: s['span'] for s in spans if s['parent'] is None}
+    assert len(roots) == 2
+    for s in spans:
+        if s['name'] == 'send':
+            assert s['parent'] == roots[s['trace']]
+
+def test_spans_ending_after_the_root_are_written(tmp_path):
+    tracer = Tracer(str(tmp_path / 'trace.jsonl'), sample_rate=1)
+    with tracer.trace('slack_event'):
+        context = contextvars.copy_context()
+
+    def send():
+        with span('send'):
+            pass
+
+    context.run(send)
+    spans = read_spans(tmp_path / 'trace.jsonl')
+    assert [s['name'] for s in spans] == ['slack_event', 'send']
+    assert spans[1]['parent'] == spans[0]['span']
+    assert tracer.written == 1